@@ -0,0 +1,277 @@
+"""
+Hard budgets for browser agents.
+
+The task prompt asks the agent to stay under a number of pages and seconds per
+page, but nothing enforced it. BudgetEnforcer is an `on_step_end` hook that
+counts steps, distinct pages, wall time (per page and per run) and tokens after
+every step:
+
+- a run-level budget (steps, pages, run time, tokens) that runs out first gets
+  the agent a wrap-up step: it is told to finish and its output model only
+  accepts the done action (browser-use's own last-step restriction), so it
+  writes up what it has; if it still doesn't finish, it is stopped
+- too long on one page only earns a nudge to move on
+- every overrun is appended to output/budget_overruns.jsonl with the label of
+  the run (the company), so repeat offenders are easy to spot
+
+Checks happen between steps, so a single slow step can overshoot a time budget
+by its own length.
+"""
+
+import datetime
+import functools
+import importlib.metadata
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from llm_limiter import estimate_tokens
+
+OVERRUN_LOG = "output/budget_overruns.jsonl"
+_overrun_lock = threading.Lock()
+
+WRAP_UP_MESSAGE = (
+    "Budget reached ({reason}). Stop browsing now. Use only the \"done\" action in this step "
+    "and include everything you found out so far in the done text, in the requested output format."
+)
+MOVE_ON_MESSAGE = "You have spent over {limit:.0f} seconds on {url}. Move on to the next page or finish the task."
+
+# The agent internals used below (_message_manager, _update_action_models_for_page) are from these releases
+TESTED_BROWSER_USE = "0.1."
+try:
+    BROWSER_USE_VERSION = importlib.metadata.version("browser-use")
+except importlib.metadata.PackageNotFoundError:
+    BROWSER_USE_VERSION = None
+_warned = set()
+
+
+@dataclass
+class AgentBudget:
+    """Limits for one agent run (None disables a limit)"""
+
+    max_steps: Optional[int] = 30
+    max_pages: Optional[int] = 8
+    max_seconds_per_page: Optional[float] = 60
+    max_seconds: Optional[float] = 10 * 60
+    max_input_tokens: Optional[int] = 400_000
+    max_output_tokens: Optional[int] = 40_000
+
+
+@dataclass
+class BudgetOverrun:
+    budget: str  # Name of the AgentBudget field that was exceeded
+    limit: float
+    value: float
+    url: Optional[str] = None
+
+
+def _page_key(url: Optional[str]) -> Optional[str]:
+    """URL without its fragment; None for blank pages"""
+    if not url or url.startswith(("about:", "chrome:", "data:")):
+        return None
+    return url.split("#", 1)[0].rstrip("/")
+
+
+def _agent_internal(agent, path: str):
+    """
+    A private browser-use attribute (e.g. "_message_manager._add_message_with_tokens"),
+    or None with a one-time warning when this browser-use version doesn't have it.
+    """
+    target = agent
+    for name in path.split("."):
+        target = getattr(target, name, None)
+        if target is None:
+            break
+    if target is None or not (BROWSER_USE_VERSION or "").startswith(TESTED_BROWSER_USE):
+        if path not in _warned:
+            _warned.add(path)
+            print(f"⚠️ Budget enforcement: browser-use {BROWSER_USE_VERSION} is not a tested {TESTED_BROWSER_USE}x release"
+                  f"{'' if target is not None else f' and has no Agent.{path}'}")
+    return target
+
+
+def add_agent_message(agent, text: str) -> bool:
+    """Add a message to the agent's conversation for its next step. Returns False if this browser-use can't."""
+    add = _agent_internal(agent, "_message_manager._add_message_with_tokens")
+    if add is None:
+        return False
+    add(HumanMessage(content=text))
+    return True
+
+
+def restrict_to_done(agent) -> bool:
+    """
+    Make the agent's next steps accept only the done action.
+
+    browser-use rebuilds `agent.AgentOutput` from the page's actions at the start
+    of every step, so setting it once doesn't last; the rebuild is wrapped to
+    switch to the done-only model afterwards (what browser-use does on its own last step).
+    """
+    update = _agent_internal(agent, "_update_action_models_for_page")
+    if update is None:
+        return False
+    if getattr(update, "_done_only", False):
+        return True
+
+    @functools.wraps(update)
+    async def update_done_only(page):
+        await update(page)
+        agent.AgentOutput = agent.DoneAgentOutput
+    update_done_only._done_only = True
+
+    agent._update_action_models_for_page = update_done_only
+    agent.AgentOutput = agent.DoneAgentOutput
+    return True
+
+
+def chain_hooks(*hooks):
+    """One `hook(agent)` calling several in order (None entries are skipped)"""
+    hooks = [hook for hook in hooks if hook is not None]
+
+    async def hook(agent):
+        for each in hooks:
+            await each(agent)
+    return hook
+
+
+class BudgetEnforcer:
+    """
+    `on_step_end` hook enforcing an AgentBudget.
+
+    Args:
+        budget: The limits
+        label: Name of the run in the overrun log (e.g. the company)
+        overrun_log: JSON-lines file overruns are appended to (None to only print them)
+    """
+
+    def __init__(self, budget: AgentBudget, label: str = "", overrun_log: Optional[str] = OVERRUN_LOG):
+        self.budget = budget
+        self.label = label
+        self.overrun_log = overrun_log
+        self.started = time.monotonic()
+        self.steps = 0
+        self.pages: List[str] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._counted = 0  # History items whose model output is in output_tokens
+        self.overruns: List[BudgetOverrun] = []
+        self.wrapping_up = False
+        self.stopped = False
+        self._page = None
+        self._page_since = self.started
+        self._nudged = set()
+
+    @property
+    def seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    def _update(self, agent):
+        history = agent.state.history.history
+        self.steps = len(history)
+        last = history[-1] if history else None
+        # Only items added since the last call: the hook can run without a new item (or, after a
+        # retry resumed from a shorter history, with fewer), and an output must count once
+        for item in history[min(self._counted, len(history)):]:
+            if item.model_output is not None:
+                self.output_tokens += estimate_tokens(item.model_output.model_dump_json(exclude_unset=True))
+        self._counted = len(history)
+        self.input_tokens = agent.state.history.total_input_tokens()
+
+        page = _page_key(last.state.url if last is not None and last.state is not None else None)
+        if page and page != self._page:
+            self._page, self._page_since = page, time.monotonic()
+            if page not in self.pages:
+                self.pages.append(page)
+
+    def _record(self, overrun: BudgetOverrun):
+        self.overruns.append(overrun)
+        print(f"⏱️ Budget overrun{f' for {self.label}' if self.label else ''}: {overrun.budget} at {overrun.value:g} (limit {overrun.limit:g})")
+        if not self.overrun_log:
+            return
+        entry = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "label": self.label,
+            **asdict(overrun),
+            "steps": self.steps,
+            "pages": len(self.pages),
+            "seconds": round(self.seconds, 1),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+        with _overrun_lock:
+            if os.path.dirname(self.overrun_log):
+                os.makedirs(os.path.dirname(self.overrun_log), exist_ok=True)
+            with open(self.overrun_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def exceeded(self) -> Optional[BudgetOverrun]:
+        """The first run-level budget that is used up, if any"""
+        budget = self.budget
+        checks = [
+            ("max_steps", budget.max_steps, self.steps),
+            ("max_pages", budget.max_pages, len(self.pages)),
+            ("max_seconds", budget.max_seconds, round(self.seconds, 1)),
+            ("max_input_tokens", budget.max_input_tokens, self.input_tokens),
+            ("max_output_tokens", budget.max_output_tokens, self.output_tokens),
+        ]
+        for name, limit, value in checks:
+            # The step and page limits are reached at the limit, the others once they are passed
+            if limit is not None and (value >= limit if name in ("max_steps", "max_pages") else value > limit):
+                return BudgetOverrun(name, limit, value, self._page)
+        return None
+
+    async def on_step_end(self, agent):
+        self._update(agent)
+        if agent.state.history.is_done():
+            return
+
+        if self.wrapping_up:
+            # The wrap-up step didn't finish the task: cut the agent off
+            print(f"🛑 Stopping the agent{f' for {self.label}' if self.label else ''} after its wrap-up step")
+            self.stopped = True
+            agent.stop()
+            return
+
+        overrun = self.exceeded()
+        if overrun is not None:
+            self._record(overrun)
+            self.wrapping_up = True
+            reason = f"{overrun.budget.removeprefix('max_').replace('_', ' ')} limit of {overrun.limit:g}"
+            add_agent_message(agent, WRAP_UP_MESSAGE.format(reason=reason))
+            restrict_to_done(agent)
+            return
+
+        limit = self.budget.max_seconds_per_page
+        on_page = time.monotonic() - self._page_since
+        if limit is not None and self._page and on_page > limit and self._page not in self._nudged:
+            self._nudged.add(self._page)
+            self._record(BudgetOverrun("max_seconds_per_page", limit, round(on_page, 1), self._page))
+            add_agent_message(agent, MOVE_ON_MESSAGE.format(limit=limit, url=self._page))
+
+    def partial_result(self, history) -> Optional[dict]:
+        """
+        What a run that was cut off found, shaped for extract_and_save_markdown
+        (one done action holding every extracted content), or None if it found nothing.
+        """
+        contents = [
+            result.extracted_content
+            for item in getattr(history, "history", None) or []
+            for result in item.result
+            if result.extracted_content and not result.error
+        ]
+        if not contents:
+            return None
+        reasons = ", ".join(overrun.budget for overrun in self.overruns) or "budget"
+        text = f"> Partial result: the agent was stopped by its {reasons} limit.\n\n" + "\n\n".join(contents)
+        return {"all_results": [{"is_done": True, "extracted_content": text}]}
+
+    def summary(self) -> str:
+        return (
+            f"{self.steps} steps, {len(self.pages)} pages, {self.seconds:.0f}s, "
+            f"~{self.input_tokens:,} input / ~{self.output_tokens:,} output tokens"
+        )
@@ -0,0 +1,365 @@
+"""
+Append-only JSON-lines logs of agent runs.
+
+One line per agent step, written as the step happens, instead of one
+pretty-printed JSON document of the whole result:
+
+    {"step": 3, "url": "https://...", "title": "...", "actions": [...], "results": [{"is_done": true, ...}]}
+
+Screenshots and DOM state are left out, so lines stay small. A path ending in
+`.gz` or `.zst` is compressed (zstd needs the optional `zstandard` package).
+
+Next to every log the writer keeps a small sidecar index, `<log>.idx.json`,
+with the byte offset, length, URL and done/error flags of each step and the
+position of the last done action. With it, finding the final output of a log
+is one seek and one line parse. The index is only trusted while the log's size
+matches the one recorded in it. Offsets are into the uncompressed data: a
+`.gz` / `.zst` stream has no random access, so a seek there decompresses
+everything before the offset, and reading the last step costs a pass over the
+whole log. Keep logs that are read back often uncompressed.
+
+AgentLogReader iterates over a log lazily and finds the last done action:
+through the index when there is one, otherwise by reading an uncompressed
+file backwards from the end. Old monolithic `.json` logs can still be read.
+"""
+
+import gzip
+import io
+import json
+import os
+from typing import Iterator, Optional
+
+from instrumentation import traced
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst logs
+    zstandard = None
+
+READ_BLOCK_SIZE = 64 * 1024
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+# Column order of the per-step rows in the index
+INDEX_FIELDS = ["step", "offset", "length", "done", "error", "url"]
+
+
+def _open_binary(path: str, mode: str):
+    """Binary file object for `path`, transparently (de)compressing .gz / .zst"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("Reading or writing .zst agent logs needs the zstandard package: pip install zstandard")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return open(path, mode + "b")
+
+
+def _jsonable(value):
+    """Fallback serializer: pydantic models, plain objects, then str()"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if hasattr(value, "__dict__"):
+        return value.__dict__
+    return str(value)
+
+
+def _field(item, name):
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def result_entry(action) -> dict:
+    """Compact dict of one ActionResult (or a dict / object with the same fields)"""
+    entry = {name: _field(action, name) for name in ("is_done", "success", "extracted_content", "error", "text")}
+    return {name: value for name, value in entry.items() if value is not None}
+
+
+def history_steps(agent_result) -> Iterator[dict]:
+    """
+    Step entries of a complete agent result: an AgentHistoryList, a loaded
+    legacy log dict, or anything with `all_results` / `history`.
+    """
+    history = _field(agent_result, "all_results") or _field(agent_result, "history") or []
+    for step, item in enumerate(history, start=1):
+        results = _field(item, "result")
+        if results is None:
+            # Simple structures list the actions directly
+            yield {"step": step, "results": [result_entry(item)]}
+            continue
+        state = _field(item, "state")
+        model_output = _field(item, "model_output")
+        actions = _field(model_output, "action") if model_output is not None else None
+        yield {
+            "step": step,
+            "url": _field(state, "url") if state is not None else None,
+            "title": _field(state, "title") if state is not None else None,
+            "actions": actions,
+            "results": [result_entry(action) for action in results],
+        }
+
+
+def index_path(path: str) -> str:
+    """Sidecar index file of a log"""
+    return path + INDEX_SUFFIX
+
+
+def _index_row(entry: dict, offset: int, length: int) -> list:
+    results = entry.get("results") or []
+    return [
+        entry.get("step"), offset, length,
+        bool(step_done_content(entry)), any(result.get("error") for result in results), entry.get("url"),
+    ]
+
+
+class _Index:
+    """Per-step offsets and flags of one log, saved as the sidecar index"""
+
+    def __init__(self, rows=None, log_bytes=0):
+        self.rows = rows or []
+        self.log_bytes = log_bytes  # Uncompressed bytes covered by the rows
+        self.last_done = None
+        for row in self.rows:
+            if row[3]:
+                self.last_done = row
+
+    def add(self, entry: dict, length: int):
+        row = _index_row(entry, self.log_bytes, length)
+        self.rows.append(row)
+        self.log_bytes += length
+        if row[3]:
+            self.last_done = row
+        return row
+
+    def save(self, path: str):
+        data = {
+            "version": INDEX_VERSION,
+            "file_size": os.path.getsize(path),
+            "log_bytes": self.log_bytes,
+            "last_done": self.last_done,
+            "fields": INDEX_FIELDS,
+            "steps": self.rows,
+        }
+        temp_path = index_path(path) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, index_path(path))
+
+
+def load_index(path: str) -> Optional[dict]:
+    """The sidecar index of a log, or None if it is missing or out of date"""
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or data.get("file_size") != os.path.getsize(path):
+            return None
+        return data
+    except (OSError, ValueError):
+        return None
+
+
+def build_index(path: str) -> dict:
+    """Scan a JSON-lines log once and write its sidecar index (for logs written without one)"""
+    index = _Index()
+    with _open_binary(path, "r") as raw:
+        for line in io.BufferedReader(raw) if path.endswith((".gz", ".zst")) else raw:
+            entry = json.loads(line) if line.strip() else {}
+            if "step" in entry:
+                index.add(entry, len(line))
+            else:
+                index.log_bytes += len(line)
+    index.save(path)
+    return load_index(path)
+
+
+class AgentLogWriter:
+    """
+    Writes one JSON line per agent step and keeps the log's sidecar index
+    up to date (rewritten whenever a done action is logged, and on close).
+
+    Args:
+        path: Log file (.jsonl, .jsonl.gz or .jsonl.zst)
+        resume: Append to an existing uncompressed log and continue its index,
+            instead of starting the log over
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.steps = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = path.endswith((".gz", ".zst"))
+        if resume and compressed:
+            raise ValueError(f"Compressed logs can't be resumed: {path}")
+        self._index = _Index()
+        if resume and os.path.exists(path) and os.path.getsize(path):
+            existing = load_index(path) or build_index(path)
+            self._index = _Index(existing["steps"], existing["log_bytes"])
+        # Compressed streams can't be reopened for appending cheaply, so they stay open
+        self._file = _open_binary(path, "a" if resume else "w")
+
+    def write_step(self, step: int, results, url: Optional[str] = None, title: Optional[str] = None, actions=None):
+        """Append one step; `results` are ActionResults or dicts"""
+        self.write_entry({
+            "step": step,
+            "url": url,
+            "title": title,
+            "actions": actions,
+            "results": [result_entry(action) for action in results or []],
+        })
+
+    def write_entry(self, entry: dict):
+        entry = {key: value for key, value in entry.items() if value is not None}
+        line = json.dumps(entry, default=_jsonable, ensure_ascii=False, separators=(",", ":")) + "\n"
+        data = line.encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        self.steps += 1
+        row = self._index.add(entry, len(data))
+        if row[3] and not self.path.endswith((".gz", ".zst")):
+            # The final output is findable right away, even if the run never closes the log
+            self._index.save(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._index.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@traced("write_agent_log", "serialize")
+def write_agent_log(agent_result, path: str) -> int:
+    """Write a complete agent result as a JSON-lines log, step by step. Returns the number of steps."""
+    with AgentLogWriter(path) as writer:
+        for entry in history_steps(agent_result):
+            writer.write_entry(entry)
+        return writer.steps
+
+
+def step_done_content(entry: dict) -> Optional[str]:
+    """Final content of a step entry if one of its results is a done action"""
+    for result in entry.get("results") or []:
+        if result.get("is_done"):
+            content = result.get("extracted_content") or result.get("text")
+            if isinstance(content, dict):
+                content = content.get("text")
+            if content:
+                return content
+    return None
+
+
+def _reverse_lines(f) -> Iterator[bytes]:
+    """Lines of a seekable binary file from last to first, reading fixed-size blocks from the end"""
+    f.seek(0, io.SEEK_END)
+    position = f.tell()
+    remainder = b""
+    while position > 0:
+        size = min(READ_BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b"\n")
+        remainder = lines.pop(0)  # May be the tail of a line that starts in the previous block
+        for line in reversed(lines):
+            if line.strip():
+                yield line
+    if remainder.strip():
+        yield remainder
+
+
+class AgentLogReader:
+    """
+    Lazy reader for agent logs.
+
+    Args:
+        path: A JSON-lines log (optionally .gz / .zst) or a legacy monolithic .json log
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.compressed = path.endswith((".gz", ".zst"))
+
+    def index(self, build: bool = False) -> Optional[dict]:
+        """The log's sidecar index; with `build`, a missing or stale index is rebuilt"""
+        index = load_index(self.path)
+        if index is None and build and not self._is_legacy():
+            index = build_index(self.path)
+        return index
+
+    def read_at(self, offset: int, length: int) -> dict:
+        """The step entry at a byte offset of the (uncompressed) log"""
+        with _open_binary(self.path, "r") as f:
+            f.seek(offset)  # Compressed streams decompress up to the offset
+            return json.loads(f.read(length))
+
+    def step(self, number: int) -> Optional[dict]:
+        """One step entry by its step number, via the index"""
+        index = self.index(build=True)
+        for row in index["steps"] if index else []:
+            if row[0] == number:
+                return self.read_at(row[1], row[2])
+        return None
+
+    def _is_legacy(self) -> bool:
+        if self.compressed:
+            return False
+        with open(self.path, "rb") as f:
+            head = f.read(READ_BLOCK_SIZE)
+        # Legacy logs are an indented document whose first line is just the opening brace
+        return head.split(b"\n", 1)[0].strip() in (b"{", b"[")
+
+    def __iter__(self) -> Iterator[dict]:
+        """Step entries in order, one line parsed at a time"""
+        if self._is_legacy():
+            with open(self.path, "r", encoding="utf-8") as f:
+                yield from history_steps(json.load(f))
+            return
+        with _open_binary(self.path, "r") as raw:
+            for line in io.BufferedReader(raw) if self.compressed else raw:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "step" not in entry and isinstance(entry, dict):
+                    # A legacy log written without indentation
+                    yield from history_steps(entry)
+                else:
+                    yield entry
+
+    def last_done(self) -> Optional[str]:
+        """
+        Content of the last done action, or None.
+
+        With a sidecar index this is one seek and one line parse. Without one,
+        uncompressed logs are read backwards from the end (usually only the final
+        line is parsed); compressed and legacy logs are scanned forward once.
+        """
+        index = self.index()
+        if index is not None:
+            last_done = index["last_done"]
+            return step_done_content(self.read_at(last_done[1], last_done[2])) if last_done else None
+        if self.compressed or self._is_legacy():
+            content = None
+            for entry in self:
+                content = step_done_content(entry) or content
+            return content
+        with open(self.path, "rb") as f:
+            for line in _reverse_lines(f):
+                entry = json.loads(line)
+                if "step" not in entry:
+                    # A legacy log written without indentation
+                    content = None
+                    for step in history_steps(entry):
+                        content = step_done_content(step) or content
+                    return content
+                content = step_done_content(entry)
+                if content:
+                    return content
+        return None
@@ -0,0 +1,246 @@
+"""
+Retries for browser agents that resume where the failed attempt left off.
+
+browser-use swallows most step errors and stops after a few consecutive
+failures, so a rate limit or a flaky page at step 25 of 30 used to mean
+starting over from step zero in a new browser. Here:
+
+- after every step that finished without errors, its position (history length,
+  message memory length, step counter) is checkpointed; the state is only
+  copied and cut back to it when a retry needs it
+- a retry builds the next Agent with `injected_agent_state` set to that
+  checkpoint and the same browser context, so it continues on the page it was
+  on, with the steps and tokens already spent kept
+- only transient errors are retried (rate limits, timeouts, 5xx and network
+  errors as classified by llm_limiter, plus browser crashes and malformed model
+  output), with exponential backoff and full jitter
+- the LLM cache entries of the steps after the checkpoint are evicted before a
+  retry, so a resumed step asks the model again instead of being answered
+  with the cached response that failed
+"""
+
+import asyncio
+import random
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from browser_use import Browser
+
+from browser_pool import BrowserPool
+from llm_cache import evict_calls, track_calls
+from llm_limiter import classify_error as classify_llm_error
+from rate_limiter import run_agent
+
+RETRY_BACKOFF_BASE = 2.0  # Seconds; the backoff ceiling doubles with every retry
+RETRY_BACKOFF_CAP = 60.0
+
+# Agent step errors worth another attempt besides the LLM ones (llm_limiter.classify_error), checked in order
+AGENT_ERRORS = [
+    ("browser", re.compile(r"browser closed|target (?:page, context or browser )?(?:has been )?closed|disconnected", re.IGNORECASE)),
+    ("parsing", re.compile(r"tool_call|json|could not parse|parsing|malformed", re.IGNORECASE)),
+]
+
+
+def classify_error(error) -> Optional[str]:
+    """Category of a transient error (an exception or a step error message), or None if retrying won't help"""
+    category = classify_llm_error(error)
+    if category is not None:
+        return category
+    message = str(error or "")
+    for category, pattern in AGENT_ERRORS:
+        if pattern.search(message):
+            return category
+    return None
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BACKOFF_BASE, cap: float = RETRY_BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AgentCheckpoint:
+    """
+    `on_step_end` hook that remembers the last step that finished without errors.
+
+    Only the agent state object and the history / message counts at that step are
+    kept; the state is copied and cut back to them when a retry asks for it, so a
+    long run is not deep-copied after every step.
+    """
+
+    def __init__(self):
+        self.state = None  # The live state of the agent that made the checkpoint
+        self.steps = 0
+        self.n_steps = 1
+        self.messages = 0
+        self.input_tokens = 0
+        self.stopped = False  # The agent was stopped on purpose (e.g. a budget), not failed
+        self.last_step_ok = False
+        self._counted = 0  # History entries whose input tokens are in _tokens
+        self._tokens = 0
+
+    async def on_step_end(self, agent):
+        self.stopped = agent.state.stopped
+        history = agent.state.history.history
+        # Only the new steps' tokens: total_input_tokens() would add up the whole history every step
+        self._tokens += sum(item.metadata.input_tokens for item in history[self._counted:] if item.metadata)
+        self._counted = len(history)
+        self.last_step_ok = not any(result.error for result in agent.state.last_result or [])
+        if not self.last_step_ok:
+            return
+        self.state = agent.state
+        self.steps = len(history)
+        self.n_steps = self.state.n_steps
+        self.messages = len(self.state.message_manager_state.history.messages)
+        self.input_tokens = self._tokens
+
+    def resume_state(self):
+        """A copy of the state as it was at the checkpoint, to inject into the next Agent (None to start over)"""
+        self._counted, self._tokens = self.steps, self.input_tokens
+        if self.state is None:
+            return None
+        state = self.state.model_copy(deep=True)
+        # Drop what the failed steps added after the checkpoint
+        del state.history.history[self.steps:]
+        message_history = state.message_manager_state.history
+        del message_history.messages[self.messages:]
+        message_history.current_tokens = sum(message.metadata.tokens for message in message_history.messages)
+        state.n_steps = self.n_steps
+        state.last_result = state.history.history[-1].result if state.history.history else None
+        state.consecutive_failures = 0
+        state.stopped = state.paused = False
+        return state
+
+
+class _BrowserSession:
+    """One browser context kept across attempts (borrowed from a pool, or an own browser)"""
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        self.pool = pool
+        self.browser = None
+        self.context = None
+
+    async def open(self):
+        if self.pool is not None:
+            self.context = await self.pool.acquire()
+            self.browser = self.pool.browser
+        else:
+            self.browser = self.browser or Browser()
+            self.context = await self.browser.new_context()
+
+    async def close(self, close_browser: bool = True):
+        if self.context is not None:
+            if self.pool is not None:
+                await self.pool.release(self.context)
+            else:
+                try:
+                    await self.context.close()
+                except Exception as e:
+                    print(f"Warning: Could not close browser context cleanly: {e}")
+            self.context = None
+        if close_browser and self.pool is None and self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+
+    async def reopen(self):
+        """A fresh context after the browser or page died"""
+        await self.close(close_browser=False)
+        await self.open()
+
+
+@dataclass
+class RetryReport:
+    attempts: int = 0
+    steps_saved: int = 0  # Steps retries resumed from instead of redoing
+    tokens_saved: int = 0  # Input tokens of those steps
+    errors: List[str] = field(default_factory=list)
+
+    def print_summary(self):
+        if self.attempts > 1:
+            print(
+                f"🔁 {self.attempts - 1} retr{'y' if self.attempts == 2 else 'ies'}: "
+                f"resumed {self.steps_saved} step(s) instead of redoing them (~{self.tokens_saved:,} input tokens saved)"
+            )
+
+
+def _history_error(history) -> Optional[str]:
+    """The error that ended an unfinished run, or None if it is done"""
+    if history is None or history.is_done():
+        return None
+    errors = [error for error in history.errors() if error]
+    return errors[-1] if errors else None
+
+
+async def run_resumable_agent(task: str, llm, url: Optional[str] = None, provider: Optional[str] = None,
+                              pool: Optional[BrowserPool] = None, on_step_end=None, max_retries: int = 2,
+                              max_steps: int = 100, **agent_kwargs):
+    """
+    Run an agent, retrying transient failures from the last good step.
+
+    Args:
+        task, llm, url, provider, pool, on_step_end, **agent_kwargs: As for rate_limiter.run_agent
+        max_retries: Retries after the first attempt
+        max_steps: Step limit over all attempts together
+
+    Returns:
+        (result, RetryReport): the agent history (possibly unfinished), or an error
+        message if every attempt raised a transient error
+    """
+    checkpoint = AgentCheckpoint()
+    report = RetryReport()
+    session = _BrowserSession(pool)
+
+    async def hook(agent):
+        if on_step_end is not None:
+            await on_step_end(agent)
+        # Last, so a hook that stops the agent (a budget) is seen as a deliberate stop
+        await checkpoint.on_step_end(agent)
+        if checkpoint.last_step_ok:
+            cache_calls.clear()  # Only the calls after the checkpoint are redone on a retry
+
+    await session.open()
+    try:
+        for attempt in range(max_retries + 1):
+            report.attempts += 1
+            state = checkpoint.resume_state()
+            if state is not None:
+                print(f"↩️ Resuming at step {checkpoint.steps + 1} ({checkpoint.steps} step(s), ~{checkpoint.input_tokens:,} input tokens kept)")
+                report.steps_saved += checkpoint.steps
+                report.tokens_saved += checkpoint.input_tokens
+            print(f"Attempt {attempt + 1}/{max_retries + 1} - Running agent...")
+
+            error, result = None, None
+            with track_calls() as cache_calls:
+                try:
+                    result = await run_agent(
+                        task, llm, url=url, provider=provider, on_step_end=hook, max_steps=max(1, max_steps - checkpoint.steps),
+                        browser=session.browser, browser_context=session.context, injected_agent_state=state, **agent_kwargs,
+                    )
+                    error = None if checkpoint.stopped else _history_error(result)
+                except Exception as e:
+                    if classify_error(e) is None:
+                        raise
+                    error = e
+
+            category = classify_error(error) if error is not None else None
+            if category is None:
+                return result, report
+            report.errors.append(f"{category}: {error}")
+            if attempt == max_retries:
+                print(f"Max retries reached after {category} error: {error}")
+                break
+
+            delay = backoff_delay(attempt)
+            print(f"⚠️ Transient {category} error on attempt {attempt + 1}: {error} - retrying in {delay:.1f}s")
+            evicted = evict_calls(cache_calls)
+            if evicted:
+                print(f"💾 Dropped {evicted} cached LLM response(s) of the failed step(s)")
+            await asyncio.sleep(delay)
+            if category == "browser":
+                await session.reopen()
+    finally:
+        await session.close()
+
+    if result is not None:
+        return result, report  # The unfinished history still holds the partial results
+    return f"Error: Agent failed after {max_retries + 1} attempts. Last error: {error}", report
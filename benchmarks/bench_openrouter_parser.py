@@ -0,0 +1,147 @@
+"""
+Micro-benchmark of parse_openrouter_response against the previous per-pattern
+implementation (kept below as the reference).
+
+Checks that both give the same output on the responses in
+fixtures/openrouter_responses.json, then times them. The only intended
+difference is nested tokens ("<|start_header_id|>a<|eot_id|>b<|end_header_id|>"):
+the legacy parser applied each pattern once and left the outer token behind,
+the current one rescans until no token is left. Such responses are reported
+separately and must come out token-free:
+
+    python benchmarks/bench_openrouter_parser.py [--repeat 200]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openrouter_parser import _SPECIAL_TOKENS_RE, parse_openrouter_response  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "openrouter_responses.json")
+
+
+def legacy_parse_openrouter_response(text: str) -> str:
+    """The implementation that used to live in main.py: findall + sub per pattern"""
+    if not isinstance(text, str):
+        return str(text)
+
+    original_length = len(text)
+
+    tool_call_patterns = [
+        r'<\|tool_call_start_id\|>[^<]*<\|tool_call_end\|>',
+        r'<\|tool_call_start\|>[^<]*<\|tool_call_end\|>',
+        r'<\|start_header_id\|>[^<]*<\|end_header_id\|>',
+        r'<\|eot_id\|>',
+        r'<\|begin_of_text\|>',
+        r'<\|end_of_text\|>',
+        r'<\|assistant\|>',
+        r'<\|user\|>',
+        r'<\|system\|>',
+    ]
+
+    cleaned_text = text
+    removed_patterns = []
+
+    for pattern in tool_call_patterns:
+        matches = re.findall(pattern, cleaned_text, flags=re.DOTALL | re.IGNORECASE)
+        if matches:
+            removed_patterns.extend(matches)
+            cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.DOTALL | re.IGNORECASE)
+
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
+    cleaned_text = cleaned_text.strip()
+
+    if removed_patterns and len(cleaned_text) != original_length:
+        print(f"Parser: Removed {len(removed_patterns)} problematic token(s), cleaned {original_length} -> {len(cleaned_text)} chars")
+
+    try:
+        json_match = re.search(r'\{[^{}]*"content"[^{}]*\}', cleaned_text, re.DOTALL)
+        if json_match:
+            potential_json = json_match.group()
+            try:
+                parsed = json.loads(potential_json)
+                if isinstance(parsed, dict) and 'content' in parsed:
+                    print("Parser: Extracted content from JSON structure")
+                    return parsed['content']
+            except json.JSONDecodeError:
+                pass
+    except Exception:
+        pass
+
+    return cleaned_text
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_equivalence(corpus: list) -> tuple:
+    """
+    Compare the two implementations (output and printed log) on every response.
+
+    Returns:
+        (mismatches, rescanned): indices of responses where they disagree, and of those
+        where they only disagree because the legacy output still contains a special token
+        that the current parser removed
+    """
+    mismatches, rescanned = [], []
+    for i, text in enumerate(corpus):
+        outputs = []
+        for parse in (legacy_parse_openrouter_response, parse_openrouter_response):
+            with contextlib.redirect_stdout(io.StringIO()) as captured:
+                result = parse(text)
+            outputs.append((result, captured.getvalue()))
+        (legacy, _), (current, _) = outputs
+        if outputs[0] == outputs[1]:
+            continue
+        if _SPECIAL_TOKENS_RE.search(legacy) and not _SPECIAL_TOKENS_RE.search(current):
+            rescanned.append(i)
+        else:
+            mismatches.append(i)
+    return mismatches, rescanned
+
+
+def time_parser(parse, corpus: list, repeat: int) -> float:
+    """Seconds per pass over the corpus (best of 5)"""
+    best = float("inf")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for text in corpus:
+                    parse(text)
+            best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the corpus per timing run")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches, rescanned = check_equivalence(corpus)
+    if mismatches:
+        print(f"❌ Output differs from the legacy parser on responses {mismatches}")
+        sys.exit(1)
+    print(f"✅ Same output as the legacy parser on {len(corpus) - len(rescanned)} of {len(corpus)} responses ({sum(map(len, corpus)):,} chars)")
+    if rescanned:
+        print(f"✅ Nested tokens left behind by the legacy parser removed on responses {rescanned}")
+
+    legacy = time_parser(legacy_parse_openrouter_response, corpus, args.repeat)
+    current = time_parser(parse_openrouter_response, corpus, args.repeat)
+    print(f"legacy:  {legacy * 1e6:9.1f} µs per corpus pass")
+    print(f"current: {current * 1e6:9.1f} µs per corpus pass ({legacy / current:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
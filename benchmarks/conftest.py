@@ -0,0 +1,120 @@
+"""
+Fixtures for the micro-benchmarks in this directory.
+
+With pytest-benchmark installed its `benchmark` fixture is used as is
+(`--benchmark-save`, `--benchmark-compare`, ...). Without it a minimal
+stand-in with the same call interface times the rounds and prints a table at
+the end of the session, so the suite also runs as part of the plain test run.
+
+`allocations` measures one call under tracemalloc and adds the result to the
+benchmark's `extra_info`.
+"""
+
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    pytest_benchmark = None
+
+_results = []  # (test id, stats, extra_info) of the stand-in benchmark
+
+
+class _Benchmark:
+    """The subset of pytest-benchmark's fixture the suite uses: __call__, pedantic, extra_info, stats"""
+
+    def __init__(self, name: str, min_rounds: int = 5, max_time: float = 1.0):
+        self.name = name
+        self.min_rounds = min_rounds
+        self.max_time = max_time
+        self.extra_info = {}
+        self.stats = None
+
+    def _record(self, timings: list):
+        self.stats = {
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.fmean(timings),
+            "median": statistics.median(timings),
+            "rounds": len(timings),
+        }
+        _results.append((self.name, self.stats, self.extra_info))
+
+    def __call__(self, function, *args, **kwargs):
+        """Rounds until `min_rounds` are done and `max_time` has passed"""
+        timings, result = [], None
+        started = time.perf_counter()
+        while len(timings) < self.min_rounds or time.perf_counter() - started < self.max_time:
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        self._record(timings)
+        return result
+
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, iterations=1, warmup_rounds=0):
+        kwargs = kwargs or {}
+        timings, result = [], None
+        for round_number in range(warmup_rounds + rounds):
+            if setup is not None:
+                args, kwargs = setup() or (args, kwargs)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **kwargs)
+            if round_number >= warmup_rounds:
+                timings.append((time.perf_counter() - start) / iterations)
+        self._record(timings)
+        return result
+
+
+if pytest_benchmark is None:
+    @pytest.fixture
+    def benchmark(request):
+        return _Benchmark(request.node.name)
+
+    def pytest_terminal_summary(terminalreporter):
+        if not _results:
+            return
+        terminalreporter.write_sep("-", "benchmarks (pytest-benchmark not installed: minimal timer)")
+        terminalreporter.write_line(f"{'name':<52} {'rounds':>6} {'min ms':>9} {'median ms':>10} {'max ms':>9} {'peak alloc KB':>14}")
+        for name, stats, extra_info in _results:
+            peak = extra_info.get("peak_alloc_bytes")
+            peak_text = f"{peak / 1024:.1f}" if peak is not None else "-"
+            terminalreporter.write_line(
+                f"{name[:52]:<52} {stats['rounds']:>6} {stats['min'] * 1000:>9.3f} {stats['median'] * 1000:>10.3f} "
+                f"{stats['max'] * 1000:>9.3f} {peak_text:>14}"
+            )
+
+
+@pytest.fixture
+def allocations(benchmark):
+    """
+    `allocations(function, *args)` runs the call once under tracemalloc and
+    returns (peak bytes, bytes still allocated afterwards), also stored in
+    `benchmark.extra_info` as peak_alloc_bytes / net_alloc_bytes.
+    """
+    def measure(function, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            function(*args, **kwargs)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_alloc_bytes"] = peak - before
+        benchmark.extra_info["net_alloc_bytes"] = current - before
+        return peak - before, current - before
+    return measure
+
+
+@pytest.fixture(autouse=True)
+def _scratch_dir(tmp_path, monkeypatch):
+    """Results and logs are written below output/ of the working directory"""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,103 @@
+"""
+Generated inputs for the micro-benchmarks.
+
+Agent histories come in the two shapes extract_and_save_markdown accepts:
+
+- "object": markdown_extractor's ActionResult / AgentHistoryList stand-ins,
+  one action per entry (what the extractor's own examples use)
+- "dict": a browser-use history dump as loaded from JSON, with state, model
+  output and a result list per step
+
+Only the last step is done. Its markdown is wrapped in a ```markdown block, so
+`final_markdown(steps)` is what the extractor should save. Everything is seeded,
+so every run (and every commit) benchmarks the same data.
+"""
+
+import functools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_extractor import ActionResult, AgentHistoryList  # noqa: E402
+
+HISTORY_SIZES = [10, 100, 1_000, 10_000]
+SHAPES = ["dict", "object"]
+
+_WORDS = (
+    "company culture mission product engineering team growth customers cloud platform "
+    "採用 事業 挑戦 成長 社員 技術 サービス 価値観 チーム 開発"
+).split()
+_TOKENS = [
+    "<|eot_id|>", "<|begin_of_text|>", "<|end_of_text|>", "<|assistant|>", "<|user|>", "<|system|>",
+    "<|start_header_id|>assistant<|end_header_id|>", "<|tool_call_start|>[go_to_url]<|tool_call_end|>",
+    "<|tool_call_start_id|>call_1<|tool_call_end|>",
+]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def final_markdown(steps: int) -> str:
+    """The markdown the done step of a `steps`-step history carries"""
+    return f"# 志望動機 ({steps} steps)\n\n貴社の事業に強く共感し、志望いたしました。\n\n- 経験: Web開発\n- 強み: 日本語と英語"
+
+
+def _done_content(steps: int) -> str:
+    return f"Here is the result.\n\n```markdown\n{final_markdown(steps)}\n```\n\nGood luck!"
+
+
+@functools.lru_cache(maxsize=None)
+def agent_history(steps: int, shape: str = "dict", seed: int = 0):
+    """A `steps`-step agent history of the given shape, ending with one done action"""
+    rng = random.Random(seed * 100_003 + steps)
+    if shape == "object":
+        actions = [ActionResult(False, extracted_content=_text(rng, rng.randint(20, 200))) for _ in range(steps - 1)]
+        actions.append(ActionResult(True, extracted_content=_done_content(steps)))
+        return AgentHistoryList(all_results=actions)
+
+    if shape != "dict":
+        raise ValueError(f"Unknown history shape: {shape}")
+    history = []
+    for step in range(1, steps + 1):
+        done = step == steps
+        url = f"https://example.co.jp/{rng.choice(_WORDS[:10])}/{step}"
+        result = {"is_done": done, "extracted_content": _done_content(steps) if done else _text(rng, rng.randint(20, 200)), "error": None}
+        if not done and rng.random() < 0.05:
+            result = {"is_done": False, "extracted_content": None, "error": "Element with index 12 does not exist"}
+        history.append({
+            "state": {"url": url, "title": f"{rng.choice(_WORDS)} | Example", "tabs": [{"url": url}], "interacted_element": [None]},
+            "model_output": {"action": [{"done": {"text": result["extracted_content"]}} if done else {"go_to_url": {"url": url}}]},
+            "result": [result],
+            "metadata": {"step_start_time": 1_700_000_000.0 + step, "step_end_time": 1_700_000_001.5 + step, "input_tokens": rng.randint(800, 4000)},
+        })
+    return {"history": history}
+
+
+@functools.lru_cache(maxsize=None)
+def openrouter_outputs(count: int = 200, seed: int = 0) -> tuple:
+    """
+    `count` OpenRouter responses: agent JSON and prose of varying length, about
+    two thirds of them with special tokens (leading, trailing, in between, joined
+    by a removal), some plain.
+    """
+    rng = random.Random(seed)
+    outputs = []
+    for i in range(count):
+        if i % 2:
+            body = '{"current_state": {"evaluation_previous_goal": "Success", "memory": "%s", "next_goal": "%s"}, "action": [{"go_to_url": {"url": "https://example.co.jp/%d"}}]}' % (
+                _text(rng, rng.randint(5, 40)), _text(rng, rng.randint(3, 12)), i)
+        else:
+            body = "\n\n\n".join(_text(rng, rng.randint(10, 120)) for _ in range(rng.randint(1, 6)))
+        kind = i % 3
+        if kind == 0:
+            text = body  # No special tokens: the fast path
+        elif kind == 1:
+            text = rng.choice(_TOKENS) + "\n" + body + "\n" + rng.choice(_TOKENS) + rng.choice(_TOKENS)
+        else:
+            cut = rng.randint(0, len(body))
+            text = body[:cut] + rng.choice(_TOKENS) + body[cut:] + "<|us<|eot_id|>er|>"
+        outputs.append(text)
+    return tuple(outputs)
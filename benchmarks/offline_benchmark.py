@@ -0,0 +1,315 @@
+"""
+End-to-end benchmark that runs without API keys or live job sites.
+
+The LLM is the replay provider of get_llm (recorded responses, see replay_llm.py)
+and the job platform and company pages are saved copies in fixtures/offline,
+served from a local HTTP server. Each scenario runs in its own process, in a
+scratch working directory, so peak RSS and caches don't leak between them:
+
+- main: main.main() in batch mode over the fixture companies.json
+- japan_search: JapanJobSearcher.comprehensive_japan_search over the saved platforms
+- analysis: JapanJobSearcher.analyze_japan_market over recorded search results
+  (dedupe, condense, job statistics, structured analysis call)
+
+    python benchmarks/offline_benchmark.py [--repeat 5] [--scenarios main analysis]
+    python benchmarks/offline_benchmark.py --compare benchmarks/results/<earlier run>.json
+
+Every run (after one warm-up) is cold: the LLM cache, page cache and job store
+start empty. Results - p50/p95 latency, throughput, peak RSS of the Python
+process and the slowest spans - are written to benchmarks/results/ together with
+the git commit, so runs from different commits can be compared. The browser is
+a real Chromium; without one (`playwright install chromium`) the agent scenarios
+still run but every agent fails, which shows up in "errors".
+"""
+
+import argparse
+import asyncio
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "offline")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# Launch and request limits while benchmarking: nothing real to protect, pacing would only add sleeps
+BENCH_LIMIT = (60_000, 1_000)
+PLATFORMS = [("Rikunabi Next", "rikunabi"), ("Doda", "doda"), ("Green (IT/Tech)", "green"), ("Wantedly", "wantedly")]
+SEARCH = {"job_role": "Web Developer", "location": "Tokyo", "japanese_level": "N2", "keywords": ["スタートアップ", "リモートワーク"], "staff_count": "1-25"}
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_pages(directory: str = os.path.join(FIXTURES, "pages")):
+    """Serve the saved pages on a free local port; yields the base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def render_fixtures(workdir: str, base_url: str, llm_latency=None):
+    """Copy the fixture inputs, recording and search results into `workdir`, pointing them at `base_url`"""
+    for relative in ["input/about-me.md", "input/志望動機_instructions.md", "input/companies.json", "recording.json", "search_results.json"]:
+        with open(os.path.join(FIXTURES, relative), "r", encoding="utf-8") as f:
+            text = f.read().replace("{base_url}", base_url)
+        if relative == "recording.json" and llm_latency is not None:
+            recording = json.loads(text)
+            recording["latency"] = llm_latency
+            text = json.dumps(recording, ensure_ascii=False)
+        target = os.path.join(workdir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def reset_outputs():
+    """Cold start for the next run: empty LLM cache, page cache and job store"""
+    from job_store import STORE_PATH
+    from llm_cache import get_default_cache
+
+    get_default_cache().clear()
+    for path in ["output/cache/pages", "output/stores"]:
+        shutil.rmtree(path, ignore_errors=True)
+    # The default store (JobStore() without a path) and SQLite's side files
+    for suffix in ["", "-wal", "-shm", "-journal"]:
+        if os.path.exists(STORE_PATH + suffix):
+            os.remove(STORE_PATH + suffix)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where `resource` is missing)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KB elsewhere
+
+
+# Scenarios: async functions of (base_url, run index) returning (items processed, items failed)
+
+async def scenario_main(base_url: str, run: int):
+    import main
+    from rate_limiter import default_limiter
+
+    main.PROVIDER, main.MODEL, main.ROUTER_BACKENDS = "replay", os.path.abspath("recording.json"), None
+    default_limiter.host_limits = {urlparse(base_url).netloc: BENCH_LIMIT}
+    results = await main.main(batch=True) or {}
+    return len(results), sum(1 for filename in results.values() if not filename)
+
+
+def _searcher(base_url: str, run: int):
+    from japan_job_search import JapanJobSearcher
+    from job_store import JobStore
+    from main import get_llm
+    from rate_limiter import RateLimiter
+
+    os.makedirs("output/stores", exist_ok=True)
+    # search_japanese_platform launches agents on run_agent's default "google" bucket
+    limiter = RateLimiter(host_limits={urlparse(base_url).netloc: BENCH_LIMIT}, llm_limits={"google": BENCH_LIMIT})
+    return JapanJobSearcher(
+        limiter=limiter, store=JobStore(f"output/stores/jobs_{run}.sqlite"),
+        llm=get_llm("replay", os.path.abspath("recording.json")),
+    )
+
+
+async def scenario_japan_search(base_url: str, run: int):
+    searcher = _searcher(base_url, run)
+    platforms = [(name, f"{base_url}/platforms/{slug}.html") for name, slug in PLATFORMS]
+    try:
+        results = await searcher.comprehensive_japan_search(platforms=platforms, **SEARCH)
+    finally:
+        await searcher.pool.close()
+    failed = sum(1 for result in results.values() if isinstance(result, str) or not result.is_done())
+    return len(results), failed
+
+
+async def scenario_analysis(base_url: str, run: int):
+    searcher = _searcher(base_url, run)
+    with open("search_results.json", "r", encoding="utf-8") as f:
+        search_results = json.load(f)
+    analysis = await searcher.analyze_japan_market(search_results, **SEARCH)
+    return 1, 0 if analysis.top_skills else 1
+
+
+SCENARIOS = {"main": scenario_main, "japan_search": scenario_japan_search, "analysis": scenario_analysis}
+
+
+def run_worker(scenario: str, base_url: str, repeat: int, output: str):
+    """Child process: one warm-up and `repeat` timed cold runs of a scenario, summary written to `output`"""
+    from instrumentation import tracer
+
+    function = SCENARIOS[scenario]
+    latencies, items, failed = [], 0, 0
+    for run in range(repeat + 1):
+        reset_outputs()
+        if run == 1:
+            tracer.reset()  # Spans of the timed runs only
+        start = time.perf_counter()
+        try:
+            run_items, run_failed = asyncio.run(function(base_url, run))
+        except Exception as e:
+            print(f"❌ {scenario} run {run} failed: {e!r}")
+            run_items, run_failed = 1, 1
+        elapsed = time.perf_counter() - start
+        if run == 0:
+            continue
+        latencies.append(elapsed)
+        items += run_items
+        failed += run_failed
+
+    summary = {
+        "runs": repeat,
+        "items": items,
+        "errors": failed,
+        "p50_s": round(percentile(latencies, 0.5), 4),
+        "p95_s": round(percentile(latencies, 0.95), 4),
+        "mean_s": round(sum(latencies) / len(latencies), 4),
+        "items_per_s": round(items / sum(latencies), 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "spans": [
+            {"category": category, "name": name, "count": count, "total_s": round(total, 4), "p95_ms": round(p95, 2)}
+            for category, name, count, total, _, p95, _, _ in tracer.summary_rows()[:10]
+        ],
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+def git_commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run_scenarios(scenarios: list, repeat: int, llm_latency=None, verbose: bool = False) -> dict:
+    results = {
+        **git_commit(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "repeat": repeat,
+        "llm_latency": llm_latency,
+        "scenarios": {},
+    }
+    with serve_pages() as base_url:
+        for scenario in scenarios:
+            workdir = tempfile.mkdtemp(prefix=f"bench_{scenario}_")
+            try:
+                render_fixtures(workdir, base_url, llm_latency)
+                output = os.path.join(workdir, "summary.json")
+                print(f"⏱️ {scenario}: 1 warm-up + {repeat} runs...")
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--worker", scenario, "--base-url", base_url, "--repeat", str(repeat), "--output", output],
+                    cwd=workdir, stdout=None if verbose else subprocess.DEVNULL, stderr=None if verbose else subprocess.DEVNULL,
+                    env={**os.environ, "ANONYMIZED_TELEMETRY": "false"},  # browser-use telemetry would go to the network
+                )
+                if completed.returncode != 0 or not os.path.exists(output):
+                    print(f"❌ {scenario}: worker exited with code {completed.returncode} (rerun with --verbose)")
+                    continue
+                with open(output, "r", encoding="utf-8") as f:
+                    results["scenarios"][scenario] = json.load(f)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_results(results: dict):
+    print(f"\n{'scenario':<14} {'runs':>5} {'errors':>7} {'p50 s':>9} {'p95 s':>9} {'items/s':>9} {'peak RSS MB':>12}")
+    for scenario, summary in results["scenarios"].items():
+        print(
+            f"{scenario:<14} {summary['runs']:>5} {summary['errors']:>7} {summary['p50_s']:>9.3f} {summary['p95_s']:>9.3f} "
+            f"{summary['items_per_s']:>9.2f} {summary['peak_rss_mb'] or '-':>12}"
+        )
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print the change against an earlier results file; returns the metrics that got worse by more than `threshold`"""
+    print(f"\nCompared with {(baseline.get('commit') or 'unknown')[:12]} ({baseline.get('created')}):")
+    regressions = []
+    for scenario, summary in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        for metric, higher_is_better in [("p50_s", False), ("p95_s", False), ("items_per_s", True), ("peak_rss_mb", False)]:
+            old, new = before.get(metric), summary.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            marker = "❌" if worse > threshold else "✅"
+            print(f"  {marker} {scenario} {metric}: {old:g} -> {new:g} ({change:+.1%})")
+            if worse > threshold:
+                regressions.append(f"{scenario}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="Scenarios to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario (after one warm-up)")
+    parser.add_argument("--llm-latency", type=float, help="Seconds per replayed LLM call (default: the recording's)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression in --compare")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the scenario runs")
+    parser.add_argument("--worker", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.base_url, args.repeat, args.output)
+        return
+
+    results = run_scenarios(args.scenarios, args.repeat, args.llm_latency, args.verbose)
+    print_results(results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{(results['commit'] or 'nogit')[:12]}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"📁 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
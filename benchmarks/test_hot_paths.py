@@ -0,0 +1,84 @@
+"""
+Micro-benchmarks of extract_and_save_markdown and parse_openrouter_response
+over the generated corpus (see corpus.py), with latency per call and
+tracemalloc allocations:
+
+    python -m pytest benchmarks -q
+    python -m pytest benchmarks --benchmark-save=before   # with pytest-benchmark
+
+Each benchmark also checks the output, so a faster version that extracts or
+cleans something different fails instead of looking like a win.
+"""
+
+import contextlib
+import glob
+import io
+import itertools
+import os
+
+import pytest
+
+from corpus import HISTORY_SIZES, SHAPES, agent_history, final_markdown, openrouter_outputs
+from markdown_extractor import extract_and_save_markdown
+from openrouter_parser import _SPECIAL_TOKENS_RE, parse_openrouter_response, scrub_response
+
+
+def _quiet(function):
+    """The function with its progress prints swallowed (printing would dominate the small cases)"""
+    def call(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args, **kwargs)
+    return call
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("steps", HISTORY_SIZES)
+def test_extract_and_save_markdown(benchmark, allocations, steps, shape):
+    history = agent_history(steps, shape)
+    # A new prefix per call: log and result names only have second resolution, so repeated calls would share them
+    prefixes = (f"bench_{n}" for n in itertools.count())
+    extract = _quiet(extract_and_save_markdown)
+
+    benchmark.pedantic(lambda: extract(history, filename_prefix=next(prefixes)), rounds=3 if steps >= 10_000 else 10)
+    prefix = next(prefixes)
+    peak, _ = allocations(extract, history, filename_prefix=prefix)
+
+    [md_filename] = glob.glob(f"output/result/{prefix}_*.md")
+    [log_filename] = glob.glob(f"output/log/{prefix}_log_*.jsonl")
+    with open(md_filename, "r", encoding="utf-8") as f:
+        assert f.read() == final_markdown(steps)
+    log_bytes = os.path.getsize(log_filename)
+    benchmark.extra_info.update(steps=steps, log_bytes=log_bytes)
+
+    # The log is written step by step: the whole history is never serialized into one string
+    if steps >= 1_000:
+        assert peak < log_bytes / 2, f"peak allocation {peak:,} B for a {log_bytes:,} B log"
+
+
+@pytest.mark.parametrize("kind", ["plain", "tokens", "joined_tokens"])
+def test_parse_openrouter_response_call(benchmark, allocations, kind):
+    # The longest response of each kind in the corpus (corpus.openrouter_outputs cycles through them)
+    text = max(openrouter_outputs()[["plain", "tokens", "joined_tokens"].index(kind)::3], key=len)
+    parse = _quiet(parse_openrouter_response)
+
+    cleaned = benchmark(parse, text)
+    peak, _ = allocations(parse, text)
+    benchmark.extra_info.update(chars=len(text))
+
+    assert cleaned == scrub_response(text)[0]
+    assert _SPECIAL_TOKENS_RE.search(cleaned) is None
+    assert (_SPECIAL_TOKENS_RE.search(text) is None) == (kind == "plain")
+    # A few working copies of the response at most (4 bytes per character covers any string kind)
+    assert peak < 4 * 4 * len(text) + 16 * 1024, f"peak allocation {peak:,} B for {len(text):,} chars"
+
+
+def test_parse_openrouter_response_corpus(benchmark, allocations):
+    corpus = openrouter_outputs()
+    parse = _quiet(lambda texts: [parse_openrouter_response(text) for text in texts])
+
+    cleaned = benchmark(parse, corpus)
+    allocations(parse, corpus)
+    benchmark.extra_info.update(responses=len(corpus), chars=sum(map(len, corpus)))
+
+    assert cleaned == [scrub_response(text)[0] for text in corpus]
+    assert not any(_SPECIAL_TOKENS_RE.search(text) for text in cleaned)
@@ -0,0 +1,106 @@
+"""
+Shared browser for all agents in a run.
+
+Without a pool every browser-use Agent launches its own Chromium, and the cold
+start is a large share of the wall time of short tasks. BrowserPool launches
+Chromium once and lends each task its own browser context:
+
+- at most `max_contexts` contexts are out at the same time (borrowers queue)
+- a context is closed when it is returned, so cookies, local storage and cache
+  never leak from one task into the next (contexts are cheap, the browser is not)
+- the browser is health-checked on every borrow and relaunched if it died
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from browser_use import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+
+
+class BrowserPool:
+    """
+    Pool of isolated browser contexts on top of one shared Browser.
+
+    Args:
+        max_contexts: Maximum number of contexts lent out at the same time
+        browser_config: BrowserConfig for the shared browser
+        context_config: BrowserContextConfig for every borrowed context
+    """
+
+    def __init__(self, max_contexts: int = 3, browser_config: Optional[BrowserConfig] = None, context_config: Optional[BrowserContextConfig] = None):
+        self.max_contexts = max(1, max_contexts)
+        self.browser_config = browser_config or BrowserConfig()
+        self.context_config = context_config
+        self.browser: Optional[Browser] = None
+        self.launches = 0
+        self.borrowed = 0
+        self.in_use = 0
+        self._slots = asyncio.Semaphore(self.max_contexts)
+        self._lock = asyncio.Lock()
+
+    async def _healthy(self) -> bool:
+        if self.browser is None or self.browser.playwright_browser is None:
+            return False
+        try:
+            return self.browser.playwright_browser.is_connected()
+        except Exception:
+            return False
+
+    async def get_browser(self) -> Browser:
+        """Return the shared browser, launching or relaunching it when needed"""
+        async with self._lock:
+            if not await self._healthy():
+                if self.browser is not None:
+                    print("⚠️ Pooled browser is not responding, relaunching...")
+                    try:
+                        await self.browser.close()
+                    except Exception:
+                        pass
+                self.browser = Browser(config=self.browser_config)
+                await self.browser.get_playwright_browser()
+                self.launches += 1
+            return self.browser
+
+    async def acquire(self) -> BrowserContext:
+        """Borrow a fresh, isolated browser context (waits while `max_contexts` are in use)"""
+        await self._slots.acquire()
+        try:
+            browser = await self.get_browser()
+            context = await browser.new_context(self.context_config)
+        except Exception:
+            self._slots.release()
+            raise
+        self.borrowed += 1
+        self.in_use += 1
+        return context
+
+    async def release(self, context: BrowserContext):
+        """Return a borrowed context; it is closed so nothing leaks into the next task"""
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"Warning: Could not close browser context cleanly: {e}")
+        finally:
+            self.in_use -= 1
+            self._slots.release()
+
+    @asynccontextmanager
+    async def context(self):
+        """`async with pool.context() as browser_context:` borrow/return helper"""
+        browser_context = await self.acquire()
+        try:
+            yield browser_context
+        finally:
+            await self.release(browser_context)
+
+    async def close(self):
+        """Close the shared browser"""
+        async with self._lock:
+            if self.browser is not None:
+                await self.browser.close()
+                self.browser = None
+
+    def print_stats(self):
+        print(f"🌎 Browser pool: {self.launches} browser launch(es) for {self.borrowed} agent context(s)")
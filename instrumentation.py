@@ -0,0 +1,211 @@
+"""
+Lightweight timing spans for the hot paths of a run.
+
+Spans are recorded for:
+- browser launch and new browser contexts (browser-use's Browser / BrowserContext)
+- every browser action, navigations (go_to_url, open_tab, ...) in their own category
+- every LLM call, with estimated input and reported total tokens (any model built
+  with llm_limiter.rate_limited, which every script uses)
+- parse_openrouter_response, markdown extraction and log / result serialization
+- whole agent runs
+
+At the end of a run `report()` prints a per-phase summary table and writes a
+Chrome trace (`output/trace/<run>_<timestamp>.json`), which opens in
+chrome://tracing or https://ui.perfetto.dev:
+
+    with span("job_records.parse", "extract", platform=platform):
+        ...
+
+    @traced("extract", "extract")
+    async def extract(...): ...
+
+Recording a span costs a couple of microseconds, so it stays on.
+"""
+
+import asyncio
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+TRACE_DIR = "output/trace"
+# browser-use actions that load a page
+NAVIGATION_ACTIONS = {"go_to_url", "open_tab", "search_google", "go_back"}
+
+
+class Tracer:
+    """Collects finished spans of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+            self.started_at = datetime.datetime.now()
+            self._lanes = {}
+
+    def _lane(self) -> int:
+        """Trace row of the caller: one per asyncio task (or thread), so nested spans line up"""
+        try:
+            key = id(asyncio.current_task())
+        except RuntimeError:
+            key = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def record(self, name: str, category: str, start: float, end: float, lane: Optional[int] = None, **attrs):
+        """Add a finished span; `start`/`end` are time.perf_counter() values"""
+        entry = (name, category, start - self.origin, end - start, lane or self._lane(), attrs)
+        with self._lock:
+            self.spans.append(entry)
+
+    @contextmanager
+    def span(self, name: str, category: str = "app", **attrs):
+        """Time the body; the yielded dict can take attributes known only at the end (e.g. token counts)"""
+        lane = self._lane()
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, category, start, time.perf_counter(), lane, **attrs)
+
+    def summary_rows(self) -> list:
+        """(category, name, count, total s, mean ms, p95 ms, max ms, tokens) per span name, slowest total first"""
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for name, category, _, duration, _, attrs in spans:
+            group = groups.setdefault((category, name), {"durations": [], "tokens": 0})
+            group["durations"].append(duration)
+            group["tokens"] += attrs.get("total_tokens") or attrs.get("input_tokens") or 0
+        rows = []
+        for (category, name), group in groups.items():
+            durations = sorted(group["durations"])
+            p95 = durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+            total = sum(durations)
+            rows.append((category, name, len(durations), total, total / len(durations) * 1000, p95 * 1000, durations[-1] * 1000, group["tokens"]))
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def format_summary(self) -> str:
+        rows = self.summary_rows()
+        if not rows:
+            return "⏱️ No spans recorded"
+        wall = time.perf_counter() - self.origin
+        lines = [
+            f"⏱️ Timing summary ({wall:.1f}s wall time, spans may overlap)",
+            f"{'category':<10} {'span':<34} {'count':>6} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'tokens':>9}",
+        ]
+        for category, name, count, total, mean, p95, longest, tokens in rows:
+            lines.append(f"{category:<10} {name[:34]:<34} {count:>6} {total:>9.2f} {mean:>9.1f} {p95:>9.1f} {longest:>9.1f} {tokens or '':>9}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        """The spans as Chrome trace format ("X" complete events, microseconds)"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {"name": name, "cat": category, "ph": "X", "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "pid": pid, "tid": lane, "args": attrs}
+            for name, category, start, duration, lane, attrs in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"started_at": self.started_at.isoformat(timespec="seconds")}}
+
+    def write_trace(self, path: str) -> str:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False, default=str)
+        return path
+
+
+tracer = Tracer()
+
+
+def span(name: str, category: str = "app", **attrs):
+    """`with span(...)` on the shared tracer"""
+    return tracer.span(name, category, **attrs)
+
+
+def traced(name: Optional[str] = None, category: str = "app"):
+    """Decorator recording a span for every call of a sync or async function"""
+    def decorator(function):
+        span_name = name or function.__qualname__
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name, category):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def report(run_name: str, trace_dir: Optional[str] = TRACE_DIR) -> Optional[str]:
+    """Print the summary table and write the Chrome trace of the run. Returns the trace path."""
+    print(tracer.format_summary())
+    if not trace_dir or not tracer.spans:
+        return None
+    timestamp = tracer.started_at.strftime("%Y%m%d_%H%M%S")
+    path = tracer.write_trace(os.path.join(trace_dir, f"{run_name}_{timestamp}.json"))
+    print(f"🧭 Trace saved to {path} (open in chrome://tracing or ui.perfetto.dev)")
+    return path
+
+
+_installed = False
+
+
+def instrument_browser_use():
+    """Wrap browser-use's browser launch, context setup and action execution in spans (idempotent)"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    from browser_use import Browser
+    from browser_use.browser.context import BrowserContext
+    from browser_use.controller.service import Controller
+
+    launch = Browser._init
+
+    @functools.wraps(launch)
+    async def _init(self):
+        with tracer.span("browser.launch", "browser"):
+            return await launch(self)
+
+    initialize_session = BrowserContext._initialize_session
+
+    @functools.wraps(initialize_session)
+    async def _initialize_session(self):
+        with tracer.span("browser.new_context", "browser"):
+            return await initialize_session(self)
+
+    act = Controller.act
+
+    @functools.wraps(act)
+    async def _act(self, action, browser_context, *args, **kwargs):
+        params = action.model_dump(exclude_unset=True)
+        action_name = next(iter(params), "unknown")
+        attrs = {}
+        if isinstance(params.get(action_name), dict) and params[action_name].get("url"):
+            attrs["url"] = params[action_name]["url"]
+        category = "navigation" if action_name in NAVIGATION_ACTIONS else "action"
+        with tracer.span(f"{category}.{action_name}", category, **attrs):
+            return await act(self, action, browser_context, *args, **kwargs)
+
+    Browser._init = _init
+    BrowserContext._initialize_session = _initialize_session
+    Controller.act = _act
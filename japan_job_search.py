@@ -37,18 +37,30 @@ Staff Count Options:
 """
 
 from langchain_google_genai import ChatGoogleGenerativeAI
-from browser_use import Agent
 from dotenv import load_dotenv
 import asyncio
 import json
 import datetime
 
+from browser_pool import BrowserPool
+from instrumentation import report, span
+from llm_analysis import analyze_text, condense_results
+from job_records import STRUCTURED_OUTPUT_INSTRUCTION, format_job_stats, job_controller, records_by_platform, summarize_records
+from job_dedup import collapse_duplicates, dedupe_search_results
+from job_store import HISTORY_DAYS, JobStore, search_key
+from llm_limiter import get_scheduler, rate_limited
+from rate_limiter import default_limiter, run_agent
+
 # Read GOOGLE_API_KEY into env
 load_dotenv()
 
 class JapanJobSearcher:
-    def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash-exp')
+    def __init__(self, max_concurrency=3, limiter=None, pool=None, store=None, llm=None):
+        self.llm = llm or rate_limited(ChatGoogleGenerativeAI, get_scheduler("google", "2.0-flash-exp"))(model='gemini-2.0-flash-exp')
+        self.max_concurrency = max_concurrency  # Platforms searched at the same time
+        self.limiter = limiter or default_limiter  # Per-host and LLM provider pacing, shared with the other scripts
+        self.pool = pool or BrowserPool(max_contexts=max_concurrency)  # One shared browser for all agents
+        self.store = store or JobStore()  # Postings from earlier runs, so agents only collect new ones
         
     async def search_japanese_platform(self, platform_name, platform_url, job_role, location, japanese_level="Business", keywords=None, staff_count=None):
         """
@@ -128,16 +140,22 @@ class JapanJobSearcher:
         {f"IMPORTANT: Prioritize companies with {staff_count} employees when filtering results." if staff_count else ""}
         
         Format each job clearly and note any Japan-specific requirements or benefits.
+        {STRUCTURED_OUTPUT_INSTRUCTION}
+        
+        {self.store.known_postings_instruction(platform_name, search_key(job_role, location))}
         """
         
         print(f"🔍 Searching {platform_name} for {job_role} positions...")
-        agent = Agent(task=task, llm=self.llm)
-        result = await agent.run()
+        result = await run_agent(task, self.llm, url=platform_url, limiter=self.limiter, pool=self.pool, controller=job_controller())
         return result
 
-    async def comprehensive_japan_search(self, job_role="Web Developer", location="Tokyo", japanese_level="N2", keywords=None, staff_count=None):
+    async def comprehensive_japan_search(self, job_role="Web Developer", location="Tokyo", japanese_level="N2", keywords=None, staff_count=None, concurrent=True, platforms=None):
         """
         Comprehensive job search across Japanese platforms
+
+        With concurrent=True the platform agents run in parallel (at most
+        `max_concurrency` at a time); otherwise platforms are searched one by one.
+        `platforms` replaces the built-in (name, url) list, e.g. with saved pages served locally.
         """
         
         # 🇯🇵 Core Japanese job platforms
@@ -166,47 +184,57 @@ class JapanJobSearcher:
             print(f"Preferred Company Size: {staff_count} employees")
         print("-" * 70)
         
-        all_results = {}
-        
-        # Search Japanese platforms first
-        print("🏯 Searching Japanese platforms...")
-        for platform_name, platform_url in japanese_platforms[:3]:  # Limit to avoid rate limits
-            try:
-                result = await self.search_japanese_platform(
-                    platform_name, platform_url, job_role, location, japanese_level, keywords, staff_count
-                )
-                all_results[platform_name] = result
-                print(f"✅ {platform_name} completed")
-                await asyncio.sleep(7)  # Respectful delay
-            except Exception as e:
-                print(f"❌ {platform_name} failed: {str(e)}")
-                all_results[platform_name] = f"Search failed: {str(e)}"
+        # Japanese platforms first, then international platforms
+        if platforms is None:
+            platforms = japanese_platforms + international_platforms
         
-        # Search international platforms
-        print("\n🌍 Searching international platforms...")
-        for platform_name, platform_url in international_platforms[:2]:
+        async def search_platform(platform_name, platform_url):
             try:
                 result = await self.search_japanese_platform(
                     platform_name, platform_url, job_role, location, japanese_level, keywords, staff_count
                 )
-                all_results[platform_name] = result
                 print(f"✅ {platform_name} completed")
-                await asyncio.sleep(7)
+                return platform_name, result
             except Exception as e:
                 print(f"❌ {platform_name} failed: {str(e)}")
-                all_results[platform_name] = f"Search failed: {str(e)}"
-        
+                return platform_name, f"Search failed: {str(e)}"
+        
+        if concurrent:
+            print(f"🚀 Searching {len(platforms)} platforms concurrently (max {self.max_concurrency} at a time)...")
+            semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+            
+            async def limited_search(platform_name, platform_url):
+                async with semaphore:
+                    return await search_platform(platform_name, platform_url)
+            
+            results = await asyncio.gather(*(limited_search(name, url) for name, url in platforms))
+        else:
+            print("🏯 Searching platforms one by one...")
+            results = [await search_platform(name, url) for name, url in platforms]
+        
+        # Keep the platform order stable regardless of completion order
+        all_results = dict(results)
+        
+        # Remember what was found, so the next run only spends agent time on new postings
+        records = [record for platform_records in records_by_platform(all_results).values() for record in platform_records]
+        self.store.print_upsert_summary(self.store.upsert(records, search_key(job_role, location)))
         return all_results
     
     async def analyze_japan_market(self, search_results, job_role, location, japanese_level, keywords=None, staff_count=None):
         """
         Analyze Japan job market with cultural and linguistic insights
+        (a single LLM call, no browser)
         """
         
-        combined_results = ""
-        for platform, results in search_results.items():
-            combined_results += f"\n\n{'='*20} {platform.upper()} {'='*20}\n"
-            combined_results += str(results)
+        # The same posting listed on several platforms is collapsed first (fewer tokens, honest counts)
+        deduped_results, records = dedupe_search_results(search_results)
+        
+        # Final results only, condensed to fit the token budget (map step)
+        combined_results = await condense_results(self.llm, deduped_results)
+        
+        # Exact counts from the structured job records (this run plus stored history), so the LLM only writes the narrative
+        history = self.store.with_history(records, search_key(job_role, location))
+        job_stats = format_job_stats(collapse_duplicates(history, verbose=False))
         
         # Build search context for analysis
         search_context = f"""
@@ -231,6 +259,9 @@ class JapanJobSearcher:
         SEARCH RESULTS:
         {combined_results}
         
+        JOB STATISTICS (this run plus postings stored in the last {HISTORY_DAYS} days, computed exactly - use these numbers, don't recount):
+        {job_stats}
+        
         Provide detailed analysis covering:
         
         🇯🇵 **JAPAN MARKET OVERVIEW:**
@@ -250,8 +281,8 @@ class JapanJobSearcher:
         - Best opportunities for {japanese_level} level Japanese
         
         💻 **TECHNICAL SKILLS DEMAND:**
-        (Frequency analysis across all platforms)
-        - Programming Languages: [count and percentage]
+        (Use the precomputed skill frequencies above - don't recount)
+        - Programming Languages: [precomputed count and percentage]
         - Frameworks/Libraries: [most demanded]
         - Cloud Platforms: [AWS vs Azure vs GCP in Japan]
         - Development Tools: [popular in Japanese companies]
@@ -303,8 +334,7 @@ class JapanJobSearcher:
         """
         
         print("📊 Analyzing Japan job market comprehensively...")
-        agent = Agent(task=analysis_task, llm=self.llm)
-        analysis = await agent.run()
+        analysis = await analyze_text(self.llm, analysis_task)
         return analysis
 
 def get_search_profiles():
@@ -426,18 +456,22 @@ async def main():
         )
         
         # Step 3: Save results
+        platform_records = records_by_platform(search_results)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         results_data = {
             "search_date": datetime.datetime.now().isoformat(),
             "job_role": JOB_ROLE,
             "location": LOCATION,
             "japanese_level": JAPANESE_LEVEL,
-            "platform_results": search_results,
-            "market_analysis": analysis
+            "platform_results": {
+                platform: [record.model_dump() for record in records] for platform, records in platform_records.items()
+            },
+            "job_stats": summarize_records([record for records in platform_records.values() for record in records]),
+            "market_analysis": analysis.model_dump()
         }
         
         filename = f"japan_job_search_{JOB_ROLE.replace(' ', '_')}_{timestamp}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
+        with span("save_results", "serialize"), open(filename, 'w', encoding='utf-8') as f:
             json.dump(results_data, f, indent=2, ensure_ascii=False)
         
         # Step 4: Display results
@@ -452,6 +486,12 @@ async def main():
     except Exception as e:
         print(f"❌ Error during Japan job search: {str(e)}")
         print("Please check your internet connection and API configuration.")
+    finally:
+        searcher.pool.print_stats()
+        await searcher.pool.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        report("japan_job_search")
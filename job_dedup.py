@@ -0,0 +1,313 @@
+"""
+Near-duplicate detection for job postings found on several platforms.
+
+The same job is often listed on Doda, Green, Indeed Japan and LinkedIn Japan
+with slightly different titles, company spellings and URLs, so exact
+fingerprints (job_store.job_fingerprint) don't catch it. Here every posting is
+turned into character shingles of its normalized company and title (without
+legal-form boilerplate and location / remote tags; character n-grams work for
+Japanese text without a tokenizer), hashed into a
+MinHash signature with NumPy, and indexed with LSH banding: only postings that
+share a band bucket are compared, so a batch is deduplicated in roughly linear
+time. Candidates whose signatures agree too little are dropped in one vectorized
+comparison; the remaining pairs are confirmed with the exact Jaccard similarity of their
+title and company shingles and merged into one record per job before analysis.
+Two postings are never merged when their locations name different places
+(compared as canonical city / remote tags, platforms write them too differently
+for text similarity), or when they come from the same platform with different URLs.
+"""
+
+import json
+import re
+import unicodedata
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+from job_records import JobRecord, records_by_platform
+from job_store import normalize_url
+
+NUM_PERM = 128  # MinHash permutations (signature length)
+LSH_BANDS = 32  # NUM_PERM = bands x rows; 32 x 4 catches pairs down to ~0.4 Jaccard
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.6  # Title shingle Jaccard at or above which two postings are the same job
+COMPANY_THRESHOLD = 0.5  # ... provided their company names are at least this similar
+CANDIDATE_THRESHOLD = 0.5  # Minimum estimated (signature) Jaccard of an LSH candidate before the exact check
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Company-name boilerplate that differs between platforms ("株式会社メルカリ" / "メルカリ", "Mercari, Inc." / "Mercari")
+_COMPANY_SUFFIXES = re.compile(
+    r"株式会社|有限会社|合同会社|\(株\)|（株）|\b(?:inc|incorporated|co|ltd|llc|corp|corporation|k\s?k|gk|japan|jp)\b",
+    re.IGNORECASE,
+)
+# Location and work-style tags platforms add to titles ("(Tokyo)", "- Remote OK", "【フルリモート可】").
+# Left in, they make different roles look alike: "Backend Engineer (Tokyo)" / "Frontend Engineer (Tokyo)".
+_TITLE_TAGS = re.compile(
+    r"\b(?:full[ -]?remote|remote(?:[ -]?(?:ok|friendly|first|possible))?|hybrid|on[ -]?site|tokyo|osaka|kyoto|fukuoka|nagoya|yokohama|japan)\b"
+    r"|(?:フルリモート|リモート(?:ワーク)?|在宅(?:勤務)?)可?|ハイブリッド|東京都?|大阪府?|京都|福岡|名古屋|横浜",
+    re.IGNORECASE,
+)
+# Canonical place -> spellings, for telling "Tokyo" / "東京都" apart from "Osaka" or a remote-only posting
+_PLACES = {
+    "tokyo": ["tokyo", "東京"],
+    "osaka": ["osaka", "大阪"],
+    "kyoto": ["kyoto", "京都"],
+    "fukuoka": ["fukuoka", "福岡"],
+    "nagoya": ["nagoya", "名古屋"],
+    "yokohama": ["yokohama", "横浜"],
+    "sapporo": ["sapporo", "札幌"],
+    "remote": ["remote", "リモート", "在宅", "テレワーク"],
+}
+_PLACE_PATTERN = re.compile(
+    "|".join(f"(?P<{place}>{'|'.join(map(re.escape, spellings))})" for place, spellings in _PLACES.items()),
+    re.IGNORECASE,
+)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def normalize_company(company: str) -> str:
+    """Company name without legal-form boilerplate ("株式会社メルカリ" -> "メルカリ")"""
+    return _normalize(_COMPANY_SUFFIXES.sub(" ", unicodedata.normalize("NFKC", company or "")))
+
+
+def normalize_title(title: str) -> str:
+    """Job title without location and work-style tags ("Backend Engineer (Tokyo) - Remote OK" -> "backend engineer")"""
+    return _normalize(_TITLE_TAGS.sub(" ", unicodedata.normalize("NFKC", title or "")))
+
+
+def normalize_location(location: str) -> frozenset:
+    """
+    Places a location names ("東京都 (リモート可)" -> {"tokyo", "remote"}); other
+    locations are kept as their normalized text, and an empty location gives an empty set.
+    """
+    text = unicodedata.normalize("NFKC", location or "")
+    places = frozenset(match.lastgroup for match in _PLACE_PATTERN.finditer(text))
+    return places or frozenset(filter(None, [_normalize(text)]))
+
+
+def posting_text(record: JobRecord) -> str:
+    """The text that identifies a posting: normalized company and title"""
+    return f"{normalize_company(record.company)} | {normalize_title(record.title)}"
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Character n-grams of `text` (whitespace collapsed)"""
+    text = re.sub(r"\s+", " ", text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    MinHash signatures with universal hashing ((a * x + b) mod p) over 32-bit shingle hashes.
+
+    Args:
+        num_perm: Number of hash functions (signature length)
+        seed: Seed for the hash function parameters, fixed so signatures are stable across runs
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a, b < 2^29 keeps a * x + b (x < 2^32) inside uint64
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        return self.signatures([shingle_set])[0]
+
+    def signatures(self, shingle_sets: List[set], chunk_size: int = 16_384) -> np.ndarray:
+        """Signatures of many shingle sets at once, shape (len(shingle_sets), num_perm)"""
+        result = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(shingle_sets):
+            # Hash a chunk of sets in one (num_perm x shingles) array, then take the
+            # minimum over each set's segment
+            end, total = start, 0
+            while end < len(shingle_sets) and (total == 0 or total + len(shingle_sets[end]) <= chunk_size):
+                total += len(shingle_sets[end])
+                end += 1
+            chunk = shingle_sets[start:end]
+            hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for shingle_set in chunk for s in shingle_set), dtype=np.uint64, count=total)
+            values = ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+            offsets = np.cumsum([0] + [len(shingle_set) for shingle_set in chunk[:-1]])
+            result[start:end] = np.minimum.reduceat(values, offsets, axis=1).T
+            start = end
+        return result
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures: two items are candidates when all rows of
+    at least one band are equal.
+
+    Args:
+        num_perm: Signature length
+        bands: Number of bands (num_perm must be divisible by it)
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Random odd multipliers that fold the rows of a band into one 64-bit bucket key
+        self._fold = np.random.default_rng(0).integers(1, 1 << 62, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+    def candidate_pairs(self, signatures: np.ndarray) -> tuple:
+        """
+        All pairs sharing at least one band bucket.
+
+        Args:
+            signatures: Array of shape (items, num_perm)
+
+        Returns:
+            (first, second): index arrays with first < second, each pair once
+        """
+        count = len(signatures)
+        banded = signatures.astype(np.uint64).reshape(count, self.bands, self.rows)
+        firsts, seconds = [], []
+        for band in range(self.bands):
+            keys = (banded[:, band, :] * self._fold).sum(axis=1)  # wraps around, which is fine for hashing
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            # Items with equal keys are adjacent after sorting; pair every item with the ones
+            # `offset` places further along the same run
+            offset = 1
+            while offset < count:
+                same = sorted_keys[offset:] == sorted_keys[:-offset]
+                if not same.any():
+                    break
+                firsts.append(order[:-offset][same])
+                seconds.append(order[offset:][same])
+                offset += 1
+        if not firsts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        codes = np.unique(np.minimum(first, second) * count + np.maximum(first, second))
+        return codes // count, codes % count
+
+
+def find_duplicate_groups(records: List[JobRecord], threshold: float = DUPLICATE_THRESHOLD) -> List[List[int]]:
+    """
+    Group indices of postings that describe the same job.
+
+    Returns:
+        Lists of record indices, one list per job (singletons included), in first-seen order
+    """
+    hasher, index = MinHasher(), LSHIndex()
+    signatures = hasher.signatures([shingles(posting_text(record)) for record in records])
+    parent = list(range(len(records)))
+    # Per group root: the places every member's location names (empty = no location
+    # known yet) and the URL seen on each platform; groups that conflict stay apart
+    places = [normalize_location(record.location) for record in records]
+    urls = [{record.platform: normalize_url(record.url)} if record.platform and record.url else {} for record in records]
+
+    def compatible(a, b):
+        if places[a] and places[b] and not places[a] & places[b]:
+            return False
+        return all(urls[b].get(platform, url) == url for platform, url in urls[a].items())
+
+    def union(a, b):
+        root, child = min(a, b), max(a, b)
+        parent[child] = root
+        places[root] = places[a] & places[b] if places[a] and places[b] else places[a] or places[b]
+        urls[root] = {**urls[child], **urls[root]}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Drop candidates whose signatures agree too little, then confirm the rest exactly
+    first, second = index.candidate_pairs(signatures)
+    estimated = (signatures[first] == signatures[second]).mean(axis=1)
+    first, second = first[estimated >= CANDIDATE_THRESHOLD], second[estimated >= CANDIDATE_THRESHOLD]
+    title_sets, company_sets = {}, {}
+    for i, j in zip(first.tolist(), second.tolist()):
+        for k in (i, j):
+            if k not in title_sets:
+                title_sets[k] = shingles(normalize_title(records[k].title))
+                company_sets[k] = shingles(normalize_company(records[k].company))
+        a, b = find(i), find(j)
+        if (
+            a != b
+            and compatible(a, b)
+            and jaccard(title_sets[i], title_sets[j]) >= threshold
+            and jaccard(company_sets[i], company_sets[j]) >= COMPANY_THRESHOLD
+        ):
+            union(a, b)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(records)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _merge(records: List[JobRecord]) -> JobRecord:
+    """One record per job: the most complete copy, with missing fields filled from the others"""
+    def filled(record):
+        return sum(1 for value in record.model_dump().values() if value not in (None, "", []))
+
+    merged = max(records, key=filled).model_copy(deep=True)
+    for record in records:
+        for field in ("company", "location", "salary_min_jpy", "salary_max_jpy", "japanese_level", "url"):
+            if getattr(merged, field) in (None, "") and getattr(record, field) not in (None, ""):
+                setattr(merged, field, getattr(record, field))
+        known = {skill.lower() for skill in merged.skills}
+        for skill in record.skills:
+            if skill.lower() not in known:
+                merged.skills.append(skill)
+                known.add(skill.lower())
+    return merged
+
+
+def collapse_duplicates(records: List[JobRecord], threshold: float = DUPLICATE_THRESHOLD, verbose: bool = True) -> List[JobRecord]:
+    """Collapse near-duplicate postings into one merged record each"""
+    groups = find_duplicate_groups(records, threshold)
+    collapsed = [_merge([records[i] for i in group]) if len(group) > 1 else records[group[0]] for group in groups]
+    if verbose and len(collapsed) < len(records):
+        print(f"🧹 Dedup: {len(records)} -> {len(collapsed)} postings ({len(records) - len(collapsed)} cross-platform copies collapsed)")
+    return collapsed
+
+
+def dedupe_search_results(search_results: dict, threshold: float = DUPLICATE_THRESHOLD) -> tuple:
+    """
+    Collapse cross-platform copies in per-platform agent results before analysis.
+
+    Platforms whose results parsed into job records get the JSON of their
+    remaining (merged) records in place of the agent output; the rest are
+    passed through unchanged.
+
+    Returns:
+        (results, records): platform -> results for condense_results, and the deduplicated JobRecords
+    """
+    platform_records = records_by_platform(search_results)
+    flat = [record for records in platform_records.values() for record in records]
+    collapsed = collapse_duplicates(flat, threshold)
+
+    kept: Dict[str, List[JobRecord]] = {}
+    for record in collapsed:
+        kept.setdefault(record.platform, []).append(record)
+    results = {}
+    for platform, result in search_results.items():
+        if platform_records.get(platform):
+            jobs = [record.model_dump(exclude={"platform"}, exclude_none=True) for record in kept.get(platform, [])]
+            results[platform] = json.dumps({"jobs": jobs}, ensure_ascii=False)
+        else:
+            results[platform] = result
+    return results, collapsed
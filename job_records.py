@@ -0,0 +1,234 @@
+"""
+Typed job records for everything the search agents collect.
+
+The search agents return their jobs through a browser-use Controller with
+`output_model=JobPostings`, so the final result is JSON that parses straight
+into JobRecord objects. Counts and frequencies are then computed locally
+instead of by the LLM.
+"""
+
+import json
+import re
+import statistics
+from collections import Counter
+from typing import List, Optional
+
+from browser_use import Controller
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from instrumentation import traced
+from llm_analysis import final_results_text
+from skill_analytics import format_skill_analytics, keyword_pairs, skill_frequencies, skill_matrix
+
+# Multipliers for Japanese salary notation
+_JPY_UNITS = {"万": 10_000, "千": 1_000, "億": 100_000_000, "k": 1_000, "m": 1_000_000}
+_AMOUNT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(万|千|億|k|m)?", re.IGNORECASE)
+_FOREIGN_CURRENCY_PATTERN = re.compile(r"\$|usd|€|eur|£|gbp", re.IGNORECASE)
+
+
+def parse_salary_jpy(value) -> Optional[int]:
+    """
+    Parse one yearly JPY amount such as 5000000, "¥5,000,000", "500万円" or "5.5m".
+    Returns None for empty values and other currencies.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).replace(",", "").replace("，", "").strip()
+    if not text or _FOREIGN_CURRENCY_PATTERN.search(text):
+        return None
+    match = _AMOUNT_PATTERN.search(text)
+    if not match:
+        return None
+    amount = float(match.group(1))
+    unit = (match.group(2) or "").lower()
+    return int(amount * _JPY_UNITS.get(unit, 1))
+
+
+def parse_salary_range_jpy(text) -> tuple:
+    """Parse a range such as "400万円〜600万円", "400〜600万円" or "¥4,000,000 - ¥6,000,000" into (min, max)"""
+    if text is None:
+        return None, None
+    parts = re.split(r"\s*(?:〜|~|～|-|–|—|\bto\b)\s*", str(text).replace(",", ""), maxsplit=1)
+    if len(parts) == 1:
+        amount = parse_salary_jpy(parts[0])
+        return amount, amount
+    low_text, high_text = parts
+    # "400〜600万円" - the unit is only written once
+    high_match = _AMOUNT_PATTERN.search(high_text)
+    if high_match and high_match.group(2) and not re.search(r"[万千億km]", low_text, re.IGNORECASE):
+        low_text += high_match.group(2)
+    return parse_salary_jpy(low_text), parse_salary_jpy(high_text)
+
+
+class JobRecord(BaseModel):
+    """One job posting"""
+
+    title: str = Field(description="Job title (English and Japanese if both are shown)")
+    company: str = Field(default="", description="Company name")
+    location: str = Field(default="", description="Location, including Remote/Hybrid/On-site")
+    salary_min_jpy: Optional[int] = Field(default=None, description="Minimum yearly salary in JPY as an integer, e.g. 4000000")
+    salary_max_jpy: Optional[int] = Field(default=None, description="Maximum yearly salary in JPY as an integer, e.g. 6000000")
+    japanese_level: Optional[str] = Field(default=None, description="Required Japanese level: N1-N5, Business, Native or None")
+    skills: List[str] = Field(default_factory=list, description="Technical skills, languages, frameworks, tools and clouds mentioned")
+    url: Optional[str] = Field(default=None, description="Link to the job posting")
+    platform: Optional[str] = Field(default=None, description="Job platform the posting was found on")
+
+    @field_validator("salary_min_jpy", "salary_max_jpy", mode="before")
+    @classmethod
+    def _parse_salary(cls, value):
+        return parse_salary_jpy(value)
+
+    @field_validator("skills", mode="before")
+    @classmethod
+    def _split_skills(cls, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [skill.strip() for skill in re.split(r"[,、/;]", value) if skill.strip()]
+        return value
+
+
+class JobPostings(BaseModel):
+    """Structured output of a job search agent"""
+
+    jobs: List[JobRecord] = Field(default_factory=list)
+
+
+def job_controller() -> Controller:
+    """Controller whose done action returns JobPostings JSON"""
+    return Controller(output_model=JobPostings)
+
+
+# Task instruction shared by every search prompt
+STRUCTURED_OUTPUT_INSTRUCTION = (
+    "Return every job you found in the structured `jobs` output of the done action: "
+    "title, company, location, yearly salary in JPY as integers (salary_min_jpy/salary_max_jpy), "
+    "japanese_level, a list of skills and the posting URL. Leave unknown fields empty."
+)
+
+
+def _json_candidates(text: str):
+    for match in re.finditer(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL):
+        yield match.group(1)
+    start = text.find("{")
+    if start != -1:
+        yield text[start:text.rfind("}") + 1]
+    start = text.find("[")
+    if start != -1:
+        yield text[start:text.rfind("]") + 1]
+
+
+def _parse_key_value_blocks(text: str) -> list:
+    """Fallback for free-text output such as "Title: ...\\nCompany: ..." blocks"""
+    keys = {
+        "title": "title", "job title": "title", "company": "company", "company name": "company",
+        "location": "location", "salary": "salary", "salary range": "salary", "japanese level": "japanese_level",
+        "japanese language level required": "japanese_level", "skills": "skills", "url": "url", "job url": "url",
+    }
+    records, current = [], {}
+    for line in text.splitlines():
+        match = re.match(r"^\s*[-*•]?\s*\**([A-Za-z /]+?)\**\s*[:：]\s*(.+)$", line)
+        if not match:
+            continue
+        key = keys.get(match.group(1).strip().lower())
+        if not key:
+            continue
+        if key == "title" and current.get("title"):
+            records.append(current)
+            current = {}
+        current[key] = match.group(2).strip()
+    if current.get("title"):
+        records.append(current)
+
+    for record in records:
+        record["salary_min_jpy"], record["salary_max_jpy"] = parse_salary_range_jpy(record.pop("salary", None))
+    return records
+
+
+@traced("parse_job_records", "extract")
+def parse_job_records(result, platform: Optional[str] = None) -> List[JobRecord]:
+    """
+    Parse an agent's final output into JobRecords.
+
+    Accepts an AgentHistoryList (or anything final_results_text understands).
+    Structured JobPostings JSON (or a JSON list of jobs) is used when present,
+    free-text "Key: value" blocks are the fallback. Errors and unparsable output
+    give an empty list.
+    """
+    text = final_results_text(result)
+    if not text:
+        return []
+
+    raw_jobs = None
+    for candidate in _json_candidates(text):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        jobs = data.get("jobs") if isinstance(data, dict) else data
+        if isinstance(jobs, list):
+            raw_jobs = jobs
+            break
+        # Some other JSON (e.g. an object without "jobs"): try the next candidate
+    if raw_jobs is None:
+        raw_jobs = _parse_key_value_blocks(text)
+
+    records = []
+    for raw_job in raw_jobs:
+        if not isinstance(raw_job, dict):
+            continue
+        try:
+            record = JobRecord.model_validate(raw_job)
+        except ValidationError:
+            continue
+        if platform and not record.platform:
+            record.platform = platform
+        records.append(record)
+    return records
+
+
+def records_by_platform(search_results: dict) -> dict:
+    """Mapping of platform -> JobRecords for a dict of platform -> agent result"""
+    return {platform: parse_job_records(result, platform) for platform, result in search_results.items()}
+
+
+def summarize_records(records: List[JobRecord], matrix=None) -> dict:
+    """Exact job statistics computed locally; `matrix` is an optional precomputed skill_matrix(records)"""
+    matrix = matrix or skill_matrix(records)
+    salaries_min = [r.salary_min_jpy for r in records if r.salary_min_jpy]
+    salaries_max = [r.salary_max_jpy for r in records if r.salary_max_jpy]
+    return {
+        "total_jobs": len(records),
+        "jobs_per_platform": dict(Counter(r.platform or "unknown" for r in records)),
+        "companies": len({r.company.strip().lower() for r in records if r.company}),
+        "salary_min_jpy": min(salaries_min) if salaries_min else None,
+        "salary_max_jpy": max(salaries_max) if salaries_max else None,
+        "salary_median_jpy": int(statistics.median(salaries_min + salaries_max)) if salaries_min or salaries_max else None,
+        "japanese_levels": dict(Counter(r.japanese_level or "not stated" for r in records)),
+        "remote_jobs": sum(1 for r in records if re.search(r"remote|リモート|在宅", r.location, re.IGNORECASE)),
+        "skills": [{"skill": skill, "count": count, "share": round(share, 3)} for skill, count, share in skill_frequencies(records, matrix)],
+        "keyword_pairs": keyword_pairs(records, matrix=matrix),
+    }
+
+
+def format_job_stats(records: List[JobRecord], top_skills: int = 25) -> str:
+    """Statistics as prompt text, so the LLM only has to write the narrative"""
+    matrix = skill_matrix(records)
+    stats = summarize_records(records, matrix)
+    if not stats["total_jobs"]:
+        return "No structured job records were collected."
+
+    def yen(value):
+        return f"¥{value:,}" if value else "n/a"
+
+    lines = [
+        f"- Total jobs: {stats['total_jobs']} from {stats['companies']} companies",
+        "- Jobs per platform: " + ", ".join(f"{platform}: {count}" for platform, count in stats["jobs_per_platform"].items()),
+        f"- Yearly salary (JPY): min {yen(stats['salary_min_jpy'])}, median {yen(stats['salary_median_jpy'])}, max {yen(stats['salary_max_jpy'])}",
+        "- Japanese level: " + ", ".join(f"{level}: {count}" for level, count in stats["japanese_levels"].items()),
+        f"- Remote jobs: {stats['remote_jobs']}",
+        format_skill_analytics(records, top_skills=top_skills, matrix=matrix),
+    ]
+    return "\n".join(lines)
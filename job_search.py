@@ -1,23 +1,34 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
-from browser_use import Agent
 from dotenv import load_dotenv
 import asyncio
 import json
 import datetime
 from typing import List, Dict, Any, Optional
 
+from browser_pool import BrowserPool
+from instrumentation import report, span
+from llm_limiter import get_scheduler, rate_limited
+from rate_limiter import run_agent
+from llm_analysis import analyze_text, condense_results
+from job_records import STRUCTURED_OUTPUT_INSTRUCTION, format_job_stats, job_controller, records_by_platform, summarize_records
+from job_dedup import collapse_duplicates, dedupe_search_results
+from job_store import HISTORY_DAYS, JobStore, search_key
+
 # Read GOOGLE_API_KEY into env
 load_dotenv()
 
 class JobSearchAgent:
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash-exp')
+        self.llm = rate_limited(ChatGoogleGenerativeAI, get_scheduler("google", "2.0-flash-exp"))(model='gemini-2.0-flash-exp')
         self.search_results = []
+        self.pool = BrowserPool()  # One shared browser for all agents
+        self.store = JobStore()  # Postings from earlier runs, so agents only collect new ones
     
     async def search_jobs(self, job_title: str, location: str = "", remote_ok: bool = True, max_jobs: int = 10):
         """
         Search for jobs on multiple platforms and return structured results
         """
+        search = search_key(job_title, location)
         
         # LinkedIn job search
         linkedin_task = f"""
@@ -37,11 +48,10 @@ class JobSearchAgent:
         
         Format the output as a structured list where each job is clearly separated.
         Focus on technical skills, programming languages, frameworks, and tools mentioned.
-        """
+        {STRUCTURED_OUTPUT_INSTRUCTION}
         
-        print(f"🔍 Searching LinkedIn for {job_title} positions...")
-        linkedin_agent = Agent(task=linkedin_task, llm=self.llm)
-        linkedin_results = await linkedin_agent.run()
+        {self.store.known_postings_instruction("LinkedIn", search)}
+        """
         
         # Indeed job search
         indeed_task = f"""
@@ -61,11 +71,21 @@ class JobSearchAgent:
         
         Format the output as a structured list where each job is clearly separated.
         Focus on technical skills, programming languages, frameworks, and tools mentioned.
+        {STRUCTURED_OUTPUT_INSTRUCTION}
+        
+        {self.store.known_postings_instruction("Indeed", search)}
         """
         
-        print(f"🔍 Searching Indeed for {job_title} positions...")
-        indeed_agent = Agent(task=indeed_task, llm=self.llm)
-        indeed_results = await indeed_agent.run()
+        # Both platforms run at the same time - the shared rate limiter paces them per host
+        print(f"🔍 Searching LinkedIn and Indeed for {job_title} positions...")
+        linkedin_results, indeed_results = await asyncio.gather(
+            run_agent(linkedin_task, self.llm, url="https://www.linkedin.com/jobs/", pool=self.pool, controller=job_controller()),
+            run_agent(indeed_task, self.llm, url="https://www.indeed.com/", pool=self.pool, controller=job_controller()),
+        )
+        
+        # Remember what was found, so the next run only spends agent time on new postings
+        platform_records = records_by_platform({"LinkedIn": linkedin_results, "Indeed": indeed_results})
+        self.store.print_upsert_summary(self.store.upsert([r for records in platform_records.values() for r in records], search))
         
         return {
             "linkedin": linkedin_results,
@@ -82,16 +102,28 @@ class JobSearchAgent:
     async def analyze_and_summarize(self, search_results: Dict[str, Any]):
         """
         Analyze the search results and create a comprehensive summary with keywords
+        (a single LLM call, no browser)
         """
         
+        platform_results = {"LinkedIn": search_results['linkedin'], "Indeed": search_results['indeed']}
+        
+        # The same posting listed on both platforms is collapsed first (fewer tokens, honest counts)
+        deduped_results, records = dedupe_search_results(platform_results)
+        
+        # Final results only, condensed to fit the token budget (map step)
+        combined_results = await condense_results(self.llm, deduped_results)
+        
+        # Exact counts from the structured job records (this run plus stored history), so the LLM only writes the narrative
+        params = search_results['search_params']
+        history = self.store.with_history(records, search_key(params['job_title'], params['location']))
+        job_stats = format_job_stats(collapse_duplicates(history, verbose=False))
+        
         analysis_task = f"""
         Analyze the following job search results and create a comprehensive summary:
+        {combined_results}
         
-        LINKEDIN RESULTS:
-        {search_results['linkedin']}
-        
-        INDEED RESULTS:
-        {search_results['indeed']}
+        JOB STATISTICS (this run plus postings stored in the last {HISTORY_DAYS} days, computed exactly - use these numbers, don't recount):
+        {job_stats}
         
         Provide a structured analysis including:
         
@@ -101,7 +133,7 @@ class JobSearchAgent:
            - Location distribution
            - Remote/hybrid opportunities
         
-        2. **TOP SKILLS & TECHNOLOGIES (with frequency):**
+        2. **TOP SKILLS & TECHNOLOGIES (with the precomputed frequencies - don't recount):**
            - Programming languages mentioned
            - Frameworks and libraries
            - Tools and platforms
@@ -122,7 +154,7 @@ class JobSearchAgent:
            - Salary trends
            - Remote work availability
         
-        6. **KEYWORD PAIRS for job applications:**
+        6. **KEYWORD PAIRS for job applications (build on the precomputed keyword pairs):**
            - Technical keyword combinations
            - Industry buzzwords
            - Skills to highlight on resume
@@ -131,8 +163,7 @@ class JobSearchAgent:
         """
         
         print("📊 Analyzing search results...")
-        analysis_agent = Agent(task=analysis_task, llm=self.llm)
-        analysis = await analysis_agent.run()
+        analysis = await analyze_text(self.llm, analysis_task)
         
         return analysis
     
@@ -144,7 +175,7 @@ class JobSearchAgent:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"job_search_results_{timestamp}.json"
         
-        with open(filename, 'w', encoding='utf-8') as f:
+        with span("save_results", "serialize"), open(filename, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=2, ensure_ascii=False)
         
         print(f"💾 Results saved to {filename}")
@@ -181,10 +212,13 @@ async def main():
         # Step 2: Analyze and summarize
         analysis = await job_searcher.analyze_and_summarize(search_results)
         
-        # Step 3: Combine results
+        # Step 3: Combine results (structured job records instead of the raw agent histories)
+        platform_records = records_by_platform({"LinkedIn": search_results["linkedin"], "Indeed": search_results["indeed"]})
         final_results = {
-            "search_results": search_results,
-            "analysis": analysis
+            "search_params": search_results["search_params"],
+            "jobs": {platform: [record.model_dump() for record in records] for platform, records in platform_records.items()},
+            "job_stats": summarize_records([record for records in platform_records.values() for record in records]),
+            "analysis": analysis.model_dump()
         }
         
         # Step 4: Save to file
@@ -201,6 +235,12 @@ async def main():
     except Exception as e:
         print(f"❌ Error during job search: {str(e)}")
         print("Please check your internet connection and API keys.")
+    finally:
+        job_searcher.pool.print_stats()
+        await job_searcher.pool.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        report("job_search")
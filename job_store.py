@@ -0,0 +1,210 @@
+"""
+Persistent store of every job posting the search agents have collected.
+
+Postings are keyed by a fingerprint of the normalized (company, title,
+location, URL), so the same job found again - on a later run or on another
+platform page - is one row. Each row keeps a content hash of the record, which
+tells new and changed postings apart from ones that are already known, and the
+search (role @ location) it was last found by.
+
+The search prompts list the known postings so the agents can skip them, and
+market statistics can be computed over the stored history without scraping
+again:
+
+    python job_store.py                 # stats over every stored posting
+    python job_store.py --days 30       # only postings seen in the last 30 days
+    python job_store.py --search "Web Developer @ Tokyo"
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from job_records import JobRecord, format_job_stats
+
+STORE_PATH = "output/jobs.sqlite"
+MAX_KNOWN_IN_PROMPT = 40  # Known postings listed in one search prompt
+HISTORY_DAYS = 30  # Stored postings seen within this window are included in market statistics
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Case-, width- and punctuation-insensitive form ("Ｍｅｒｃａｒｉ, Inc." -> "mercari inc")"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """Scheme-, query- and fragment-free URL, so tracking parameters don't create new postings"""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    return urlunsplit(("", parts.netloc.lower().removeprefix("www."), parts.path.rstrip("/"), "", ""))
+
+
+def job_fingerprint(record: JobRecord) -> str:
+    """Identity of a posting: hash of the normalized company, title, location and URL"""
+    key = "\0".join([_normalize(record.company), _normalize(record.title), _normalize(record.location), normalize_url(record.url)])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def search_key(job_role: str, location: str = "") -> str:
+    """Label of one search, e.g. "web developer @ tokyo" """
+    return f"{_normalize(job_role)} @ {_normalize(location) or 'anywhere'}"
+
+
+def content_hash(record: JobRecord) -> str:
+    """Hash of the posting's content (salary, skills, ...), without the platform it was found on"""
+    data = record.model_dump(exclude={"platform"})
+    data["skills"] = sorted(skill.lower() for skill in data["skills"])
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite store of job records with incremental upserts.
+
+    Args:
+        path: SQLite file to store the postings in
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " fingerprint TEXT PRIMARY KEY, content_hash TEXT NOT NULL, record TEXT NOT NULL,"
+            " platform TEXT, search TEXT, first_seen REAL NOT NULL, last_seen REAL NOT NULL, updated REAL NOT NULL,"
+            " times_seen INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_platform ON jobs (platform, last_seen)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_search ON jobs (search, last_seen)")
+        self._conn.commit()
+
+    def upsert(self, records: List[JobRecord], search: Optional[str] = None) -> dict:
+        """
+        Store records found by `search` (see search_key), returning
+        {"new": [...], "changed": [...], "unchanged": [...]}. Duplicates within
+        `records` count once.
+        """
+        result = {"new": [], "changed": [], "unchanged": []}
+        now = datetime.datetime.now().timestamp()
+        seen = set()
+        with self._lock:
+            for record in records:
+                fingerprint = job_fingerprint(record)
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                digest = content_hash(record)
+                row = self._conn.execute("SELECT content_hash FROM jobs WHERE fingerprint = ?", (fingerprint,)).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (fingerprint, content_hash, record, platform, search, first_seen, last_seen, updated)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (fingerprint, digest, record.model_dump_json(), record.platform, search, now, now, now),
+                    )
+                    result["new"].append(record)
+                elif row[0] != digest:
+                    self._conn.execute(
+                        "UPDATE jobs SET content_hash = ?, record = ?, platform = ?, search = COALESCE(?, search),"
+                        " last_seen = ?, updated = ?, times_seen = times_seen + 1 WHERE fingerprint = ?",
+                        (digest, record.model_dump_json(), record.platform, search, now, now, fingerprint),
+                    )
+                    result["changed"].append(record)
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET search = COALESCE(?, search), last_seen = ?, times_seen = times_seen + 1"
+                        " WHERE fingerprint = ?",
+                        (search, now, fingerprint),
+                    )
+                    result["unchanged"].append(record)
+            self._conn.commit()
+        return result
+
+    def records(self, platform: Optional[str] = None, since_days: Optional[float] = None, search: Optional[str] = None) -> List[JobRecord]:
+        """Stored postings, most recently seen first"""
+        query, params = "SELECT record FROM jobs WHERE 1 = 1", []
+        if platform:
+            query += " AND platform = ?"
+            params.append(platform)
+        if search:
+            query += " AND search = ?"
+            params.append(search)
+        if since_days is not None:
+            query += " AND last_seen >= ?"
+            params.append(datetime.datetime.now().timestamp() - since_days * 86400)
+        query += " ORDER BY last_seen DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [JobRecord.model_validate_json(row[0]) for row in rows]
+
+    def with_history(self, run_records: List[JobRecord], search: Optional[str] = None, since_days: Optional[float] = HISTORY_DAYS) -> List[JobRecord]:
+        """
+        Postings for market statistics: the stored history of `search` (seen within
+        `since_days`) plus any of this run's records that aren't stored, one per fingerprint.
+        Known postings the agents skipped this time are still counted this way.
+        """
+        records, seen = [], set()
+        for record in list(run_records) + self.records(since_days=since_days, search=search):
+            fingerprint = job_fingerprint(record)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                records.append(record)
+        return records
+
+    def known_postings_instruction(self, platform: Optional[str] = None, search: Optional[str] = None, limit: int = MAX_KNOWN_IN_PROMPT) -> str:
+        """
+        Prompt text listing postings that are already stored, so the agent spends its
+        steps on new ones. Empty when nothing is stored yet.
+        """
+        known = self.records(platform, search=search)[:limit]
+        if not known:
+            return ""
+        lines = "\n".join(f"- {record.company or '?'} | {record.title}" for record in known)
+        return (
+            "These postings are already in the local job database - skip them and look for other jobs, "
+            "unless their salary, requirements or skills have visibly changed:\n" + lines
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            total, platforms = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT platform) FROM jobs").fetchone()
+        return {"postings": total, "platforms": platforms}
+
+    def print_upsert_summary(self, result: dict):
+        print(
+            f"🗄️ Job store: {len(result['new'])} new, {len(result['changed'])} changed, "
+            f"{len(result['unchanged'])} already known ({self.stats()['postings']} postings stored)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job statistics over the stored posting history (no scraping)")
+    parser.add_argument("--db", default=STORE_PATH, help="SQLite job store")
+    parser.add_argument("--platform", help="Only postings from this platform")
+    parser.add_argument("--days", type=float, help="Only postings seen in the last N days")
+    parser.add_argument("--search", help='Only postings found by this search, e.g. "Web Developer @ Tokyo"')
+    args = parser.parse_args()
+
+    store = JobStore(args.db)
+    search = search_key(*args.search.split("@", 1)) if args.search else None
+    records = store.records(args.platform, args.days, search)
+    print(f"🗄️ {len(records)} stored postings")
+    print(format_job_stats(records))
+
+
+if __name__ == "__main__":
+    main()
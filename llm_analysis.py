@@ -0,0 +1,159 @@
+"""
+Direct LLM analysis for text-only steps.
+
+Summarizing search results needs no browser: analyze_text sends the prompt
+straight to the chat model (one call, no browser process, no agent action
+loop) and returns a structured MarketAnalysis.
+
+condense_results keeps the prompt inside a token budget when there are many
+platforms: it keeps only each agent's final results and condenses them chunk
+by chunk (map); the analysis prompt over the condensed notes is the reduce step.
+"""
+
+import asyncio
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from llm_limiter import estimate_tokens
+
+# Token budget for the search results inside the final analysis prompt
+ANALYSIS_TOKEN_BUDGET = 24_000
+# Token budget for the search results inside one map (condense) prompt
+MAP_CHUNK_TOKENS = 8_000
+MAX_REDUCE_ROUNDS = 3
+
+MAP_PROMPT = """Condense the job search results below into compact notes for a later market analysis.
+For every job keep one line: title | company | location | salary | Japanese level | skills | URL.
+Keep every job, every skill and every number. Drop navigation steps, page descriptions and anything that is not a job fact.
+
+{results}
+"""
+
+
+class MarketAnalysis(BaseModel):
+    """Structured result of a job market analysis"""
+
+    summary: str = Field(default="", description="A short overview of the market in 2-4 sentences")
+    top_skills: List[str] = Field(default_factory=list, description="The most in-demand skills, most frequent first")
+    keyword_pairs: List[str] = Field(default_factory=list, description="Effective keyword combinations for applications, e.g. 'React + TypeScript'")
+    recommendations: List[str] = Field(default_factory=list, description="Concrete, actionable next steps for the job seeker")
+    report: str = Field(default="", description="The complete analysis in markdown, covering every section requested in the prompt")
+
+    def __str__(self):
+        return self.report or self.summary
+
+
+async def analyze_text(llm, prompt: str, schema=MarketAnalysis):
+    """
+    Run a text-only analysis prompt with a single model call.
+
+    Args:
+        llm: The language model to use
+        prompt: The analysis prompt
+        schema: Pydantic model for the structured output
+
+    Returns:
+        An instance of `schema`. If the model can't produce structured output,
+        the plain response is returned in the `report` field instead.
+    """
+    print(f"📏 Analysis prompt: {estimate_tokens(prompt):,} tokens")
+    try:
+        result = await llm.with_structured_output(schema).ainvoke(prompt)
+        if result is not None:
+            return result
+        print("Structured analysis returned nothing, falling back to plain text...")
+    except Exception as e:
+        print(f"Structured analysis failed ({e!r}), falling back to plain text...")
+
+    response = await llm.ainvoke(prompt)
+    return schema(report=str(response.content))
+
+
+def final_results_text(result) -> str:
+    """
+    Only the final output of an agent run instead of the whole AgentHistoryList repr
+    (which includes every intermediate action, element index and page state).
+    """
+    if result is None:
+        return ""
+    if isinstance(result, str):
+        return result
+    if hasattr(result, "final_result"):
+        final = result.final_result()
+        if final:
+            return final
+    if hasattr(result, "extracted_content"):
+        # No done action - keep what the agent extracted along the way
+        return "\n".join(content for content in result.extracted_content() if content)
+    return str(result)
+
+
+def split_text(text: str, max_tokens: int) -> list:
+    """Split text on line boundaries into pieces of at most ~max_tokens tokens"""
+    pieces, current, current_tokens = [], [], 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def chunk_sections(sections: dict, max_tokens: int) -> list:
+    """Pack titled sections into chunks of at most ~max_tokens tokens, splitting sections that don't fit"""
+    chunks, current, current_tokens = [], [], 0
+    for title, text in sections.items():
+        for piece in split_text(text, max_tokens):
+            block = f"\n\n=== {title.upper()} RESULTS ===\n{piece}"
+            block_tokens = estimate_tokens(block)
+            if current and current_tokens + block_tokens > max_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(block)
+            current_tokens += block_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+async def condense_results(llm, search_results: dict, token_budget: int = ANALYSIS_TOKEN_BUDGET, chunk_tokens: int = MAP_CHUNK_TOKENS) -> str:
+    """
+    Turn per-platform agent results into combined results text that fits the token budget.
+
+    Extract keeps only each platform's final results. While that is still over
+    `token_budget`, the text is split into chunks of `chunk_tokens` that are
+    condensed into compact job notes in parallel (map). The analysis prompt built
+    from the returned text is the reduce step.
+
+    Args:
+        llm: The language model used for the map step
+        search_results: Mapping of platform name -> agent result (or error string)
+        token_budget: Maximum tokens of results text to return
+        chunk_tokens: Maximum tokens of results in one map prompt
+
+    Returns:
+        The combined results text, one "=== PLATFORM RESULTS ===" section per platform or chunk
+    """
+    # Extract: only the final results of every platform
+    raw_tokens = sum(estimate_tokens(str(results)) for results in search_results.values())
+    sections = {platform: final_results_text(results) for platform, results in search_results.items()}
+    section_tokens = sum(estimate_tokens(text) for text in sections.values())
+    print(f"📏 Extract: {raw_tokens:,} -> {section_tokens:,} tokens across {len(sections)} platforms")
+
+    # Map: condense chunk by chunk until the results fit the budget
+    rounds = 0
+    while section_tokens > token_budget and rounds < MAX_REDUCE_ROUNDS:
+        rounds += 1
+        chunks = chunk_sections(sections, chunk_tokens)
+        responses = await asyncio.gather(*(llm.ainvoke(MAP_PROMPT.format(results=chunk)) for chunk in chunks))
+        sections = {f"notes {index + 1}": str(response.content) for index, response in enumerate(responses)}
+        condensed_tokens = sum(estimate_tokens(text) for text in sections.values())
+        print(f"📏 Map round {rounds}: {len(chunks)} chunks, {section_tokens:,} -> {condensed_tokens:,} tokens")
+        section_tokens = condensed_tokens
+
+    return "".join(f"\n\n=== {title.upper()} RESULTS ===\n{text}" for title, text in sections.items())
@@ -0,0 +1,200 @@
+"""
+On-disk cache for LLM completions.
+
+DiskLLMCache plugs into langchain's `cache=` hook on the chat models from get_llm,
+so it sits in front of _generate/_agenerate (and in front of the quota scheduler):
+a cached response costs neither a request nor tokens.
+
+Entries are keyed on a hash of (model + call parameters + stop + kwargs, messages),
+expire after a TTL and are evicted least-recently-used once the cache grows past
+its size limit. Prompt parts that change on every run without changing the
+answer (browser-use puts the current date and time, to the minute, into every
+step) are normalized before hashing, so a rerun of the same task can hit.
+
+A cached response that made an agent step fail would be served again when the
+step is retried. Retries therefore run under `track_calls()` and drop the
+entries of the failed steps with `evict_calls()` before resuming.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+CACHE_PATH = "output/cache/llm_cache.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600  # seconds, None keeps entries forever
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# Volatile prompt parts and what they are replaced with before hashing
+VOLATILE_PATTERNS = [
+    (re.compile(r"Current date and time: \d{4}-\d{2}-\d{2} \d{2}:\d{2}"), "Current date and time: <now>"),
+]
+
+# (cache, key) of every lookup and update in the current context, see track_calls()
+_tracked_calls: ContextVar[Optional[list]] = ContextVar("llm_cache_tracked_calls", default=None)
+
+
+def normalize_prompt(prompt: str) -> str:
+    for pattern, replacement in VOLATILE_PATTERNS:
+        prompt = pattern.sub(replacement, prompt)
+    return prompt
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Content address of one LLM call"""
+    return hashlib.sha256(f"{llm_string}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def track_calls():
+    """
+    Collect the (cache, key) of every cached LLM call made in this context (and
+    in tasks started from it) into the yielded list, for evict_calls().
+    """
+    calls = []
+    token = _tracked_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _tracked_calls.reset(token)
+
+
+def evict_calls(calls: List[tuple]) -> int:
+    """Delete the tracked entries from their caches and empty the list; returns how many were cached"""
+    evicted = sum(cache.delete(key) for cache, key in set(calls))
+    calls.clear()
+    return evicted
+
+
+def _track(cache, key: str):
+    calls = _tracked_calls.get()
+    if calls is not None:
+        calls.append((cache, key))
+
+
+class DiskLLMCache(BaseCache):
+    """
+    SQLite-backed langchain cache with TTL, size-bounded LRU eviction and hit/miss counters.
+
+    Args:
+        path: SQLite file to store the cache in
+        ttl: Seconds an entry stays valid (None for no expiry)
+        max_bytes: Total size of cached responses before the least recently used ones are evicted
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: Optional[float] = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = cache_key(prompt, llm_string)
+        _track(self, key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        key = cache_key(prompt, llm_string)
+        _track(self, key)
+        value = dumps(list(return_val))
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, key: str) -> bool:
+        """Drop one entry by its cache_key; True if it was cached"""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(
+            f"💾 LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+            f"{stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> DiskLLMCache:
+    """The DiskLLMCache shared by every model in this process"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DiskLLMCache()
+        return _default_cache
@@ -0,0 +1,308 @@
+"""
+Request/token quota scheduling for the chat models returned by get_llm.
+
+Every provider/model pair gets one QuotaScheduler with a requests-per-minute and
+a tokens-per-minute TokenBucket. Chat model calls wait in line for both budgets
+instead of failing with 429, and a 429 that still gets through pauses the whole
+scheduler and is retried with backoff.
+"""
+
+import asyncio
+import re
+import threading
+import time
+from typing import ClassVar, Optional
+
+from instrumentation import span
+from rate_limiter import TokenBucket
+
+# (requests per minute, tokens per minute) for each provider/model.
+# A model of None is the default for the whole provider, a TPM of None means no token budget.
+# https://ai.google.dev/gemini-api/docs/rate-limits
+# https://openrouter.ai/docs/api-reference/limits
+LLM_QUOTAS = {
+    ("google", "2.5-flash"): (10, 250_000),
+    ("google", "2.0-flash-exp"): (10, 250_000),
+    ("google", "2.0-flash"): (15, 1_000_000),
+    ("google", "2.0-flash-lite"): (30, 1_000_000),
+    ("google", "1.5-pro"): (2, 32_000),
+    ("google", "1.5-flash"): (15, 1_000_000),
+    ("google", None): (10, 250_000),
+    ("deepseek", None): (60, None),  # DeepSeek does not publish hard limits
+    ("openrouter", None): (20, None),  # Free models: 20 requests per minute
+    ("replay", None): (60_000, None),  # Recorded responses (replay_llm.py): no provider to protect
+}
+DEFAULT_QUOTA = (10, None)
+
+# How often a call that still hits a rate limit error is retried
+MAX_RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_BACKOFF = 5  # seconds, doubled on every retry
+
+RATE_LIMIT_MARKERS = (
+    "429", "rate limit", "rate_limit", "ratelimit", "resource_exhausted", "resource exhausted", "quota", "too many requests",
+)
+# Other categories of errors worth retrying (later or on another backend), checked in order
+TRANSIENT_ERRORS = [
+    ("timeout", re.compile(r"time[ds]?.?out|deadline exceeded", re.IGNORECASE)),
+    ("server", re.compile(r"\b(?:500|502|503|504|529)\b|internal server error|bad gateway|unavailable|overloaded", re.IGNORECASE)),
+    ("network", re.compile(r"connection (?:reset|refused|aborted|error)|network error|ECONNRESET", re.IGNORECASE)),
+]
+
+
+def get_quota(provider: str, model: str):
+    """Return the configured (rpm, tpm) for a provider/model"""
+    return LLM_QUOTAS.get((provider, model), LLM_QUOTAS.get((provider, None), DEFAULT_QUOTA))
+
+
+def estimate_tokens(text) -> int:
+    """
+    Rough token count without a tokenizer.
+
+    ASCII text averages about 4 characters per token, while Japanese and other
+    non-ASCII characters are close to one token each.
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def estimate_message_tokens(messages) -> int:
+    """Rough token count for a list of langchain messages"""
+    return sum(estimate_tokens(getattr(message, "content", message)) for message in messages)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429 / quota exhausted errors from any provider client"""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    error_msg = str(error).lower()
+    return any(marker in error_msg for marker in RATE_LIMIT_MARKERS)
+
+
+def classify_error(error) -> Optional[str]:
+    """
+    Category of a transient error (an exception or an error message): "rate_limit",
+    "timeout", "server" or "network". None if retrying won't help.
+    """
+    if is_rate_limit_error(error):
+        return "rate_limit"
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionError):
+        return "network"
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return "server"
+    message = str(error)
+    for category, pattern in TRANSIENT_ERRORS:
+        if pattern.search(message):
+            return category
+    return None
+
+
+def is_transient_error(error) -> bool:
+    """True for errors worth retrying elsewhere or later: rate limits, 5xx, timeouts and network errors"""
+    return classify_error(error) is not None
+
+
+def usage_tokens(result) -> Optional[int]:
+    """Total tokens reported by the provider for a ChatResult, if any"""
+    total = 0
+    found = False
+    for generation in getattr(result, "generations", []):
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens", 0)
+            found = True
+    return total if found else None
+
+
+class QuotaScheduler:
+    """
+    Queues calls until both the RPM and TPM budgets allow them.
+
+    Calls are admitted in arrival order. `queue_depth` is the number of calls
+    currently waiting for their turn.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: Optional[float] = None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket.per_minute(rpm, burst=1)
+        self.tokens = TokenBucket.per_minute(tpm, burst=tpm) if tpm else None
+        self.paused_until = 0.0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def _reserve(self, tokens: int) -> float:
+        delay = self.requests.reserve(1)
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return max(delay, self.paused_until - time.monotonic())
+
+    def _enter(self):
+        with self._lock:
+            self._waiting += 1
+
+    def _leave(self):
+        with self._lock:
+            self._waiting -= 1
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until a call estimated at `tokens` tokens may be sent"""
+        self._enter()
+        try:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            self._leave()
+
+    def acquire_sync(self, tokens: int = 0):
+        """Blocking version of `acquire`"""
+        self._enter()
+        try:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            self._leave()
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Correct the token budget once the provider reports real usage"""
+        if self.tokens and actual is not None:
+            self.tokens.reserve(actual - estimated)
+
+    def pause(self, seconds: float):
+        """Hold back every queued call after a rate limit error"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None) -> QuotaScheduler:
+    """
+    Return the shared QuotaScheduler for a provider/model, creating it on first use.
+    `rpm`/`tpm` override the LLM_QUOTAS defaults.
+    """
+    key = (provider, model)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            default_rpm, default_tpm = get_quota(provider, model)
+            _schedulers[key] = QuotaScheduler(
+                f"{provider}/{model}",
+                rpm if rpm is not None else default_rpm,
+                tpm if tpm is not None else default_tpm,
+            )
+        return _schedulers[key]
+
+
+class RateLimitedChatMixin:
+    """
+    Mixin for langchain chat models that sends every _generate/_agenerate call
+    (and every _stream/_astream call) through the class's QuotaScheduler.
+    Use `rate_limited()` to build the class.
+    """
+
+    quota_scheduler: ClassVar[QuotaScheduler]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls currently waiting for this model's quota"""
+        return self.quota_scheduler.queue_depth
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = self.quota_scheduler
+        estimated = estimate_message_tokens(messages)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            with span("llm.queue_wait", "llm", model=scheduler.name):
+                scheduler.acquire_sync(estimated)
+            try:
+                with span("llm.call", "llm", model=scheduler.name, input_tokens=estimated) as attrs:
+                    result = super()._generate(messages, stop, run_manager, **kwargs)
+                    attrs["total_tokens"] = usage_tokens(result)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF * 2 ** attempt
+                print(f"Rate limit hit on {scheduler.name}, retrying in {delay}s ({scheduler.queue_depth} queued)")
+                scheduler.pause(delay)
+                continue
+            scheduler.record_usage(estimated, usage_tokens(result))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = self.quota_scheduler
+        estimated = estimate_message_tokens(messages)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            with span("llm.queue_wait", "llm", model=scheduler.name):
+                await scheduler.acquire(estimated)
+            try:
+                with span("llm.call", "llm", model=scheduler.name, input_tokens=estimated) as attrs:
+                    result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+                    attrs["total_tokens"] = usage_tokens(result)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF * 2 ** attempt
+                print(f"Rate limit hit on {scheduler.name}, retrying in {delay}s ({scheduler.queue_depth} queued)")
+                scheduler.pause(delay)
+                continue
+            scheduler.record_usage(estimated, usage_tokens(result))
+            return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Streams are admitted once; a rate limit error mid-stream can't be retried
+        # without repeating chunks that were already yielded
+        scheduler = self.quota_scheduler
+        estimated = estimate_message_tokens(messages)
+        with span("llm.queue_wait", "llm", model=scheduler.name):
+            scheduler.acquire_sync(estimated)
+        actual = None
+        with span("llm.stream", "llm", model=scheduler.name, input_tokens=estimated) as attrs:
+            for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None)
+                if usage:
+                    actual = (actual or 0) + usage.get("total_tokens", 0)
+                yield chunk
+            attrs["total_tokens"] = actual
+        scheduler.record_usage(estimated, actual)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = self.quota_scheduler
+        estimated = estimate_message_tokens(messages)
+        with span("llm.queue_wait", "llm", model=scheduler.name):
+            await scheduler.acquire(estimated)
+        actual = None
+        with span("llm.stream", "llm", model=scheduler.name, input_tokens=estimated) as attrs:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None)
+                if usage:
+                    actual = (actual or 0) + usage.get("total_tokens", 0)
+                yield chunk
+            attrs["total_tokens"] = actual
+        scheduler.record_usage(estimated, actual)
+
+
+def rate_limited(model_cls, scheduler: QuotaScheduler):
+    """
+    Return a subclass of `model_cls` whose calls are queued on `scheduler`.
+    The subclass keeps the original class name, which browser-use uses to pick its tool calling method.
+    """
+    return type(
+        model_cls.__name__,
+        (RateLimitedChatMixin, model_cls),
+        {
+            "__module__": model_cls.__module__,
+            "__annotations__": {"quota_scheduler": ClassVar[QuotaScheduler]},
+            "quota_scheduler": scheduler,
+        },
+    )
@@ -0,0 +1,183 @@
+"""
+Load balancing and failover across several chat models.
+
+LLMRouter is a langchain chat model built from weighted backends (normally the
+models returned by get_llm). Each call goes to one backend picked by weight,
+observed latency, error history and current queue depth. Rate limit (429),
+server (5xx) and timeout errors fail over to the next backend and put the
+failing backend on a short cooldown.
+"""
+
+import random
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from llm_limiter import is_transient_error
+
+LATENCY_EWMA_ALPHA = 0.3  # Weight of the newest latency sample
+FAILOVER_COOLDOWN = 15  # seconds, doubled for every consecutive error
+MAX_COOLDOWN = 300
+
+
+class BackendStats:
+    """Latency and error bookkeeping for one router backend"""
+
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.latency = None  # Exponentially weighted moving average, seconds
+        self.cooldown_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def record_success(self, seconds: float):
+        self.calls += 1
+        self.consecutive_errors = 0
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = LATENCY_EWMA_ALPHA * seconds + (1 - LATENCY_EWMA_ALPHA) * self.latency
+
+    def record_error(self, failover: bool):
+        self.calls += 1
+        self.errors += 1
+        if failover:
+            self.consecutive_errors += 1
+            cooldown = min(MAX_COOLDOWN, FAILOVER_COOLDOWN * 2 ** (self.consecutive_errors - 1))
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 3) if self.calls else 0.0,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "healthy": self.healthy,
+        }
+
+
+class LLMRouter(BaseChatModel):
+    """
+    Chat model that spreads calls over several backends.
+
+    Args:
+        backends: List of (name, chat model, weight)
+    """
+
+    backends: List[Any]
+    model_name: str = "router"
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, backends, **kwargs):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        super().__init__(backends=list(backends), **kwargs)
+        self._stats = {name: BackendStats(name, weight) for name, _, weight in self.backends}
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        # Tools are bound per backend at call time so every provider formats them its own way
+        return self.bind(router_tools=list(tools), router_tool_choice=tool_choice, **kwargs)
+
+    def _score(self, name: str, llm, fastest: Optional[float]) -> float:
+        stats = self._stats[name]
+        score = stats.weight
+        if stats.latency and fastest:
+            score *= fastest / stats.latency
+        if stats.calls:
+            score *= 1 - 0.5 * stats.errors / stats.calls
+        score /= 1 + getattr(llm, "queue_depth", 0)
+        return max(score, 1e-6)
+
+    def _ranked_backends(self) -> list:
+        """Weighted random pick first, then the remaining healthy backends by score, then cooling ones"""
+        latencies = [stats.latency for stats in self._stats.values() if stats.latency and stats.healthy]
+        fastest = min(latencies) if latencies else None
+        healthy = [(name, llm) for name, llm, _ in self.backends if self._stats[name].healthy]
+        cooling = sorted(
+            ((name, llm) for name, llm, _ in self.backends if not self._stats[name].healthy),
+            key=lambda backend: self._stats[backend[0]].cooldown_until,
+        )
+        if not healthy:
+            return cooling
+
+        scores = {name: self._score(name, llm, fastest) for name, llm in healthy}
+        first = random.choices(healthy, weights=[scores[name] for name, _ in healthy])[0]
+        rest = sorted((b for b in healthy if b is not first), key=lambda b: scores[b[0]], reverse=True)
+        return [first] + rest + cooling
+
+    def _prepare(self, llm, kwargs: dict):
+        tools = kwargs.pop("router_tools", None)
+        tool_choice = kwargs.pop("router_tool_choice", None)
+        if tools:
+            return llm.bind_tools(tools, tool_choice=tool_choice) if tool_choice else llm.bind_tools(tools)
+        return llm
+
+    @staticmethod
+    def _child_config(run_manager):
+        """Config that nests the backend's run under the router's, so callbacks and tracing see both"""
+        if run_manager is None:
+            return None
+        # What a chain run manager's get_child() does (LLM run managers don't have one)
+        callbacks = CallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+        callbacks.set_handlers(run_manager.inheritable_handlers)
+        callbacks.add_tags(run_manager.inheritable_tags)
+        callbacks.add_metadata(run_manager.inheritable_metadata)
+        return {"callbacks": callbacks}
+
+    def _handle_error(self, name: str, error: Exception, remaining: int):
+        failover = is_transient_error(error)
+        self._stats[name].record_error(failover)
+        if not failover or remaining == 0:
+            raise error
+        print(f"Router: {name} failed ({error}), failing over...")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        ranked = self._ranked_backends()
+        for index, (name, llm) in enumerate(ranked):
+            started = time.monotonic()
+            try:
+                message = self._prepare(llm, dict(kwargs)).invoke(messages, self._child_config(run_manager), stop=stop)
+            except Exception as e:
+                self._handle_error(name, e, len(ranked) - index - 1)
+                continue
+            self._stats[name].record_success(time.monotonic() - started)
+            return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"backend": name})
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        ranked = self._ranked_backends()
+        for index, (name, llm) in enumerate(ranked):
+            started = time.monotonic()
+            try:
+                message = await self._prepare(llm, dict(kwargs)).ainvoke(messages, self._child_config(run_manager), stop=stop)
+            except Exception as e:
+                self._handle_error(name, e, len(ranked) - index - 1)
+                continue
+            self._stats[name].record_success(time.monotonic() - started)
+            return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"backend": name})
+
+    def stats(self) -> list:
+        """Per-backend calls, error rate, latency and health"""
+        return [stats.as_dict() for stats in self._stats.values()]
+
+    def print_stats(self):
+        print("📊 LLM router backends:")
+        for stats in self.stats():
+            latency = f"{stats['latency']}s" if stats["latency"] is not None else "-"
+            status = "✅" if stats["healthy"] else "⏸️"
+            print(f"  {status} {stats['name']}: {stats['calls']} calls, {stats['error_rate']:.0%} errors, latency {latency}")
@@ -1,5 +1,4 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
-from browser_use import Agent
 from dotenv import load_dotenv
 import json
 import os
@@ -9,88 +8,162 @@ from typing import Optional
 from langchain_core.utils.utils import secret_from_env
 from langchain_openai import ChatOpenAI
 from pydantic import Field, SecretStr
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
 
-from markdown_extractor import extract_and_save_markdown
+from markdown_extractor import StreamingMarkdownExtractor, extract_and_save_markdown
+from agent_budget import AgentBudget, BudgetEnforcer, chain_hooks
+from agent_retry import run_resumable_agent
+from llm_limiter import get_scheduler, is_rate_limit_error, rate_limited
+from llm_router import LLMRouter
+from llm_cache import get_default_cache
+from page_cache import MAX_TEXT_CHARS, PageCache
+from browser_pool import BrowserPool
+from openrouter_parser import StreamingScrubber, parse_openrouter_response
+from replay_llm import ReplayChatModel
+from instrumentation import report
 
 # https://github.com/browser-use/browser-use/issues/567#issuecomment-2710518976
 # from langchain_community.chat_models import ChatOpenAI
 
-def parse_openrouter_response(text: str) -> str:
-    """
-    Parse OpenRouter response to remove problematic tool call tokens and extract clean content.
-    
-    Args:
-        text: Raw response text from OpenRouter model
-        
-    Returns:
-        Cleaned text suitable for browser-use agent
-    """
-    if not isinstance(text, str):
-        return str(text)
-    
-    original_length = len(text)
-    
-    # Remove tool call start/end tokens that cause parsing issues
-    tool_call_patterns = [
-        r'<\|tool_call_start_id\|>[^<]*<\|tool_call_end\|>',
-        r'<\|tool_call_start\|>[^<]*<\|tool_call_end\|>',
-        r'<\|start_header_id\|>[^<]*<\|end_header_id\|>',
-        r'<\|eot_id\|>',
-        r'<\|begin_of_text\|>',
-        r'<\|end_of_text\|>',
-        r'<\|assistant\|>',
-        r'<\|user\|>',
-        r'<\|system\|>',
-    ]
-    
-    cleaned_text = text
-    removed_patterns = []
-    
-    for pattern in tool_call_patterns:
-        matches = re.findall(pattern, cleaned_text, flags=re.DOTALL | re.IGNORECASE)
-        if matches:
-            removed_patterns.extend(matches)
-            cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Clean up extra whitespace and newlines
-    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
-    cleaned_text = cleaned_text.strip()
-    
-    # If we removed problematic patterns, log it
-    if removed_patterns and len(cleaned_text) != original_length:
-        print(f"Parser: Removed {len(removed_patterns)} problematic token(s), cleaned {original_length} -> {len(cleaned_text)} chars")
+# Read environment variables
+load_dotenv()
+
+class ChatOpenRouter(ChatOpenAI):
+    """ChatOpenAI pointed at OpenRouter, with special tokens scrubbed from every response (streamed or not)"""
+
+    openai_api_key: Optional[SecretStr] = Field(
+        alias="api_key", default_factory=secret_from_env("OPENROUTER_API_KEY", default=None)
+    )
+    @property
+    def lc_secrets(self) -> dict[str, str]:
+        return {"openai_api_key": "OPENROUTER_API_KEY"}
+
+    def __init__(self,
+                openai_api_key: Optional[str] = None,
+                **kwargs):
+        openai_api_key = openai_api_key or os.environ.get("OPENROUTER_API_KEY")
+        super().__init__(base_url="https://openrouter.ai/api/v1", openai_api_key=openai_api_key, **kwargs)
     
-    # If the response looks like it contains JSON with tool calls, try to extract the content
-    try:
-        # Look for JSON-like structures and extract content
-        json_match = re.search(r'\{[^{}]*"content"[^{}]*\}', cleaned_text, re.DOTALL)
-        if json_match:
-            potential_json = json_match.group()
-            try:
-                parsed = json.loads(potential_json)
-                if isinstance(parsed, dict) and 'content' in parsed:
-                    print("Parser: Extracted content from JSON structure")
-                    return parsed['content']
-            except json.JSONDecodeError:
-                pass
-    except Exception:
-        pass
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        """Override _generate to parse OpenRouter responses"""
+        try:
+            # Call the parent _generate method
+            result = super()._generate(messages, stop, run_manager, **kwargs)
+            
+            # Parse each generation's text
+            for generation in result.generations:
+                if hasattr(generation, 'text'):
+                    generation.text = parse_openrouter_response(generation.text)
+                if hasattr(generation, 'message') and hasattr(generation.message, 'content'):
+                    generation.message.content = parse_openrouter_response(generation.message.content)
+            
+            return result
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise  # Let the quota scheduler back off instead of calling again right away
+            print(f"Error in OpenRouter response generation: {e}")
+            # Fallback to parent method
+            return super()._generate(messages, stop, run_manager, **kwargs)
     
-    return cleaned_text
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        """Override _agenerate to parse OpenRouter responses (async version)"""
+        try:
+            # Call the parent _agenerate method
+            result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+            
+            # Parse each generation's text
+            for generation in result.generations:
+                if hasattr(generation, 'text'):
+                    generation.text = parse_openrouter_response(generation.text)
+                if hasattr(generation, 'message') and hasattr(generation.message, 'content'):
+                    generation.message.content = parse_openrouter_response(generation.message.content)
+            
+            return result
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise  # Let the quota scheduler back off instead of calling again right away
+            print(f"Error in OpenRouter async response generation: {e}")
+            # Fallback to parent method
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
 
+    def _scrub_chunk(self, chunk, scrubber):
+        """Replace a streamed chunk's text with the part the scrubber releases"""
+        if isinstance(chunk.message.content, str):
+            chunk.message.content = scrubber.feed(chunk.message.content)
+            chunk.text = chunk.message.content
+        return chunk
+
+    def _stream_tail(self, scrubber):
+        """Text held back at the end of the stream, as a final chunk (or None)"""
+        tail = scrubber.flush()
+        if scrubber.removed:
+            print(f"Parser: Removed {scrubber.removed} problematic token(s) from the stream")
+        return ChatGenerationChunk(message=AIMessageChunk(content=tail)) if tail else None
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        """
+        Override _stream to scrub special tokens as the chunks arrive.
+        Only for callers that stream the model: browser-use agents use ainvoke (_agenerate above).
+        """
+        scrubber = StreamingScrubber()
+        # Callbacks are fed here, so they see the scrubbed tokens instead of the raw ones
+        for chunk in super()._stream(messages, stop, None, **kwargs):
+            chunk = self._scrub_chunk(chunk, scrubber)
+            if run_manager and chunk.text:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        tail = self._stream_tail(scrubber)
+        if tail:
+            if run_manager:
+                run_manager.on_llm_new_token(tail.text, chunk=tail)
+            yield tail
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """Override _astream to scrub special tokens as the chunks arrive (async version)"""
+        scrubber = StreamingScrubber()
+        async for chunk in super()._astream(messages, stop, None, **kwargs):
+            chunk = self._scrub_chunk(chunk, scrubber)
+            if run_manager and chunk.text:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        tail = self._stream_tail(scrubber)
+        if tail:
+            if run_manager:
+                await run_manager.on_llm_new_token(tail.text, chunk=tail)
+            yield tail
 
-# Read environment variables
-load_dotenv()
 
 # LLM Configuration - Change these two lines to switch models
-PROVIDER = "openrouter"  # Options: "google", "deepseek", "openrouter"
+PROVIDER = "openrouter"  # Options: "google", "deepseek", "openrouter", "replay"
 MODEL = "llama"         # For google: "2.5-flash", "2.0-flash-exp", "2.0-flash", "1.5-pro", "1.5-flash", "1.5"
                        # For deepseek: "chat"
                        # For openrouter: "llama" (or any other model available on OpenRouter)
+                       # For replay: path of a recording file (see replay_llm.py)
+
+# Multi-provider routing - set to a list of (provider, model, weight) to spread calls over several
+# backends with failover on 429/5xx. PROVIDER/MODEL are ignored while this is set.
+ROUTER_BACKENDS = None  # e.g. [("google", "2.0-flash", 2), ("google", "2.0-flash-lite", 1), ("openrouter", "llama", 1)]
+
+# Batch mode - how many companies are researched at the same time
+BATCH_CONCURRENCY = 3
 
-def get_llm(provider: str, model: str):
-    """Initialize and return the specified LLM model"""
+# Hard limits for each company's research agent (see agent_budget.py); overruns go to output/budget_overruns.jsonl
+AGENT_BUDGET = AgentBudget(max_steps=30, max_pages=8, max_seconds_per_page=60, max_seconds=10 * 60, max_input_tokens=400_000, max_output_tokens=40_000)
+
+# Company pages fetched within this many seconds are reused instead of browsed again (None disables the page cache)
+PAGE_CACHE_FRESHNESS = 24 * 3600
+
+def get_llm(provider: str, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None, cache: bool = True):
+    """
+    Initialize and return the specified LLM model.
+
+    Calls are queued on the provider/model's shared RPM/TPM budget (see llm_limiter.LLM_QUOTAS);
+    `rpm`/`tpm` override the configured budget. `llm.queue_depth` shows how many calls are waiting.
+    With `cache=True` identical calls are answered from the on-disk LLM cache (see llm_cache.py).
+    """
+    scheduler = get_scheduler(provider, model, rpm, tpm)
+    llm_cache = get_default_cache() if cache else None
     
     if provider == "google":
         # https://ai.google.dev/gemini-api/docs/rate-limits
@@ -112,7 +185,7 @@ def get_llm(provider: str, model: str):
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
-        return ChatGoogleGenerativeAI(model=google_models[model])
+        return rate_limited(ChatGoogleGenerativeAI, scheduler)(model=google_models[model], cache=llm_cache)
     
     elif provider == "deepseek":
         # https://api-docs.deepseek.com/quick_start/pricing/
@@ -130,10 +203,11 @@ def get_llm(provider: str, model: str):
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
         
-        return ChatDeepSeek(
+        return rate_limited(ChatDeepSeek, scheduler)(
             base_url='https://api.deepseek.com/v1', 
             model=deepseek_models[model], 
-            api_key=SecretStr(api_key)
+            api_key=SecretStr(api_key),
+            cache=llm_cache,
         )
     
     elif provider == "openrouter":
@@ -152,62 +226,9 @@ def get_llm(provider: str, model: str):
         if not api_key:
             raise ValueError("OPENROUTER_API_KEY not found in environment variables")
 
-        class ChatOpenRouter(ChatOpenAI):
-            openai_api_key: Optional[SecretStr] = Field(
-                alias="api_key", default_factory=secret_from_env("OPENROUTER_API_KEY", default=None)
-            )
-            @property
-            def lc_secrets(self) -> dict[str, str]:
-                return {"openai_api_key": "OPENROUTER_API_KEY"}
-
-            def __init__(self,
-                        openai_api_key: Optional[str] = None,
-                        **kwargs):
-                openai_api_key = openai_api_key or os.environ.get("OPENROUTER_API_KEY")
-                super().__init__(base_url="https://openrouter.ai/api/v1", openai_api_key=openai_api_key, **kwargs)
-            
-            def _generate(self, messages, stop=None, run_manager=None, **kwargs):
-                """Override _generate to parse OpenRouter responses"""
-                try:
-                    # Call the parent _generate method
-                    result = super()._generate(messages, stop, run_manager, **kwargs)
-                    
-                    # Parse each generation's text
-                    for generation in result.generations:
-                        if hasattr(generation, 'text'):
-                            generation.text = parse_openrouter_response(generation.text)
-                        if hasattr(generation, 'message') and hasattr(generation.message, 'content'):
-                            generation.message.content = parse_openrouter_response(generation.message.content)
-                    
-                    return result
-                except Exception as e:
-                    print(f"Error in OpenRouter response generation: {e}")
-                    # Fallback to parent method
-                    return super()._generate(messages, stop, run_manager, **kwargs)
-            
-            async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
-                """Override _agenerate to parse OpenRouter responses (async version)"""
-                try:
-                    # Call the parent _agenerate method
-                    result = await super()._agenerate(messages, stop, run_manager, **kwargs)
-                    
-                    # Parse each generation's text
-                    for generation in result.generations:
-                        if hasattr(generation, 'text'):
-                            generation.text = parse_openrouter_response(generation.text)
-                        if hasattr(generation, 'message') and hasattr(generation.message, 'content'):
-                            generation.message.content = parse_openrouter_response(generation.message.content)
-                    
-                    return result
-                except Exception as e:
-                    print(f"Error in OpenRouter async response generation: {e}")
-                    # Fallback to parent method
-                    return await super()._agenerate(messages, stop, run_manager, **kwargs)
-
-
-
-        return ChatOpenRouter(
+        return rate_limited(ChatOpenRouter, scheduler)(
             model_name=openrouter_models[model],  
+            cache=llm_cache,
             # temperature=0.1,  # Lower temperature for more consistent responses
             # max_tokens=4096,
             # model_kwargs={
@@ -216,63 +237,62 @@ def get_llm(provider: str, model: str):
             # }
         )
 
+    elif provider == "replay":
+        # Recorded responses, no API key or network needed (see replay_llm.py); the model is the recording file
+        if not os.path.isfile(model):
+            raise ValueError(f"Replay recording not found: {model}")
+
+        return rate_limited(ReplayChatModel, scheduler)(recording=model, cache=llm_cache)
+
     else:
-        raise ValueError(f"Unsupported provider: {provider}. Available options: ['google', 'deepseek', 'openrouter']")
+        raise ValueError(f"Unsupported provider: {provider}. Available options: ['google', 'deepseek', 'openrouter', 'replay']")
 
-# Initialize the selected LLM
-llm = get_llm(PROVIDER, MODEL)
 
+def get_router_llm(backends):
+    """
+    Build an LLMRouter from a list of (provider, model, weight) entries.
+    Each backend keeps its own RPM/TPM budget from get_llm.
+    """
+    return LLMRouter([(f"{provider}/{model}", get_llm(provider, model), weight) for provider, model, weight in backends])
 
-async def run_agent_with_fallback(task: str, llm, max_retries: int = 2):
+
+async def run_agent_with_fallback(task: str, llm, max_retries: int = 2, url: Optional[str] = None, pool: Optional[BrowserPool] = None, on_step_end=None):
     """
-    Run the browser-use agent with fallback mechanisms for parsing errors.
-    
+    Run the browser-use agent, retrying transient errors (rate limits, timeouts,
+    5xx, malformed model output) from the last good step (see agent_retry.py).
+
     Args:
         task: The task description for the agent
         llm: The language model to use
-        max_retries: Maximum number of retries if parsing fails
-        
+        max_retries: Maximum number of retries after transient errors
+        url: The URL the agent starts on, used for per-host rate limiting
+        pool: BrowserPool to borrow the agent's browser context from
+        on_step_end: Async `hook(agent)` called after every agent step
+
     Returns:
         The agent result or error message
     """
-    for attempt in range(max_retries + 1):
-        try:
-            print(f"Attempt {attempt + 1}/{max_retries + 1} - Running agent...")
-            
-            agent = Agent(task=task, llm=llm)
-            result = await agent.run()
-            
-            # Additional parsing if needed for OpenRouter responses
-            if PROVIDER == "openrouter" and isinstance(result, str):
-                result = parse_openrouter_response(result)
-            
-            return result
-            
-        except Exception as e:
-            error_msg = str(e).lower()
-            
-            # Check if it's a parsing error related to tool calls
-            if any(keyword in error_msg for keyword in ['tool_call', 'json', 'parsing', 'malformed']):
-                print(f"Parsing error detected on attempt {attempt + 1}: {e}")
-                
-                if attempt < max_retries:
-                    print("Retrying with different approach...")
-                    # For retries, we could modify the LLM parameters
-                    continue
-                else:
-                    print("Max retries reached. Falling back to error message.")
-                    return f"Error: Failed to parse model response after {max_retries + 1} attempts. Last error: {e}"
-            else:
-                # If it's not a parsing error, don't retry
-                raise e
-    
-    return "Error: Unexpected failure in agent execution."
+    result, retry_report = await run_resumable_agent(task, llm, url=url, pool=pool, on_step_end=on_step_end, max_retries=max_retries)
+    retry_report.print_summary()
+
+    # Additional parsing if needed for OpenRouter responses
+    if PROVIDER == "openrouter" and isinstance(result, str):
+        result = parse_openrouter_response(result)
+
+    return result
 
 
 import asyncio
+import argparse
+
 
-async def main():
+def load_inputs():
+    """
+    Read the shared inputs (about-me, 志望動機 instructions, companies.json).
 
+    Returns:
+        (about_me, motivation_instructions, companies_data) or None if companies.json is unusable
+    """
     # Read about-me information
     try:
         with open("input/about-me.md", "r", encoding="utf-8") as f:
@@ -293,47 +313,55 @@ async def main():
             companies_data = json.load(f)
     except FileNotFoundError:
         print("Error: input/companies.json file not found. Please create the file with company data.")
-        return
+        return None
     except json.JSONDecodeError:
         print("Error: Invalid JSON format in input/companies.json.")
-        return
-    
-    # Get the current working company
-    if "working" not in companies_data:
-        print("Error: No 'working' company specified in companies.json.")
-        return
-    
-    current_company = companies_data["working"]
-    
-    # Check if the company exists in backlog
-    if "backlog" not in companies_data or current_company not in companies_data["backlog"]:
-        print(f"Error: Company '{current_company}' not found in backlog.")
-        if "backlog" in companies_data:
-            print(f"Available companies: {list(companies_data['backlog'].keys())}")
-        return
-    
-    company_info = companies_data["backlog"][current_company]
-    company_name = company_info.get("name", current_company)
-    
-    # Handle URLs - support both single URL and multiple URLs
+        return None
+
+    return about_me, motivation_instructions, companies_data
+
+
+def get_company_urls(company_info: dict):
+    """
+    Return the company's URLs as a list - supports both single "url" and multiple "urls".
+    Returns None if the URL entry has an invalid format.
+    """
     urls = company_info.get("url", company_info.get("urls", []))
-    
+
     if isinstance(urls, str):
         urls = [urls]
     elif not isinstance(urls, list):
-        print(f"Error: Invalid URL format for company '{company_name}'.")
-        return
-    
-    if not urls:
-        print(f"Error: No URLs provided for company '{company_name}'.")
-        return
-    
+        return None
+
+    return urls
+
+
+def build_task_description(company_name: str, urls: list, about_me: str, motivation_instructions: str, cached_pages: Optional[dict] = None) -> str:
+    """
+    Build the 志望動機 research task for one company.
+
+    `cached_pages` maps URLs to PageSnapshots from the page cache; their text is
+    included in the task so the agent does not need to browse them again. This is
+    the only way the cache is used: the agent's browser never reads from it, so a
+    captured page the agent opens anyway is loaded from the site.
+    """
+    cached_pages = cached_pages or {}
+    browse_urls = [url for url in urls if url not in cached_pages]
+    if not cached_pages:
+        visit_instruction = "\n• Ensure all provided URLs are visited"
+    elif browse_urls:
+        visit_instruction = "\n• Ensure all URLs listed above are visited"
+    else:
+        visit_instruction = ""  # Every provided page is captured below
+
     # Format URLs for the task
-    if len(urls) == 1:
-        urls_text = urls[0]
+    if not browse_urls:
+        browse_instruction = f"All provided pages for {company_name} are already captured below.\n\nResearch the company thoroughly by exploring:"
+    elif len(browse_urls) == 1:
+        urls_text = browse_urls[0]
         browse_instruction = f"Browse this URL: {urls_text}\n\nResearch the company thoroughly by exploring:"
     else:
-        urls_text = "\n".join([f"- {url}" for url in urls])
+        urls_text = "\n".join([f"- {url}" for url in browse_urls])
         browse_instruction = f"Browse these URLs for {company_name}:\n{urls_text}\n\nResearch the company thoroughly by exploring:"
     
     browse_instruction += (
@@ -342,15 +370,21 @@ async def main():
         "\n• Recent news, achievements, or initiatives"
         "\n• Team, leadership, and company size"
         "\n\n**BROWSING LIMITS (to save tokens):**"
-        "\n• Maximum 8 pages total (including provided URLs)"
-        "\n• Ensure all provided URLs are visited"
+        f"\n• Maximum {AGENT_BUDGET.max_pages} pages total (including provided URLs)"
+        f"{visit_instruction}"
         "\n• Browse two additional new pages to get a broader view"
-        "\n• Spend no more than 60 seconds per page"
+        f"\n• Spend no more than {AGENT_BUDGET.max_seconds_per_page:.0f} seconds per page"
         "\n• Focus only on key information, skip detailed content"
         "\n• Only one long articles or blog post is allowed to read in detail"
     )
 
-    task_description = (
+    if cached_pages:
+        browse_instruction += "\n\n**ALREADY CAPTURED PAGES (count as visited, do not open them again):**"
+        for url, snapshot in cached_pages.items():
+            browse_instruction += f"\n\n--- {url} ---\n{snapshot.text[:MAX_TEXT_CHARS]}"
+        browse_instruction += "\n\n"
+
+    return (
         f"I'm a student. I'm writing my resume in Japanese. "
         f"Here is my personal information and background:\n\n{about_me}\n\n"
         f"Please follow these instructions for writing 志望動機:\n\n{motivation_instructions}\n\n"
@@ -362,11 +396,180 @@ async def main():
         f"Output the result in markdown format, with clear section headers for each version."
     )
 
+
+def safe_filename(name: str) -> str:
+    """Make a company key usable inside an output filename"""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name).strip('_') or "company"
+
+
+async def process_company(company_key: str, company_info: dict, about_me: str, motivation_instructions: str, llm, filename_prefix: str = "志望動機", page_cache: Optional[PageCache] = None, pool: Optional[BrowserPool] = None):
+    """
+    Research one company and save its 志望動機 markdown.
+    With a `page_cache`, company pages that can be read without a browser are handed to the agent directly.
+
+    Returns:
+        The saved markdown filename, or None if nothing could be extracted
+    """
+    company_name = company_info.get("name", company_key)
+    urls = get_company_urls(company_info)
+
+    if urls is None:
+        print(f"Error: Invalid URL format for company '{company_name}'.")
+        return None
+    
+    if not urls:
+        print(f"Error: No URLs provided for company '{company_name}'.")
+        return None
+
+    cached_pages = await page_cache.prefetch(urls) if page_cache else {}
+    if cached_pages:
+        print(f"🌐 {company_name}: {len(cached_pages)}/{len(urls)} pages served from the page cache")
+
+    task_description = build_task_description(company_name, urls, about_me, motivation_instructions, cached_pages)
+
+    # Steps are logged and the markdown is saved while the agent runs, as soon as the done action arrives
+    extractor = StreamingMarkdownExtractor(filename_prefix=filename_prefix)
+    budget = BudgetEnforcer(AGENT_BUDGET, label=company_name)
+
     # Use the fallback mechanism for robust execution
-    result = await run_agent_with_fallback(task_description, llm)
-    print(result)
+    browse_urls = [url for url in urls if url not in cached_pages]
+    result = await run_agent_with_fallback(
+        task_description, llm, url=browse_urls[0] if browse_urls else None, pool=pool,
+        on_step_end=chain_hooks(extractor.on_step_end, budget.on_step_end),
+    )
+    if isinstance(result, str):
+        print(result)
+    print(f"📏 {company_name}: {budget.summary()}")
 
-    # Use the reusable extractor to save markdown
-    extract_and_save_markdown(result)
+    md_filename = extractor.finalize()
+    if md_filename is None and budget.stopped:
+        # Cut off by its budget without a done action: save what the agent found so far
+        partial = budget.partial_result(result)
+        if partial:
+            md_filename = extract_and_save_markdown(partial, filename_prefix=f"{filename_prefix}_partial")
+    return md_filename
 
-asyncio.run(main())
\ No newline at end of file
+
+async def run_batch(companies: dict, about_me: str, motivation_instructions: str, llm, concurrency: int = BATCH_CONCURRENCY, page_cache: Optional[PageCache] = None, pool: Optional[BrowserPool] = None):
+    """
+    Process many companies concurrently, at most `concurrency` agents at a time.
+
+    Args:
+        companies: Mapping of company key -> company info (same shape as companies.json["backlog"])
+        concurrency: Maximum number of companies researched at the same time
+
+    Returns:
+        Mapping of company key -> saved markdown filename (None if it failed)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(company_key, company_info):
+        async with semaphore:
+            print(f"🏢 Starting {company_key}...")
+            try:
+                md_filename = await process_company(
+                    company_key, company_info, about_me, motivation_instructions, llm,
+                    filename_prefix=f"志望動機_{safe_filename(company_key)}",
+                    page_cache=page_cache,
+                    pool=pool,
+                )
+            except Exception as e:
+                print(f"❌ {company_key} failed: {e}")
+                md_filename = None
+            print(f"{'✅' if md_filename else '❌'} {company_key} finished")
+            return company_key, md_filename
+
+    results = dict(await asyncio.gather(*(worker(key, info) for key, info in companies.items())))
+
+    succeeded = sum(1 for filename in results.values() if filename)
+    print("\n" + "=" * 60)
+    print(f"📋 Batch complete: {succeeded}/{len(results)} companies succeeded")
+    for company_key, md_filename in results.items():
+        print(f"  {'✅' if md_filename else '❌'} {company_key}: {md_filename or 'no result'}")
+    print("=" * 60)
+    return results
+
+
+async def main(batch: bool = False, selected: Optional[list] = None, concurrency: int = BATCH_CONCURRENCY):
+    """
+    Run the 志望動機 agent.
+
+    Args:
+        batch: Process every company in the backlog instead of only companies.json["working"]
+        selected: Only process these company keys (implies batch mode)
+        concurrency: Maximum number of companies processed at the same time in batch mode
+    """
+    inputs = load_inputs()
+    if inputs is None:
+        return
+    about_me, motivation_instructions, companies_data = inputs
+
+    if "backlog" not in companies_data:
+        print("Error: No 'backlog' found in companies.json.")
+        return
+    backlog = companies_data["backlog"]
+
+    # Initialize the selected LLM once for the whole run
+    llm = get_router_llm(ROUTER_BACKENDS) if ROUTER_BACKENDS else get_llm(PROVIDER, MODEL)
+    page_cache = PageCache(freshness=PAGE_CACHE_FRESHNESS) if PAGE_CACHE_FRESHNESS is not None else None
+
+    if batch or selected:
+        if selected:
+            missing = [key for key in selected if key not in backlog]
+            if missing:
+                print(f"Error: Companies not found in backlog: {missing}")
+                print(f"Available companies: {list(backlog.keys())}")
+                return
+            companies = {key: backlog[key] for key in selected}
+        else:
+            companies = backlog
+
+        # One browser for the whole batch, one isolated context per company
+        pool = BrowserPool(max_contexts=concurrency)
+        try:
+            return await run_batch(companies, about_me, motivation_instructions, llm, concurrency, page_cache, pool)
+        finally:
+            await pool.close()
+            print_run_stats(llm, page_cache, pool)
+    
+    # Get the current working company
+    if "working" not in companies_data:
+        print("Error: No 'working' company specified in companies.json.")
+        return
+    
+    current_company = companies_data["working"]
+    
+    # Check if the company exists in backlog
+    if current_company not in backlog:
+        print(f"Error: Company '{current_company}' not found in backlog.")
+        print(f"Available companies: {list(backlog.keys())}")
+        return
+    
+    try:
+        return await process_company(current_company, backlog[current_company], about_me, motivation_instructions, llm, page_cache=page_cache)
+    finally:
+        print_run_stats(llm, page_cache)
+
+
+def print_run_stats(llm, page_cache: Optional[PageCache] = None, pool: Optional[BrowserPool] = None):
+    """Print the router, cache and browser pool statistics of a run"""
+    if isinstance(llm, LLMRouter):
+        llm.print_stats()
+    get_default_cache().print_stats()
+    if page_cache:
+        page_cache.print_stats()
+    if pool:
+        pool.print_stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write 志望動機 for the companies in input/companies.json")
+    parser.add_argument("--batch", action="store_true", help="process every company in the backlog")
+    parser.add_argument("--companies", nargs="+", metavar="KEY", help="only process these backlog companies")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="companies processed at the same time in batch mode")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(batch=args.batch, selected=args.companies, concurrency=args.concurrency))
+    finally:
+        report("main")
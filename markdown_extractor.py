@@ -1,8 +1,10 @@
 import datetime
-import json
 import re # Import the regular expression module
 import os # Import the os module
 
+from agent_log import AgentLogWriter, write_agent_log
+from instrumentation import traced
+
 # Define output directories
 RESULT_DIR = "output/result"
 LOG_DIR = "output/log"
@@ -24,6 +26,7 @@ class AgentHistoryList:
         self.all_results = all_results
 
 # --- CORRECTED AND SIMPLIFIED FUNCTION ---
+@traced("extract_and_save_markdown", "extract")
 def extract_and_save_markdown(agent_result, filename_prefix="志望動機"):
     """
     Extracts the final markdown output from an agent result, saves it to a file,
@@ -38,19 +41,12 @@ def extract_and_save_markdown(agent_result, filename_prefix="志望動機"):
     os.makedirs(RESULT_DIR, exist_ok=True)
     os.makedirs(LOG_DIR, exist_ok=True)
 
-    # --- Step 1: Save a raw log of the entire agent result ---
-    log_filename = os.path.join(LOG_DIR, f"{filename_prefix}_log_{timestamp}.json")
+    # --- Step 1: Save a log of the agent result, one JSON line per step ---
+    log_filename = os.path.join(LOG_DIR, f"{filename_prefix}_log_{timestamp}.jsonl")
     try:
-        # A robust way to serialize any object (including custom classes) to JSON
-        log_content = json.dumps(
-            agent_result, 
-            default=lambda o: o.__dict__ if hasattr(o, '__dict__') else str(o), 
-            indent=2,
-            ensure_ascii=False # Ensures Japanese characters are saved correctly
-        )
-        with open(log_filename, "w", encoding="utf-8") as f:
-            f.write(log_content)
-        print(f"Agent result log saved to {log_filename}")
+        # Written step by step, so the whole result is never serialized into one string
+        steps = write_agent_log(agent_result, log_filename)
+        print(f"Agent result log saved to {log_filename} ({steps} steps)")
     except Exception as e:
         print(f"Warning: Could not save agent result log: {e}")
 
@@ -84,39 +80,10 @@ def extract_and_save_markdown(agent_result, filename_prefix="志望動機"):
             
             if results:
                 for action in results:
-                    is_done_val = None
-                    current_extraction = None
-                    text_field_val = None
-
-                    # Get 'is_done' status
-                    if isinstance(action, dict):
-                        is_done_val = action.get('is_done')
-                    elif hasattr(action, 'is_done'):
-                        is_done_val = action.is_done
-
-                    if is_done_val:
-                        # Try to get 'extracted_content'
-                        if isinstance(action, dict):
-                            current_extraction = action.get('extracted_content')
-                        elif hasattr(action, 'extracted_content'):
-                            current_extraction = action.extracted_content
-                        
-                        # If 'extracted_content' is not found or is empty, try 'text'
-                        if not current_extraction:
-                            if isinstance(action, dict):
-                                text_field_val = action.get('text')
-                            elif hasattr(action, 'text'):
-                                text_field_val = action.text
-                            
-                            if text_field_val:
-                                if isinstance(text_field_val, dict) and 'text' in text_field_val:
-                                    current_extraction = text_field_val['text']
-                                elif isinstance(text_field_val, str):
-                                    current_extraction = text_field_val
-                        
-                        if current_extraction:
-                            final_output = current_extraction
-                            break # Stop after finding the first 'done' action
+                    current_extraction = done_content(action)
+                    if current_extraction:
+                        final_output = current_extraction
+                        break # Stop after finding the first 'done' action
                 if final_output:
                     break # Stop searching through history items
     
@@ -125,19 +92,53 @@ def extract_and_save_markdown(agent_result, filename_prefix="志望動機"):
         print("Could not find a final output marked with 'is_done=True' in the agent result.")
         return None
 
-    # **FIX:** This now handles both wrapped and raw markdown.
-    # It uses regex to find content inside ```markdown ... ``` if it exists.
+    # Save the cleaned markdown content
+    md_filename = os.path.join(RESULT_DIR, f"{filename_prefix}_{timestamp}.md")
+    return save_markdown(clean_markdown(final_output), md_filename)
+
+
+def _field(action, name):
+    """Read a field from either a dict (loaded log) or an object (live ActionResult)"""
+    if isinstance(action, dict):
+        return action.get(name)
+    return getattr(action, name, None)
+
+
+def done_content(action):
+    """
+    The final content of an action marked as done, or None.
+    Uses 'extracted_content', falling back to 'text' (a string or {"text": ...}).
+    """
+    if not _field(action, 'is_done'):
+        return None
+
+    current_extraction = _field(action, 'extracted_content')
+    # If 'extracted_content' is not found or is empty, try 'text'
+    if not current_extraction:
+        text_field_val = _field(action, 'text')
+        if isinstance(text_field_val, dict) and 'text' in text_field_val:
+            current_extraction = text_field_val['text']
+        elif isinstance(text_field_val, str):
+            current_extraction = text_field_val
+    return current_extraction or None
+
+
+def clean_markdown(final_output: str) -> str:
+    """
+    Handles both wrapped and raw markdown: content inside ```markdown ... ```
+    (or ``` ... ```) is extracted, anything else is returned unchanged.
+    """
     markdown_match = re.search(r"```(?:markdown)?\s*(.*?)\s*```", final_output, re.DOTALL)
     if markdown_match:
-        # If wrapped in ```markdown ... ``` or ``` ... ```, extract the content
-        final_output = markdown_match.group(1).strip()
-    # If not wrapped, `final_output` remains unchanged (it's already the raw markdown).
+        return markdown_match.group(1).strip()
+    return final_output
 
-    # Save the cleaned markdown content
-    md_filename = os.path.join(RESULT_DIR, f"{filename_prefix}_{timestamp}.md")
+
+def save_markdown(content: str, md_filename: str):
+    """Write the markdown file, returning its name (None on failure)"""
     try:
         with open(md_filename, "w", encoding="utf-8") as f:
-            f.write(final_output)
+            f.write(content)
         print(f"Result saved to {md_filename}")
         return md_filename
     except Exception as e:
@@ -145,6 +146,83 @@ def extract_and_save_markdown(agent_result, filename_prefix="志望動機"):
         return None
 
 
+class StreamingMarkdownExtractor:
+    """
+    Streaming version of extract_and_save_markdown for long agent runs.
+
+    Pass `on_step_end` to `agent.run()` (run_agent / run_agent_with_fallback
+    forward it). After every step the new ActionResults are appended to a
+    JSON-lines log (see agent_log.py) and any extracted content to a `.partial.md` file, and the
+    final markdown is written the moment the done action arrives - no
+    backwards walk over the finished history. Nothing is kept in memory
+    between steps, and with `drop_screenshots` the screenshots of steps that
+    have been written are released from the agent history too.
+
+    Usage:
+        extractor = StreamingMarkdownExtractor("志望動機")
+        result = await run_agent(task, llm, on_step_end=extractor.on_step_end)
+        md_filename = extractor.finalize()
+    """
+
+    def __init__(self, filename_prefix="志望動機", drop_screenshots=True):
+        self.filename_prefix = filename_prefix
+        self.drop_screenshots = drop_screenshots
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        os.makedirs(LOG_DIR, exist_ok=True)
+        self.log_filename = os.path.join(LOG_DIR, f"{filename_prefix}_log_{timestamp}.jsonl")
+        self.log = AgentLogWriter(self.log_filename)
+        self.partial_filename = os.path.join(RESULT_DIR, f"{filename_prefix}_{timestamp}.partial.md")
+        self.md_filename = os.path.join(RESULT_DIR, f"{filename_prefix}_{timestamp}.md")
+        self.steps = 0
+        self.result_filename = None  # Set once the done action has been saved
+
+    @traced("extract.process_step", "extract")
+    def process_step(self, step, results, url=None, title=None, actions=None):
+        """Write one step's ActionResults; returns the markdown filename once the done action is seen"""
+        self.steps += 1
+        self.log.write_step(step, results, url=url, title=title, actions=actions)
+        for action in results or []:
+            content = done_content(action)
+            extracted = _field(action, 'extracted_content')
+            if content and self.result_filename is None:
+                self.result_filename = save_markdown(clean_markdown(content), self.md_filename)
+                if self.result_filename and os.path.exists(self.partial_filename):
+                    os.remove(self.partial_filename)
+            elif extracted and self.result_filename is None:
+                with open(self.partial_filename, "a", encoding="utf-8") as partial:
+                    partial.write(f"<!-- step {step} -->\n{extracted}\n\n")
+        return self.result_filename
+
+    async def on_step_end(self, agent):
+        """`agent.run(on_step_end=...)` hook"""
+        history = agent.state.history.history
+        last = history[-1] if history else None
+        state = last.state if last is not None else None
+        actions = last.model_output.action if last is not None and last.model_output is not None else None
+        # Numbered like the batch log (1-based history position); n_steps has already moved on to the next step
+        self.process_step(
+            len(history), agent.state.last_result,
+            url=state.url if state else None, title=state.title if state else None, actions=actions,
+        )
+        if self.drop_screenshots and last is not None and last.state is not None:
+            last.state.screenshot = None
+
+    def finalize(self):
+        """
+        Returns the markdown filename if the done action was seen, else None
+        (the extracted content so far stays in the `.partial.md` file).
+        """
+        self.log.close()
+        if self.result_filename:
+            print(f"Agent step log saved to {self.log_filename} ({self.steps} steps)")
+            return self.result_filename
+        print("Could not find a final output marked with 'is_done=True' in the agent result.")
+        if os.path.exists(self.partial_filename):
+            print(f"Partial extracted content kept in {self.partial_filename}")
+        return None
+
+
 # --- Test with the provided example ---
 def test_extractor():
     # The last action is_done=True and has the raw markdown in extracted_content
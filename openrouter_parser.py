@@ -0,0 +1,203 @@
+"""
+Cleanup of OpenRouter model responses before browser-use parses them.
+
+Some free OpenRouter models leak chat-template tokens (`<|eot_id|>`,
+`<|start_header_id|>...<|end_header_id|>`, tool call markers) into their
+output, which breaks the agent's JSON parsing. All special-token patterns are
+compiled once into a single alternation, so a response is scrubbed in one scan
+(and not at all when it contains no `<|`), and the removal stats come back
+together with the cleaned text.
+
+StreamingScrubber does the same cleanup on a streamed response, chunk by
+chunk: text that might be the start of a token split across chunks
+("...<|eo" + "t_id|>...") is held back until the next chunk decides it.
+It backs ChatOpenRouter's stream()/astream() only: browser-use agents call the
+model with ainvoke, so agent steps always get the whole response scrubbed at once.
+"""
+
+import json
+import re
+from typing import NamedTuple, Tuple
+
+from instrumentation import span
+
+# Tokens removed from responses, in the order the original per-pattern cleanup applied them
+SPECIAL_TOKEN_PATTERNS = [
+    r'<\|tool_call_start_id\|>[^<]*<\|tool_call_end\|>',
+    r'<\|tool_call_start\|>[^<]*<\|tool_call_end\|>',
+    r'<\|start_header_id\|>[^<]*<\|end_header_id\|>',
+    r'<\|eot_id\|>',
+    r'<\|begin_of_text\|>',
+    r'<\|end_of_text\|>',
+    r'<\|assistant\|>',
+    r'<\|user\|>',
+    r'<\|system\|>',
+]
+
+_SPECIAL_TOKENS_RE = re.compile("|".join(SPECIAL_TOKEN_PATTERNS), re.DOTALL | re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+_JSON_CONTENT_RE = re.compile(r'\{[^{}]*"content"[^{}]*\}', re.DOTALL)
+
+# The literal tokens behind SPECIAL_TOKEN_PATTERNS, to recognise a token that is cut off mid-stream
+_PAIRED_TOKENS = [
+    ("<|tool_call_start_id|>", "<|tool_call_end|>"),
+    ("<|tool_call_start|>", "<|tool_call_end|>"),
+    ("<|start_header_id|>", "<|end_header_id|>"),
+]
+_SINGLE_TOKENS = ["<|eot_id|>", "<|begin_of_text|>", "<|end_of_text|>", "<|assistant|>", "<|user|>", "<|system|>"]
+_TOKEN_STARTS = _SINGLE_TOKENS + [start for start, _ in _PAIRED_TOKENS]
+
+
+class ScrubStats(NamedTuple):
+    removed: int  # Special tokens removed
+    original_length: int
+    cleaned_length: int
+    json_content: bool  # The text was replaced by the "content" of an embedded JSON object
+
+
+def scrub_special_tokens(text: str) -> Tuple[str, int]:
+    """
+    Remove special tokens in one scan. Returns (text, tokens removed).
+
+    Removing a token can join its neighbours into a new one ("<|us<|eot_id|>er|>")
+    or free a wrapper around it ("<|start_header_id|>a<|eot_id|>b<|end_header_id|>x"),
+    so the scan is repeated while it still finds something. This differs on purpose
+    from the old per-pattern cleanup, which applied each pattern once and returned
+    "<|start_header_id|>ab<|end_header_id|>x" for the latter: no token is left behind.
+    """
+    removed = 0
+    while "<|" in text:
+        text, count = _SPECIAL_TOKENS_RE.subn("", text)
+        if not count:
+            break
+        removed += count
+    return text, removed
+
+
+def scrub_response(text) -> Tuple[str, ScrubStats]:
+    """
+    Clean a raw OpenRouter response.
+
+    Returns:
+        (cleaned text, ScrubStats)
+    """
+    if not isinstance(text, str):
+        text = str(text)
+        return text, ScrubStats(0, len(text), len(text), False)
+
+    original_length = len(text)
+    cleaned_text, removed = scrub_special_tokens(text)
+
+    # Clean up extra whitespace and newlines
+    if "\n" in cleaned_text:
+        cleaned_text = _BLANK_LINES_RE.sub('\n\n', cleaned_text)
+    cleaned_text = cleaned_text.strip()
+
+    # If the response looks like it contains JSON with tool calls, extract the content
+    if '"content"' in cleaned_text:
+        json_match = _JSON_CONTENT_RE.search(cleaned_text)
+        if json_match:
+            try:
+                parsed = json.loads(json_match.group())
+                if isinstance(parsed, dict) and 'content' in parsed:
+                    return parsed['content'], ScrubStats(removed, original_length, len(cleaned_text), True)
+            except json.JSONDecodeError:
+                pass
+
+    return cleaned_text, ScrubStats(removed, original_length, len(cleaned_text), False)
+
+
+def parse_openrouter_response(text: str, verbose: bool = True) -> str:
+    """
+    Parse OpenRouter response to remove problematic tool call tokens and extract clean content.
+
+    Args:
+        text: Raw response text from OpenRouter model
+        verbose: Print what was removed
+
+    Returns:
+        Cleaned text suitable for browser-use agent
+    """
+    with span("parse_openrouter_response", "parse") as attrs:
+        cleaned_text, stats = scrub_response(text)
+        attrs["removed"] = stats.removed
+    if verbose and stats.removed and stats.cleaned_length != stats.original_length:
+        print(f"Parser: Removed {stats.removed} problematic token(s), cleaned {stats.original_length} -> {stats.cleaned_length} chars")
+    if verbose and stats.json_content:
+        print("Parser: Extracted content from JSON structure")
+    return cleaned_text
+
+
+def _could_become_token(tail: str) -> bool:
+    """Whether more text appended to `tail` could complete it into a special token"""
+    tail = tail.lower()
+    if any(token.startswith(tail) for token in _TOKEN_STARTS):
+        return True
+    for start, end in _PAIRED_TOKENS:
+        if tail.startswith(start):
+            # Inside a tool call / header: waiting for its end token, or for the removal of
+            # the tokens inside it ("<|start_header_id|>x<|eot_id|>y<|end_header_id|>" is removed whole)
+            rest = tail[len(start):]
+            position = rest.find("<")
+            if position == -1 or end.startswith(rest[position:]) or _holdback_start(rest) <= position:
+                return True
+    return False
+
+
+def _holdback_start(text: str) -> int:
+    """Start of the suffix of scrubbed `text` that could still turn into a token (or its length if none)"""
+    start = len(text) - 1 if text.endswith("<") else len(text)
+    position = text.find("<|")
+    while position != -1:
+        if _could_become_token(text[position:]):
+            start = position
+            break
+        position = text.find("<|", position + 1)
+    # Removing a token can join the text before it into a new one ("<|us" + "<|eot_id|>" + "er|>")
+    while start < len(text):
+        position = text.rfind("<|", 0, start)
+        if position == -1 or not any(token.startswith(text[position:start].lower()) for token in _TOKEN_STARTS):
+            break
+        start = position
+    return start
+
+
+class StreamingScrubber:
+    """
+    Incremental version of scrub_response for streamed responses.
+
+    `feed()` takes each chunk and returns the cleaned text that is safe to emit;
+    `flush()` returns the rest at the end of the stream. The concatenated output
+    equals scrub_response's text, except that a response which is a JSON object
+    with a "content" field is passed through as is (that needs the whole response).
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._started = False  # Leading whitespace is dropped until the first visible character
+        self.removed = 0
+        self.original_length = 0
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        if "\n" in text:
+            text = _BLANK_LINES_RE.sub('\n\n', text)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        self.original_length += len(chunk)
+        self._pending, removed = scrub_special_tokens(self._pending + chunk)
+        self.removed += removed
+        ready_end = _holdback_start(self._pending)
+        ready = self._pending[:ready_end]
+        # Trailing whitespace may merge with whitespace after a later token, or be stripped at the end
+        visible_end = len(ready.rstrip())
+        self._pending = self._pending[visible_end:]
+        return self._emit(ready[:visible_end])
+
+    def flush(self) -> str:
+        """The remaining text once the stream has ended"""
+        text, self._pending = self._pending.rstrip(), ""
+        return self._emit(text)
@@ -0,0 +1,192 @@
+"""
+Local page-snapshot cache for the URLs the agents start from.
+
+PageCache fetches a URL over plain HTTP, keeps the HTML and a readable text
+version on disk, and revalidates with ETag / Last-Modified once a snapshot is
+older than the freshness window. Pages whose snapshot has enough text can be
+handed to the agent directly instead of being browsed again, which saves
+browser time and the tokens spent on DOM extraction. The snapshot text goes
+into the agent's task; browser sessions never read from this cache.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import re
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+from typing import Optional
+
+PAGE_CACHE_DIR = "output/cache/pages"
+DEFAULT_FRESHNESS = 24 * 3600  # seconds before a snapshot is revalidated
+MIN_TEXT_CHARS = 300  # Less text than this usually means a JavaScript-rendered page
+MAX_TEXT_CHARS = 6000  # Text handed to the agent per page
+USER_AGENT = "Mozilla/5.0 (compatible; browser-using page cache)"
+FETCH_TIMEOUT = 15
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, skipping scripts, styles and other non-content tags"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head"}
+    BLOCK_TAGS = {"p", "div", "section", "article", "li", "br", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "header", "footer"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Readable text of an HTML page"""
+    parser = _TextExtractor()
+    parser.feed(html)
+    text = "".join(parser.parts)
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    return text.strip()
+
+
+class PageSnapshot:
+    """One cached page"""
+
+    def __init__(self, url, text, html="", etag=None, last_modified=None, fetched_at=None, content_hash=None, changed=True, from_cache=False):
+        self.url = url
+        self.text = text
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or datetime.datetime.now().timestamp()
+        self.content_hash = content_hash or hashlib.sha256(html.encode("utf-8")).hexdigest()
+        self.changed = changed  # False when the server confirmed the previous snapshot is still current
+        self.from_cache = from_cache  # True when no network request was made
+
+    @property
+    def usable(self) -> bool:
+        """Whether the snapshot has enough text to replace a browser visit"""
+        return len(self.text) >= MIN_TEXT_CHARS
+
+    def metadata(self) -> dict:
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "content_hash": self.content_hash,
+        }
+
+
+class PageCache:
+    """
+    Disk cache of page snapshots with HTTP revalidation.
+
+    Args:
+        cache_dir: Directory the snapshots are stored in
+        freshness: Seconds a snapshot is used without asking the server again
+    """
+
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR, freshness: float = DEFAULT_FRESHNESS):
+        self.cache_dir = cache_dir
+        self.freshness = freshness
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str):
+        base = os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+        return base + ".json", base + ".html"
+
+    def load(self, url: str) -> Optional[PageSnapshot]:
+        """The stored snapshot for a URL, without any network access"""
+        meta_path, html_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(html_path, "r", encoding="utf-8") as f:
+                html = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return PageSnapshot(
+            url, html_to_text(html), html, meta.get("etag"), meta.get("last_modified"),
+            meta.get("fetched_at"), meta.get("content_hash"), changed=False, from_cache=True,
+        )
+
+    def save(self, snapshot: PageSnapshot):
+        meta_path, html_path = self._paths(snapshot.url)
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(snapshot.html)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot.metadata(), f, ensure_ascii=False)
+
+    def fetch(self, url: str) -> Optional[PageSnapshot]:
+        """
+        Return a snapshot of `url`: from disk while fresh, revalidated with the
+        server once stale. Falls back to a stale snapshot if the server can't be
+        reached, and returns None if there is nothing at all.
+        """
+        cached = self.load(url)
+        now = datetime.datetime.now().timestamp()
+        if cached and now - cached.fetched_at < self.freshness:
+            self.hits += 1
+            return cached
+
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        if cached and cached.etag:
+            request.add_header("If-None-Match", cached.etag)
+        if cached and cached.last_modified:
+            request.add_header("If-Modified-Since", cached.last_modified)
+
+        try:
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+                charset = response.headers.get_content_charset() or "utf-8"
+                html = response.read().decode(charset, errors="replace")
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached:
+                self.revalidated += 1
+                cached.fetched_at = now
+                cached.from_cache = False
+                self.save(cached)
+                return cached
+            print(f"Page cache: {url} returned HTTP {e.code}")
+            return cached
+        except Exception as e:
+            print(f"Page cache: could not fetch {url}: {e}")
+            return cached
+
+        self.downloads += 1
+        snapshot = PageSnapshot(url, html_to_text(html), html, etag, last_modified, now)
+        snapshot.changed = cached is None or cached.content_hash != snapshot.content_hash
+        self.save(snapshot)
+        return snapshot
+
+    async def afetch(self, url: str) -> Optional[PageSnapshot]:
+        """Async version of `fetch` (runs in a worker thread)"""
+        return await asyncio.to_thread(self.fetch, url)
+
+    async def prefetch(self, urls) -> dict:
+        """Fetch several URLs concurrently, returning url -> snapshot for the usable ones"""
+        snapshots = await asyncio.gather(*(self.afetch(url) for url in urls))
+        return {url: snapshot for url, snapshot in zip(urls, snapshots) if snapshot and snapshot.usable}
+
+    def print_stats(self):
+        print(f"🌐 Page cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), {self.downloads} downloads")
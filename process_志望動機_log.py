@@ -1,42 +1,224 @@
 """
 Script to process the browser automation log and extract the final 志望動機 content.
+Works with JSON-lines logs (.jsonl, .jsonl.gz, .jsonl.zst) and old .json logs.
+
+    python process_志望動機_log.py                         # the default log below
+    python process_志望動機_log.py output/log/x_log_y.jsonl
+    python process_志望動機_log.py --bulk --workers 8      # every log in output/log
+    python process_志望動機_log.py --bulk --overwrite      # ... replacing the original results
+
+Bulk mode re-extracts the markdown of the whole log archive in a process pool,
+writing each result next to the original one ("志望動機_log_<ts>.jsonl" ->
+"志望動機_<ts>.reextracted.md"); with --overwrite it replaces the original
+"志望動機_<ts>.md" instead. A manifest remembers the size, mtime and hash of every log
+and the version of the extraction rules it was processed with, so logs whose
+results are up to date are skipped - change the rules (fence regex, done
+content fallback) and the next run redoes everything.
 """
 
+import argparse
+import concurrent.futures
+import datetime
+import glob
+import hashlib
+import inspect
 import json
-from markdown_extractor import extract_and_save_markdown
+import os
+import time
+
+import agent_log
+import markdown_extractor
+from agent_log import INDEX_SUFFIX, AgentLogReader
+from markdown_extractor import LOG_DIR, RESULT_DIR, clean_markdown, save_markdown
+
+DEFAULT_LOG = "志望動機_log_20250531_200228.json"
+MANIFEST_NAME = "reextract_manifest.json"  # Kept in the result directory
+REEXTRACTED_SUFFIX = ".reextracted.md"  # Bulk results, so the originals aren't overwritten
+LOG_PATTERNS = ("*_log_*.json", "*_log_*.jsonl", "*_log_*.jsonl.gz", "*_log_*.jsonl.zst")
+
 
 def load_and_process_log(log_filename):
-    """Load the JSON log file and process it with the markdown extractor."""
+    """Find the last done action in the log (without loading the whole file) and save it as markdown."""
     try:
-        with open(log_filename, 'r', encoding='utf-8') as f:
-            log_data = json.load(f)
-        
-        print(f"Successfully loaded log file: {log_filename}")
-        
-        # Extract the content using the markdown extractor
-        result_filename = extract_and_save_markdown(log_data, filename_prefix="志望動機_final")
-        
+        final_output = AgentLogReader(log_filename).last_done()
+
+        print(f"Successfully read log file: {log_filename}")
+
+        result_filename = None
+        if final_output:
+            os.makedirs(RESULT_DIR, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            md_filename = os.path.join(RESULT_DIR, f"志望動機_final_{timestamp}.md")
+            result_filename = save_markdown(clean_markdown(final_output), md_filename)
+
         if result_filename:
             print(f"✅ Successfully extracted and saved 志望動機 to: {result_filename}")
             return result_filename
         else:
             print("❌ Failed to extract content from the log file")
             return None
-            
+
     except Exception as e:
         print(f"❌ Error processing log file: {e}")
         return None
 
-if __name__ == "__main__":
+
+def rules_version() -> str:
+    """Hash of the extraction code, so results are redone whenever the rules change"""
+    functions = (agent_log.step_done_content, markdown_extractor.done_content, markdown_extractor.clean_markdown)
+    source = "".join(inspect.getsource(function) for function in functions)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_logs(log_dir: str = LOG_DIR) -> list:
+    """Agent logs in `log_dir` (sidecar indexes excluded), oldest first"""
+    logs = {path for pattern in LOG_PATTERNS for path in glob.glob(os.path.join(log_dir, pattern))}
+    return sorted((path for path in logs if not path.endswith(INDEX_SUFFIX)), key=os.path.getmtime)
+
+
+def result_filename_for(log_filename: str, result_dir: str = RESULT_DIR, overwrite: bool = False) -> str:
+    """
+    The re-extracted markdown file of a log: "志望動機_log_20250531_200228.jsonl" ->
+    "志望動機_20250531_200228.reextracted.md", or the original "志望動機_20250531_200228.md" with `overwrite`
+    """
+    name = os.path.basename(log_filename).split(".", 1)[0]
+    return os.path.join(result_dir, name.replace("_log_", "_", 1) + (".md" if overwrite else REEXTRACTED_SUFFIX))
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: dict, path: str):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def is_up_to_date(entry: dict, log_filename: str, rules: str) -> bool:
+    """
+    Whether a manifest entry still matches the log. A changed mtime alone (a copy,
+    a touch) falls back to comparing the content hash, which is refreshed in `entry`.
+    """
+    if not entry or entry.get("rules") != rules or not os.path.exists(entry.get("result") or ""):
+        return False
+    stat = os.stat(log_filename)
+    if entry.get("size") != stat.st_size:
+        return False
+    if entry.get("mtime") == stat.st_mtime:
+        return True
+    if entry.get("sha1") == file_hash(log_filename):
+        entry["mtime"] = stat.st_mtime
+        return True
+    return False
+
+
+def extract_log(log_filename: str, md_filename: str) -> dict:
+    """Re-extract one log (runs in a worker process). Returns its manifest entry."""
+    stat = os.stat(log_filename)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha1": file_hash(log_filename), "result": None, "error": None}
+    try:
+        final_output = AgentLogReader(log_filename).last_done()
+        if final_output:
+            with open(md_filename, "w", encoding="utf-8") as f:
+                f.write(clean_markdown(final_output))
+            entry["result"] = md_filename
+        else:
+            entry["error"] = "no done action"
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
+
+def bulk_process_logs(log_dir: str = LOG_DIR, result_dir: str = RESULT_DIR, workers: int = None,
+                      force: bool = False, overwrite: bool = False) -> dict:
+    """
+    Re-extract every log in `log_dir` whose result is missing or out of date.
+    Results go to "*.reextracted.md" files unless `overwrite` replaces the original ones.
+
+    Returns:
+        Run statistics: found, skipped, extracted, failed, bytes, seconds
+    """
+    os.makedirs(result_dir, exist_ok=True)
+    rules = rules_version()
+    manifest_path = os.path.join(result_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    logs = find_logs(log_dir)
+
+    results = {log: result_filename_for(log, result_dir, overwrite) for log in logs}
+    pending = [
+        log for log in logs
+        if force or (manifest.get(log) or {}).get("result") != results[log] or not is_up_to_date(manifest[log], log, rules)
+    ]
+    stats = {"found": len(logs), "skipped": len(logs) - len(pending), "extracted": 0, "failed": 0, "bytes": 0}
+    print(f"📂 {len(logs)} logs in {log_dir}: {len(pending)} to extract, {stats['skipped']} up to date (rules {rules})")
+
+    start = time.perf_counter()
+    if pending:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(extract_log, log, results[log]): log for log in pending}
+            for future in concurrent.futures.as_completed(futures):
+                log = futures[future]
+                entry = future.result()
+                stats["bytes"] += entry["size"]
+                if entry["result"]:
+                    stats["extracted"] += 1
+                    entry["rules"] = rules
+                    manifest[log] = {key: value for key, value in entry.items() if key != "error"}
+                else:
+                    stats["failed"] += 1
+                    manifest.pop(log, None)
+                    print(f"❌ {log}: {entry['error']}")
+    # Also keeps the mtimes refreshed by is_up_to_date
+    save_manifest(manifest, manifest_path)
+    stats["seconds"] = time.perf_counter() - start
+
+    elapsed = max(stats["seconds"], 1e-9)
+    print(
+        f"✅ Extracted {stats['extracted']}, failed {stats['failed']}, skipped {stats['skipped']} "
+        f"in {stats['seconds']:.2f}s ({len(pending) / elapsed:.1f} logs/s, {stats['bytes'] / elapsed / 1e6:.1f} MB/s)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the final 志望動機 markdown from agent logs")
+    parser.add_argument("log_file", nargs="?", default=DEFAULT_LOG, help="Log to process (single-file mode)")
+    parser.add_argument("--bulk", action="store_true", help="Re-extract every log in --log-dir")
+    parser.add_argument("--log-dir", default=LOG_DIR, help="Log archive for --bulk")
+    parser.add_argument("--result-dir", default=RESULT_DIR, help="Where --bulk writes the markdown files")
+    parser.add_argument("--workers", type=int, help="Worker processes for --bulk (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and redo every log")
+    parser.add_argument("--overwrite", action="store_true", help="Replace the original results instead of writing *.reextracted.md")
+    args = parser.parse_args()
+
+    if args.bulk:
+        bulk_process_logs(args.log_dir, args.result_dir, args.workers, args.force, args.overwrite)
+        return
+
     # Process the browser automation log file
-    log_file = "志望動機_log_20250531_200228.json"
-    process_result = load_and_process_log(log_file)
-    
+    process_result = load_and_process_log(args.log_file)
+
     if process_result:
         print("\n" + "="*60)
         print("🎉 志望動機 extraction completed successfully!")
         print("="*60)
-        
+
         # Also display the content for quick verification
         try:
             with open(process_result, 'r', encoding='utf-8') as f:
@@ -48,3 +230,7 @@ if __name__ == "__main__":
             print(f"Could not preview content: {e}")
     else:
         print("\n❌ Failed to process the 志望動機 log file")
+
+
+if __name__ == "__main__":
+    main()
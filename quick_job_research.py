@@ -1,12 +1,20 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
-from browser_use import Agent
 from dotenv import load_dotenv
 import asyncio
 
+from browser_pool import BrowserPool
+from instrumentation import report
+from rate_limiter import run_agent
+from llm_analysis import analyze_text, condense_results
+from job_records import STRUCTURED_OUTPUT_INSTRUCTION, format_job_stats, job_controller, records_by_platform
+from job_dedup import collapse_duplicates, dedupe_search_results
+from job_store import HISTORY_DAYS, JobStore, search_key
+from llm_limiter import get_scheduler, rate_limited
+
 # Read GOOGLE_API_KEY into env
 load_dotenv()
 
-async def search_single_platform(platform_name, platform_url, job_role, location, llm):
+async def search_single_platform(platform_name, platform_url, job_role, location, llm, pool=None, store=None):
     """
     Search a single job platform
     """
@@ -35,18 +43,22 @@ async def search_single_platform(platform_name, platform_url, job_role, location
     - Key responsibilities
     
     Format each job clearly and extract all technical keywords mentioned.
+    {STRUCTURED_OUTPUT_INSTRUCTION}
+    
+    {store.known_postings_instruction(platform_name, search_key(job_role, location)) if store else ""}
     """
     
     print(f"🔍 Searching {platform_name}...")
-    agent = Agent(task=task, llm=llm)
-    result = await agent.run()
+    result = await run_agent(task, llm, url=platform_url, pool=pool, controller=job_controller())
     return result
 
 async def targeted_job_search():
     """
     Multi-platform job search focusing on Japanese job market
     """
-    llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash-exp')
+    llm = rate_limited(ChatGoogleGenerativeAI, get_scheduler("google", "2.0-flash-exp"))(model='gemini-2.0-flash-exp')
+    pool = BrowserPool()  # One shared browser for all platform agents
+    store = JobStore()  # Postings from earlier runs, so agents only collect new ones
     
     # 🎯 CUSTOMIZE YOUR SEARCH HERE
     JOB_ROLE = "Web Developer"  # ← Change this to your target role
@@ -77,30 +89,46 @@ async def targeted_job_search():
     print("🚀 Starting multi-platform job market research...")
     print("-" * 60)
     
-    all_results = {}
-    
-    # Search each platform
-    for platform_name, platform_url in all_platforms[:4]:  # Limit to first 4 to avoid rate limits
+    async def search_platform(platform_name, platform_url):
         try:
-            result = await search_single_platform(platform_name, platform_url, JOB_ROLE, LOCATION, llm)
-            all_results[platform_name] = result
+            result = await search_single_platform(platform_name, platform_url, JOB_ROLE, LOCATION, llm, pool, store)
             print(f"✅ {platform_name} search completed")
-            await asyncio.sleep(2)  # Small delay between searches
+            return platform_name, result
         except Exception as e:
             print(f"❌ Error searching {platform_name}: {str(e)}")
-            all_results[platform_name] = f"Error: {str(e)}"
+            return platform_name, f"Error: {str(e)}"
+    
+    # Search each platform - the shared rate limiter paces launches per host and per LLM provider
+    try:
+        all_results = dict(await asyncio.gather(
+            *(search_platform(platform_name, platform_url) for platform_name, platform_url in all_platforms)
+        ))
+    finally:
+        pool.print_stats()
+        await pool.close()
     
-    # Comprehensive analysis of all results
-    combined_results = ""
-    for platform, results in all_results.items():
-        combined_results += f"\n\n=== {platform.upper()} RESULTS ===\n"
-        combined_results += str(results)
+    # Remember what was found, so the next run only spends agent time on new postings
+    records = [record for platform_records in records_by_platform(all_results).values() for record in platform_records]
+    store.print_upsert_summary(store.upsert(records, search_key(JOB_ROLE, LOCATION)))
+    
+    # The same posting listed on several platforms is collapsed first (fewer tokens, honest counts)
+    deduped_results, records = dedupe_search_results(all_results)
+    
+    # Comprehensive analysis of all results - final results only, condensed to fit the token budget
+    combined_results = await condense_results(llm, deduped_results)
+    
+    # Exact counts from the structured job records (this run plus stored history), so the LLM only writes the narrative
+    history = store.with_history(records, search_key(JOB_ROLE, LOCATION))
+    job_stats = format_job_stats(collapse_duplicates(history, verbose=False))
     
     analysis_task = f"""
     Analyze job search results for "{JOB_ROLE}" positions in Japan from multiple platforms:
     
     {combined_results}
     
+    JOB STATISTICS (this run plus postings stored in the last {HISTORY_DAYS} days, computed exactly - use these numbers, don't recount):
+    {job_stats}
+    
     Provide comprehensive analysis:
     
     📊 **JAPAN JOB MARKET OVERVIEW:**
@@ -111,12 +139,12 @@ async def targeted_job_search():
     - Language requirements (Japanese level needed)
     
     🔥 **TOP SKILLS & TECHNOLOGIES:**
-    (Count frequency across all platforms)
-    - Programming Languages: [with frequency count]
-    - Frameworks/Libraries: [with frequency count]
-    - Cloud Platforms: [with frequency count]
-    - Tools & Software: [with frequency count]
-    - Soft Skills: [with frequency count]
+    (Use the precomputed skill frequencies above - don't recount)
+    - Programming Languages: [with precomputed count]
+    - Frameworks/Libraries: [with precomputed count]
+    - Cloud Platforms: [with precomputed count]
+    - Tools & Software: [with precomputed count]
+    - Soft Skills: [with precomputed count]
     
     🏢 **COMPANY INSIGHTS:**
     - Types of companies hiring (startups vs enterprises)
@@ -125,7 +153,7 @@ async def targeted_job_search():
     - Company sizes
     
     🎯 **KEYWORD PAIRS FOR APPLICATIONS:**
-    (Most effective combinations for Japanese job market)
+    (Build on the precomputed keyword pairs above - most effective combinations for Japanese job market)
     - Technical combinations: (e.g., "React + TypeScript", "AWS + Docker")
     - Skill pairs: (e.g., "Leadership + Communication", "API + Microservices")
     - Japan-specific terms: (e.g., "Business level Japanese", "Global team")
@@ -154,8 +182,7 @@ async def targeted_job_search():
     """
     
     print("📊 Analyzing Japan job market results...")
-    analysis_agent = Agent(task=analysis_task, llm=llm)
-    final_analysis = await analysis_agent.run()
+    final_analysis = await analyze_text(llm, analysis_task)  # Text only - no browser needed
     
     print("\n" + "="*80)
     print("🇯🇵 JAPAN JOB MARKET ANALYSIS RESULTS")
@@ -166,4 +193,7 @@ async def targeted_job_search():
     return final_analysis
 
 if __name__ == "__main__":
-    asyncio.run(targeted_job_search())
+    try:
+        asyncio.run(targeted_job_search())
+    finally:
+        report("quick_job_research")
@@ -0,0 +1,186 @@
+"""
+Shared rate limiting for the job search scripts.
+
+Every browser-use Agent launch goes through `run_agent`, which takes one token from:
+- the bucket of the host the agent starts on (politeness towards each job platform)
+- the bucket of the LLM provider the agent talks to
+
+Buckets refill continuously, so different hosts never wait on each other and a
+script gets as much throughput as the configured limits allow - no more fixed
+sleeps or trimmed platform lists.
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from browser_use import Agent
+
+from browser_pool import BrowserPool
+from instrumentation import instrument_browser_use, span
+
+# Browser launches, contexts and actions show up in the run's timing report
+instrument_browser_use()
+
+# Agent launches per minute and burst size for each host.
+# Hosts that are not listed use DEFAULT_HOST_LIMIT.
+HOST_LIMITS = {
+    "www.linkedin.com": (4, 1),  # LinkedIn is quick to show captchas
+}
+DEFAULT_HOST_LIMIT = (8, 1)  # Roughly one launch every 7 seconds per host
+
+# Agent launches per minute and burst size for each LLM provider.
+# https://ai.google.dev/gemini-api/docs/rate-limits
+LLM_LIMITS = {
+    "google": (10, 3),
+    "deepseek": (30, 5),
+    "openrouter": (10, 2),
+    "replay": (6000, 100),  # Recorded responses (replay_llm.py)
+}
+
+# Provider of chat models that were not built with llm_limiter.rate_limited
+PROVIDER_BY_MODEL_CLASS = {
+    "ChatGoogleGenerativeAI": "google",
+    "ChatDeepSeek": "deepseek",
+    "ChatOpenRouter": "openrouter",
+    "ReplayChatModel": "replay",
+}
+DEFAULT_LLM_LIMIT = (10, 2)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    `rate` is the refill speed in tokens per second and `capacity` the burst size.
+    Callers reserve tokens in arrival order: the balance may go negative, and the
+    returned delay is how long the caller has to wait for its reservation.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError("TokenBucket rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, per_minute: float, burst: float = 1):
+        """Create a bucket from a per-minute limit"""
+        return cls(per_minute / 60.0, burst)
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take `tokens` from the bucket and return the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = min(self.capacity, self.tokens - tokens)  # Negative `tokens` refunds
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    async def acquire(self, tokens: float = 1):
+        """Wait (without blocking the event loop) until `tokens` are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, tokens: float = 1):
+        """Blocking version of `acquire` for synchronous code"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """Lazily creates one TokenBucket per host and one per LLM provider"""
+
+    def __init__(self, host_limits=None, llm_limits=None):
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self.llm_limits = LLM_LIMITS if llm_limits is None else llm_limits
+        self._host_buckets = {}
+        self._llm_buckets = {}
+        self._lock = threading.Lock()
+
+    def host_bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self._host_buckets:
+                per_minute, burst = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+                self._host_buckets[host] = TokenBucket.per_minute(per_minute, burst)
+            return self._host_buckets[host]
+
+    def llm_bucket(self, provider: str) -> TokenBucket:
+        with self._lock:
+            if provider not in self._llm_buckets:
+                per_minute, burst = self.llm_limits.get(provider, DEFAULT_LLM_LIMIT)
+                self._llm_buckets[provider] = TokenBucket.per_minute(per_minute, burst)
+            return self._llm_buckets[provider]
+
+    async def acquire(self, url: str = None, provider: str = None):
+        """Wait for a launch slot on the given host and/or LLM provider"""
+        waits = []
+        if url:
+            waits.append(self.host_bucket(url).acquire())
+        if provider:
+            waits.append(self.llm_bucket(provider).acquire())
+        if waits:
+            await asyncio.gather(*waits)
+
+
+# Shared by all scripts in the same process
+default_limiter = RateLimiter()
+
+
+def llm_provider(llm):
+    """
+    LLM provider of a chat model, for its launch bucket: the provider of its quota
+    scheduler (models from llm_limiter.rate_limited), else guessed from the class.
+    None for anything else, e.g. an LLMRouter, whose backends have their own budgets.
+    """
+    scheduler = getattr(llm, "quota_scheduler", None)
+    if scheduler is not None:
+        return scheduler.name.split("/")[0]
+    return PROVIDER_BY_MODEL_CLASS.get(type(llm).__name__)
+
+
+async def run_agent(task: str, llm, url: str = None, provider: str = None, limiter: RateLimiter = None, pool: BrowserPool = None, on_step_end=None, max_steps: int = 100, **agent_kwargs):
+    """
+    Launch a browser-use Agent once the host and LLM provider limits allow it.
+    With a `pool`, the agent borrows an isolated context of the pool's shared browser
+    instead of launching its own.
+
+    Args:
+        task: The task description for the agent
+        llm: The language model to use
+        url: The URL the agent starts on (None for tasks without a specific host)
+        provider: LLM provider name used to pick the LLM bucket (derived from `llm` by default, see llm_provider)
+        limiter: RateLimiter to use (defaults to the shared `default_limiter`)
+        pool: BrowserPool to borrow a browser context from
+        on_step_end: Async `hook(agent)` called after every agent step (e.g. StreamingMarkdownExtractor.on_step_end)
+        max_steps: Maximum number of agent steps
+        **agent_kwargs: Extra keyword arguments passed to Agent
+
+    Returns:
+        The agent result
+    """
+    limiter = limiter or default_limiter
+    provider = provider or llm_provider(llm)
+    if pool is None:
+        with span("agent.launch_wait", "agent"):
+            await limiter.acquire(url=url, provider=provider)
+        agent = Agent(task=task, llm=llm, **agent_kwargs)
+        with span("agent.run", "agent", url=url):
+            return await agent.run(max_steps=max_steps, on_step_end=on_step_end)
+
+    # Wait for a free context first so launch tokens are not spent while queueing for the pool
+    async with pool.context() as browser_context:
+        with span("agent.launch_wait", "agent"):
+            await limiter.acquire(url=url, provider=provider)
+        agent = Agent(task=task, llm=llm, browser=pool.browser, browser_context=browser_context, **agent_kwargs)
+        with span("agent.run", "agent", url=url):
+            return await agent.run(max_steps=max_steps, on_step_end=on_step_end)
@@ -0,0 +1,147 @@
+"""
+Recorded-response chat model for offline runs and benchmarks.
+
+ReplayChatModel answers from a recording instead of a provider, so the agents,
+the analysis prompts and everything around them can run without API keys:
+
+    llm = get_llm("replay", "benchmarks/fixtures/offline/recording.json")
+
+A recording is a JSON file with a list of rules, checked in order against the
+human messages of a call (a rule without "match" matches everything):
+
+    {
+      "latency": 0.05,
+      "rules": [
+        {"match": "Go to https://doda.jp/", "responses": [{"current_state": ..., "action": [...]}, ...]},
+        {"match": "Condense the job search results", "responses": ["title | company | ..."]}
+      ]
+    }
+
+Each conversation (keyed on its first human message, i.e. the agent task) walks
+through the responses of its rule one call at a time and stays on the last one,
+so concurrent agents replay independently. JSON responses are returned as a
+tool call when the caller bound tools (browser-use's AgentOutput,
+with_structured_output), and as text otherwise.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr, model_validator
+
+from llm_limiter import estimate_message_tokens, estimate_tokens
+
+
+def load_recording(path: str) -> dict:
+    """Read a recording file, accepting a bare list of rules as well"""
+    with open(path, "r", encoding="utf-8") as f:
+        recording = json.load(f)
+    if isinstance(recording, list):
+        recording = {"rules": recording}
+    for rule in recording.get("rules", []):
+        if not rule.get("responses"):
+            raise ValueError(f"Recording {path}: rule {rule.get('match')!r} has no responses")
+    return recording
+
+
+def _message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "\n".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model that replays the responses of a recording file (see the module docstring).
+
+    Args:
+        recording: Path of the recording JSON file
+        latency: Seconds every call takes (defaults to the recording's "latency", else 0)
+    """
+
+    recording: str
+    latency: Optional[float] = None
+    model_name: str = "replay"
+    rules: List[dict] = []
+
+    _verified_api_keys: bool = PrivateAttr(default=True)  # Nothing to verify: browser-use skips its test call
+    _turns: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @model_validator(mode="after")
+    def _load(self):
+        recording = load_recording(self.recording)
+        self.rules = recording.get("rules", [])
+        if self.latency is None:
+            self.latency = float(recording.get("latency", 0))
+        return self
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "recording": self.recording}
+
+    @property
+    def calls(self) -> int:
+        """Calls answered so far"""
+        return sum(self._turns.values())
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _next_response(self, messages) -> str:
+        human = [_message_text(message) for message in messages if isinstance(message, HumanMessage)]
+        text = "\n".join(human)
+        for index, rule in enumerate(self.rules):
+            if rule.get("match") is None or rule["match"] in text:
+                break
+        else:
+            raise ValueError(f"No recorded response matches the prompt: {text[:200]!r}")
+
+        key = (index, human[0] if human else "")
+        with self._lock:
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+        responses = rule["responses"]
+        response = responses[min(turn, len(responses) - 1)]
+        return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+    def _result(self, messages, response: str, tools) -> ChatResult:
+        usage = {"input_tokens": estimate_message_tokens(messages), "output_tokens": estimate_tokens(response)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+
+        arguments = None
+        if tools:
+            try:
+                arguments = json.loads(response)
+            except json.JSONDecodeError:
+                pass
+        if isinstance(arguments, dict):
+            tool_call = {"name": tools[0]["function"]["name"], "args": arguments, "id": f"replay_{self.calls}", "type": "tool_call"}
+            message = AIMessage(content="", tool_calls=[tool_call], usage_metadata=usage)
+        else:
+            message = AIMessage(content=response, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self._next_response(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages, response, kwargs.get("tools"))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self._next_response(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages, response, kwargs.get("tools"))
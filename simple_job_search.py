@@ -1,18 +1,26 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
-from browser_use import Agent
 from dotenv import load_dotenv
 import asyncio
 import json
 import datetime
 
+from browser_pool import BrowserPool
+from instrumentation import report, span
+from rate_limiter import run_agent
+from llm_analysis import analyze_text, condense_results
+from job_records import STRUCTURED_OUTPUT_INSTRUCTION, format_job_stats, job_controller, records_by_platform, summarize_records
+from job_dedup import collapse_duplicates, dedupe_search_results
+from job_store import HISTORY_DAYS, JobStore, search_key
+from llm_limiter import get_scheduler, rate_limited
+
 # Read GOOGLE_API_KEY into env
 load_dotenv()
 
-async def search_single_platform(platform_name: str, platform_url: str, job_title: str, location: str = "", max_jobs: int = 5):
+async def search_single_platform(platform_name: str, platform_url: str, job_title: str, location: str = "", max_jobs: int = 5, pool=None, store=None):
     """
     Search for jobs on a single platform
     """
-    llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash-exp')
+    llm = rate_limited(ChatGoogleGenerativeAI, get_scheduler("google", "2.0-flash-exp"))(model='gemini-2.0-flash-exp')
     
     task = f"""
     Go to {platform_url}.
@@ -50,14 +58,16 @@ async def search_single_platform(platform_name: str, platform_url: str, job_titl
     ---
     
     Be thorough in extracting technical skills and requirements.
+    {STRUCTURED_OUTPUT_INSTRUCTION}
+    
+    {store.known_postings_instruction(platform_name, search_key(job_title, location)) if store else ""}
     """
     
     print(f"🔍 Searching {platform_name}...")
-    agent = Agent(task=task, llm=llm)
-    results = await agent.run()
+    results = await run_agent(task, llm, url=platform_url, pool=pool, controller=job_controller())
     return results
 
-async def quick_job_search():
+async def quick_job_search(pool=None, store=None):
     """
     Quick job search across multiple platforms
     """
@@ -78,32 +88,46 @@ async def quick_job_search():
         ("AngelList (Wellfound)", "https://wellfound.com/jobs"),
     ]
     
-    all_results = {}
-    
-    for platform_name, platform_url in platforms:
+    async def search_platform(platform_name, platform_url):
         try:
             results = await search_single_platform(
-                platform_name, platform_url, JOB_TITLE, LOCATION, MAX_JOBS_PER_SITE
+                platform_name, platform_url, JOB_TITLE, LOCATION, MAX_JOBS_PER_SITE, pool, store
             )
-            all_results[platform_name] = results
             print(f"✅ {platform_name} search completed")
+            return platform_name, results
         except Exception as e:
             print(f"❌ Error searching {platform_name}: {str(e)}")
-            all_results[platform_name] = f"Error: {str(e)}"
+            return platform_name, f"Error: {str(e)}"
+    
+    # The shared rate limiter paces launches per host and per LLM provider
+    all_results = dict(await asyncio.gather(
+        *(search_platform(platform_name, platform_url) for platform_name, platform_url in platforms)
+    ))
+    
+    # Remember what was found, so the next run only spends agent time on new postings
+    if store:
+        records = [record for platform_records in records_by_platform(all_results).values() for record in platform_records]
+        store.print_upsert_summary(store.upsert(records, search_key(JOB_TITLE, LOCATION)))
     
     return all_results, JOB_TITLE, LOCATION
 
-async def analyze_results(search_results, job_title, location):
+async def analyze_results(search_results, job_title, location, store=None):
     """
     Analyze all search results and create summary with keywords
+    (a single LLM call, no browser)
     """
-    llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash-exp')
+    llm = rate_limited(ChatGoogleGenerativeAI, get_scheduler("google", "2.0-flash-exp"))(model='gemini-2.0-flash-exp')
     
-    # Combine all results into one text
-    combined_results = ""
-    for platform, results in search_results.items():
-        combined_results += f"\n\n=== {platform.upper()} RESULTS ===\n"
-        combined_results += str(results)
+    # The same posting listed on several platforms is collapsed first (fewer tokens, honest counts)
+    deduped_results, records = dedupe_search_results(search_results)
+    
+    # Final results only, condensed to fit the token budget (map step)
+    combined_results = await condense_results(llm, deduped_results)
+    
+    # Exact counts from the structured job records (plus stored history), so the LLM only writes the narrative
+    if store:
+        records = collapse_duplicates(store.with_history(records, search_key(job_title, location)), verbose=False)
+    job_stats = format_job_stats(records)
     
     analysis_task = f"""
     You are analyzing job search results for "{job_title}" positions{f" in {location}" if location else ""}.
@@ -111,6 +135,9 @@ async def analyze_results(search_results, job_title, location):
     Here are the job listings found:
     {combined_results}
     
+    JOB STATISTICS ({f"this run plus postings stored in the last {HISTORY_DAYS} days" if store else "this run"}, computed exactly - use these numbers, don't recount):
+    {job_stats}
+    
     Create a comprehensive analysis with:
     
     📊 **MARKET OVERVIEW:**
@@ -120,7 +147,7 @@ async def analyze_results(search_results, job_title, location):
     - Experience levels in demand
     
     🔥 **TOP SKILLS & TECHNOLOGIES:**
-    (Count frequency and list most mentioned)
+    (Use the precomputed skill frequencies above - don't recount)
     - Programming Languages:
     - Frameworks/Libraries:
     - Cloud Platforms:
@@ -134,7 +161,7 @@ async def analyze_results(search_results, job_title, location):
     - Industries represented
     
     🎯 **KEYWORD PAIRS FOR APPLICATIONS:**
-    (Most effective combinations for resumes/cover letters)
+    (Build on the precomputed keyword pairs above - most effective combinations for resumes/cover letters)
     - Technical combinations: (e.g., "React + TypeScript", "AWS + Docker")
     - Skill pairs: (e.g., "Leadership + Agile", "API + Microservices")
     - Industry terms: 
@@ -154,33 +181,36 @@ async def analyze_results(search_results, job_title, location):
     """
     
     print("📊 Analyzing results and generating insights...")
-    agent = Agent(task=analysis_task, llm=llm)
-    analysis = await agent.run()
+    analysis = await analyze_text(llm, analysis_task)
     return analysis
 
 async def main():
     """
     Main execution function
     """
+    pool = BrowserPool()  # One shared browser for all agents
+    store = JobStore()  # Postings from earlier runs, so agents only collect new ones
     try:
         # Step 1: Search for jobs
-        search_results, job_title, location = await quick_job_search()
+        search_results, job_title, location = await quick_job_search(pool, store)
         
         # Step 2: Analyze results
-        analysis = await analyze_results(search_results, job_title, location)
+        analysis = await analyze_results(search_results, job_title, location, store)
         
-        # Step 3: Save results
+        # Step 3: Save results (structured job records instead of the raw agent histories)
+        platform_records = records_by_platform(search_results)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         results_data = {
             "search_date": datetime.datetime.now().isoformat(),
             "job_title": job_title,
             "location": location,
-            "raw_results": search_results,
-            "analysis": analysis
+            "jobs": {platform: [record.model_dump() for record in records] for platform, records in platform_records.items()},
+            "job_stats": summarize_records([record for records in platform_records.values() for record in records]),
+            "analysis": analysis.model_dump()
         }
         
         filename = f"job_analysis_{timestamp}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
+        with span("save_results", "serialize"), open(filename, 'w', encoding='utf-8') as f:
             json.dump(results_data, f, indent=2, ensure_ascii=False)
         
         # Step 4: Display results
@@ -195,6 +225,12 @@ async def main():
     except Exception as e:
         print(f"❌ Critical error: {str(e)}")
         print("Check your internet connection and API configuration.")
+    finally:
+        pool.print_stats()
+        await pool.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        report("simple_job_search")
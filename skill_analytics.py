@@ -0,0 +1,262 @@
+"""
+Local skill analytics over collected job records.
+
+Skill frequencies and keyword pairs used to be counted by the LLM inside the
+analysis prompt. Here they are computed exactly with NumPy:
+
+- every skill name is mapped to a canonical skill through an alias vocabulary
+  (English and Japanese spellings, e.g. "在宅勤務" and "リモートワーク" -> Remote Work)
+- the jobs become a sparse job x skill matrix (the rows of each skill), so
+  frequencies are list lengths and co-occurrence counts of the most frequent
+  skills are one small matrix product
+- keyword pairs are ranked by lift / PMI, i.e. how much more often two skills
+  appear together than they would by chance; the minimum pair count grows
+  with the corpus so rare pairs don't top the list
+
+Tens of thousands of postings take well under a second; the LLM only writes
+the narrative around these numbers.
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Keyword pairs are only looked for among this many of the most frequent skills
+MAX_PAIR_SKILLS = 100
+# Share of the jobs a pair must appear in (at least 2 jobs) unless min_count is given
+MIN_PAIR_SHARE = 0.002
+
+# Canonical skill -> (category, aliases). Aliases are matched case-insensitively.
+SKILL_VOCABULARY = {
+    # Programming languages
+    "JavaScript": ("Programming Languages", ["javascript", "js", "ecmascript", "ジャバスクリプト"]),
+    "TypeScript": ("Programming Languages", ["typescript", "ts", "タイプスクリプト"]),
+    "Python": ("Programming Languages", ["python", "python3", "パイソン"]),
+    "Java": ("Programming Languages", ["java", "ジャバ"]),
+    "Go": ("Programming Languages", ["go", "golang", "go言語"]),
+    "Ruby": ("Programming Languages", ["ruby", "ルビー"]),
+    "PHP": ("Programming Languages", ["php"]),
+    "C#": ("Programming Languages", ["c#", "csharp", "c sharp"]),
+    "C++": ("Programming Languages", ["c++", "cpp"]),
+    "Kotlin": ("Programming Languages", ["kotlin"]),
+    "Swift": ("Programming Languages", ["swift"]),
+    "Rust": ("Programming Languages", ["rust"]),
+    "Scala": ("Programming Languages", ["scala"]),
+    "SQL": ("Programming Languages", ["sql"]),
+    "HTML": ("Programming Languages", ["html", "html5"]),
+    "CSS": ("Programming Languages", ["css", "css3", "scss", "sass"]),
+    # Frameworks and libraries
+    "React": ("Frameworks/Libraries", ["react", "react.js", "reactjs"]),
+    "Next.js": ("Frameworks/Libraries", ["next.js", "nextjs", "next"]),
+    "Vue.js": ("Frameworks/Libraries", ["vue", "vue.js", "vuejs", "vue3"]),
+    "Nuxt.js": ("Frameworks/Libraries", ["nuxt", "nuxt.js", "nuxtjs"]),
+    "Angular": ("Frameworks/Libraries", ["angular", "angularjs"]),
+    "Node.js": ("Frameworks/Libraries", ["node", "node.js", "nodejs"]),
+    "Express": ("Frameworks/Libraries", ["express", "express.js"]),
+    "Django": ("Frameworks/Libraries", ["django"]),
+    "Flask": ("Frameworks/Libraries", ["flask"]),
+    "FastAPI": ("Frameworks/Libraries", ["fastapi"]),
+    "Ruby on Rails": ("Frameworks/Libraries", ["rails", "ruby on rails", "ror"]),
+    "Laravel": ("Frameworks/Libraries", ["laravel"]),
+    "Spring": ("Frameworks/Libraries", ["spring", "spring boot", "springboot"]),
+    "Flutter": ("Frameworks/Libraries", ["flutter"]),
+    "React Native": ("Frameworks/Libraries", ["react native"]),
+    "GraphQL": ("Frameworks/Libraries", ["graphql"]),
+    "Tailwind CSS": ("Frameworks/Libraries", ["tailwind", "tailwindcss", "tailwind css"]),
+    # Cloud platforms
+    "AWS": ("Cloud Platforms", ["aws", "amazon web services"]),
+    "GCP": ("Cloud Platforms", ["gcp", "google cloud", "google cloud platform"]),
+    "Azure": ("Cloud Platforms", ["azure", "microsoft azure"]),
+    "Firebase": ("Cloud Platforms", ["firebase"]),
+    "Vercel": ("Cloud Platforms", ["vercel"]),
+    # Databases
+    "PostgreSQL": ("Databases", ["postgresql", "postgres"]),
+    "MySQL": ("Databases", ["mysql"]),
+    "MongoDB": ("Databases", ["mongodb", "mongo"]),
+    "Redis": ("Databases", ["redis"]),
+    "DynamoDB": ("Databases", ["dynamodb"]),
+    # Tools and practices
+    "Docker": ("Tools & Practices", ["docker", "コンテナ"]),
+    "Kubernetes": ("Tools & Practices", ["kubernetes", "k8s"]),
+    "Terraform": ("Tools & Practices", ["terraform"]),
+    "Git": ("Tools & Practices", ["git", "github", "gitlab"]),
+    "CI/CD": ("Tools & Practices", ["ci/cd", "cicd", "ci", "github actions", "継続的インテグレーション"]),
+    "REST API": ("Tools & Practices", ["rest", "rest api", "restful", "api開発"]),
+    "Microservices": ("Tools & Practices", ["microservices", "マイクロサービス"]),
+    "Agile": ("Tools & Practices", ["agile", "scrum", "アジャイル", "スクラム"]),
+    "Testing": ("Tools & Practices", ["testing", "unit testing", "jest", "pytest", "テスト"]),
+    "Figma": ("Tools & Practices", ["figma"]),
+    # Work style
+    "Remote Work": ("Work Style", ["remote", "remote work", "fully remote", "リモート", "リモートワーク", "フルリモート", "在宅勤務", "在宅", "テレワーク"]),
+    "Hybrid Work": ("Work Style", ["hybrid", "ハイブリッド", "一部リモート"]),
+    "Flextime": ("Work Style", ["flextime", "flex time", "フレックス", "フレックスタイム"]),
+    # Languages and soft skills
+    "Business Japanese": ("Languages & Soft Skills", ["business japanese", "ビジネスレベル日本語", "日本語ビジネスレベル"]),
+    "English": ("Languages & Soft Skills", ["english", "英語", "ビジネス英語"]),
+    "Communication": ("Languages & Soft Skills", ["communication", "コミュニケーション", "コミュニケーション能力"]),
+    "Leadership": ("Languages & Soft Skills", ["leadership", "team lead", "リーダーシップ", "マネジメント"]),
+}
+
+# Alias lookup, built once
+_ALIASES = {
+    alias.lower(): skill
+    for skill, (_, aliases) in SKILL_VOCABULARY.items()
+    for alias in aliases + [skill]
+}
+# Work-style aliases are also picked up from the job's location text ("Tokyo (リモート可)")
+_WORK_STYLE_PATTERN = re.compile(
+    "|".join(
+        re.escape(alias)
+        for skill, (category, aliases) in SKILL_VOCABULARY.items() if category == "Work Style"
+        for alias in sorted(aliases, key=len, reverse=True)
+    ),
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=None)
+def normalize_skill(name: str) -> str:
+    """Canonical name of a skill; unknown skills keep their own spelling"""
+    cleaned = re.sub(r"\s+", " ", name).strip()
+    return _ALIASES.get(cleaned.lower(), cleaned)
+
+
+def skill_category(skill: str) -> str:
+    """Category of a canonical skill ("Other" when it is not in the vocabulary)"""
+    return SKILL_VOCABULARY.get(skill, ("Other",))[0]
+
+
+def record_skills(record) -> set:
+    """Canonical skills of one job record (skills list plus work style found in the location)"""
+    skills = {normalize_skill(skill) for skill in record.skills if skill and skill.strip()}
+    for match in _WORK_STYLE_PATTERN.finditer(record.location or ""):
+        skills.add(normalize_skill(match.group(0)))
+    return skills
+
+
+def skill_matrix(records) -> tuple:
+    """
+    Sparse job x skill matrix, stored as one index list per skill.
+
+    Returns:
+        (skills, columns): the skill vocabulary seen in `records` and, for each
+        skill, a sorted int32 array of the rows (jobs) that mention it
+    """
+    index: Dict[str, int] = {}
+    columns: List[List[int]] = []
+    for row, record in enumerate(records):
+        for skill in sorted(record_skills(record)):  # Sorted so the vocabulary order is reproducible
+            if skill not in index:
+                index[skill] = len(columns)
+                columns.append([])
+            columns[index[skill]].append(row)
+    return list(index), [np.array(rows, dtype=np.int32) for rows in columns]
+
+
+def skill_frequencies(records, matrix=None) -> list:
+    """
+    (skill, count, share of jobs) sorted by count; a skill counts once per job.
+    `matrix` is an optional precomputed skill_matrix(records).
+    """
+    skills, columns = matrix or skill_matrix(records)
+    counts = [len(rows) for rows in columns]
+    total = len(records) or 1
+    order = sorted(range(len(skills)), key=lambda i: (-counts[i], skills[i]))
+    return [(skills[i], counts[i], counts[i] / total) for i in order]
+
+
+def pair_min_count(total: int) -> int:
+    """Default minimum pair count: 2 jobs, or MIN_PAIR_SHARE of the corpus when that is more"""
+    return max(2, math.ceil(total * MIN_PAIR_SHARE))
+
+
+def keyword_pairs(records, top_k: int = 15, min_count: Optional[int] = None, metric: str = "lift", matrix=None) -> list:
+    """
+    Skill pairs that appear together more often than chance.
+
+    Args:
+        records: JobRecords
+        top_k: Number of pairs to return
+        min_count: Minimum number of jobs mentioning both skills; defaults to
+            pair_min_count(len(records)) so big corpora aren't topped by pairs seen twice
+        metric: "lift" (co-occurrence / expected co-occurrence) or "pmi" (log2 of lift)
+        matrix: Optional precomputed skill_matrix(records)
+
+    Returns:
+        Dicts with pair, count, lift and pmi, best first
+    """
+    skills, columns = matrix or skill_matrix(records)
+    total = len(records)
+    if min_count is None:
+        min_count = pair_min_count(total)
+
+    # Only the MAX_PAIR_SKILLS most frequent skills seen in at least min_count
+    # jobs take part, so the product stays small however long the tail gets
+    counts = np.array([len(rows) for rows in columns], dtype=np.int64)
+    frequent = [i for i in np.argsort(-counts, kind="stable")[:MAX_PAIR_SKILLS] if counts[i] >= min_count]
+    if total == 0 or len(frequent) < 2:
+        return []
+    skills = [skills[i] for i in frequent]
+
+    dense = np.zeros((total, len(frequent)), dtype=np.float32)
+    for col, i in enumerate(frequent):
+        dense[columns[i], col] = 1
+    cooccurrence = dense.T @ dense  # [i, j] = number of jobs with both skills
+    counts = np.diag(cooccurrence)
+    expected = np.outer(counts, counts) / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = np.where(expected > 0, cooccurrence / expected, 0.0)
+        pmi = np.where(lift > 0, np.log2(lift), -np.inf)
+
+    first, second = np.triu_indices(len(skills), k=1)
+    pair_counts = cooccurrence[first, second]
+    keep = pair_counts >= min_count
+    first, second, pair_counts = first[keep], second[keep], pair_counts[keep]
+    scores = (pmi if metric == "pmi" else lift)[first, second]
+
+    # Best score first; ties go to the pair seen in more jobs
+    order = np.lexsort((-pair_counts, -scores))[:top_k]
+    return [
+        {
+            "pair": f"{skills[first[i]]} + {skills[second[i]]}",
+            "count": int(pair_counts[i]),
+            "lift": round(float(lift[first[i], second[i]]), 2),
+            "pmi": round(float(pmi[first[i], second[i]]), 2),
+        }
+        for i in order
+    ]
+
+
+def analyze_skills(records, top_skills: int = 25, top_pairs: int = 15, matrix=None) -> dict:
+    """Skill frequencies per category and the top keyword pairs, all computed locally"""
+    matrix = matrix or skill_matrix(records)
+    by_category: Dict[str, List[dict]] = {}
+    for skill, count, share in skill_frequencies(records, matrix)[:top_skills]:
+        by_category.setdefault(skill_category(skill), []).append({"skill": skill, "count": count, "share": round(share, 3)})
+    return {
+        "total_jobs": len(records),
+        "skills_by_category": by_category,
+        "keyword_pairs": keyword_pairs(records, top_k=top_pairs, matrix=matrix),
+    }
+
+
+def format_skill_analytics(records, top_skills: int = 25, top_pairs: int = 15, matrix=None) -> str:
+    """Skill frequencies and keyword pairs as prompt text"""
+    analytics = analyze_skills(records, top_skills, top_pairs, matrix=matrix)
+    if not analytics["total_jobs"]:
+        return "No structured job records were collected."
+
+    lines = ["Skill frequency by category (jobs mentioning it):"]
+    for category, items in analytics["skills_by_category"].items():
+        lines.append(f"- {category}: " + ", ".join(f"{item['skill']} {item['count']} ({item['share']:.0%})" for item in items))
+    lines.append("Keyword pairs (skills that appear together more often than chance):")
+    if analytics["keyword_pairs"]:
+        lines.extend(
+            f"- {pair['pair']}: {pair['count']} jobs, lift {pair['lift']:.2f}" for pair in analytics["keyword_pairs"]
+        )
+    else:
+        lines.append("- Not enough jobs for reliable pairs")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+os.environ.setdefault("SKIP_LLM_API_KEY_VERIFICATION", "true")
+
+from browser_use import Agent
+from browser_use.agent.views import ActionResult, AgentHistory
+from browser_use.browser.views import BrowserStateHistory
+from langchain_core.language_models import FakeListChatModel
+
+from agent_budget import AgentBudget, BudgetEnforcer, estimate_tokens
+
+CURRENT_STATE = {"evaluation_previous_goal": "", "memory": "", "next_goal": ""}
+
+
+def add_step(agent, url, model_output=None):
+    agent.state.history.history.append(AgentHistory(
+        model_output=model_output,
+        result=[ActionResult(extracted_content=f"visited {url}")],
+        state=BrowserStateHistory(url=url, title="", tabs=[], interacted_element=[]),
+    ))
+
+
+def test_wrap_up_step_only_accepts_done(tmp_path):
+    agent = Agent(task="Research a company", llm=FakeListChatModel(responses=["{}"]))
+    enforcer = BudgetEnforcer(AgentBudget(max_steps=2, max_pages=None, max_seconds=None), overrun_log=str(tmp_path / "overruns.jsonl"))
+
+    add_step(agent, "https://example.com/a")
+    asyncio.run(enforcer.on_step_end(agent))
+    assert not enforcer.wrapping_up
+
+    add_step(agent, "https://example.com/b")
+    asyncio.run(enforcer.on_step_end(agent))
+    assert enforcer.wrapping_up
+    assert "Budget reached" in agent._message_manager.get_messages()[-1].content
+
+    # browser-use rebuilds the action models at the start of the next step; the restriction has to survive that
+    asyncio.run(agent._update_action_models_for_page(None))
+    output_model = agent.AgentOutput
+    action_schema = output_model.model_json_schema()["$defs"]["ActionModel"]
+    assert list(action_schema["properties"]) == ["done"]
+    # Any other action is dropped (browser-use then asks for a valid action again)
+    browse = output_model.model_validate({"current_state": CURRENT_STATE, "action": [{"go_to_url": {"url": "https://example.com/c"}}]})
+    assert browse.action[0].model_dump(exclude_unset=True) == {}
+    done = output_model.model_validate({"current_state": CURRENT_STATE, "action": [{"done": {"text": "found", "success": False}}]})
+    assert done.action[0].model_dump(exclude_unset=True) == {"done": {"text": "found", "success": False}}
+
+    # Still not done after the wrap-up step: the agent is stopped
+    add_step(agent, "https://example.com/c")
+    asyncio.run(enforcer.on_step_end(agent))
+    assert enforcer.stopped and agent.state.stopped
+    assert [overrun.budget for overrun in enforcer.overruns] == ["max_steps"]
+
+
+def test_model_outputs_are_counted_once(tmp_path):
+    agent = Agent(task="Research a company", llm=FakeListChatModel(responses=["{}"]))
+    enforcer = BudgetEnforcer(AgentBudget(max_steps=None, max_pages=None, max_seconds=None), overrun_log=None)
+    output = agent.AgentOutput.model_validate({"current_state": CURRENT_STATE, "action": [{"go_to_url": {"url": "https://example.com/a"}}]})
+    tokens = estimate_tokens(output.model_dump_json(exclude_unset=True))
+
+    add_step(agent, "https://example.com/a", output)
+    asyncio.run(enforcer.on_step_end(agent))
+    # A hook call without a new history item (e.g. a step that failed before recording one)
+    asyncio.run(enforcer.on_step_end(agent))
+    assert enforcer.output_tokens == tokens
+
+    add_step(agent, "https://example.com/b", output)
+    add_step(agent, "https://example.com/c", output)
+    asyncio.run(enforcer.on_step_end(agent))
+    assert enforcer.output_tokens == 3 * tokens
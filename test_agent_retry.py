@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+os.environ.setdefault("SKIP_LLM_API_KEY_VERIFICATION", "true")
+
+from browser_use import Agent
+from browser_use.agent.views import ActionResult, AgentHistory, StepMetadata
+from browser_use.browser.views import BrowserStateHistory
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+
+from agent_retry import AgentCheckpoint, classify_error
+from llm_limiter import is_transient_error
+
+
+def run_step(agent, url, error=None):
+    """What a browser-use step leaves behind: a model output message, a history entry and the next step number"""
+    agent._message_manager._add_message_with_tokens(AIMessage(content=f"go to {url}"))
+    result = [ActionResult(error=error) if error else ActionResult(extracted_content=f"visited {url}")]
+    agent.state.history.history.append(AgentHistory(
+        model_output=None,
+        result=result,
+        state=BrowserStateHistory(url=url, title="", tabs=[], interacted_element=[]),
+        metadata=StepMetadata(step_start_time=0, step_end_time=1, input_tokens=100, step_number=agent.state.n_steps),
+    ))
+    agent.state.last_result = result
+    agent.state.n_steps += 1
+    if error:
+        agent.state.consecutive_failures += 1
+
+
+def test_resume_state_is_cut_back_to_the_last_good_step():
+    agent = Agent(task="Research a company", llm=FakeListChatModel(responses=["{}"]))
+    checkpoint = AgentCheckpoint()
+
+    run_step(agent, "https://example.com/a")
+    asyncio.run(checkpoint.on_step_end(agent))
+    messages = len(agent.state.message_manager_state.history.messages)
+    tokens = agent.state.message_manager_state.history.current_tokens
+
+    run_step(agent, "https://example.com/b", error="Could not parse response")
+    asyncio.run(checkpoint.on_step_end(agent))
+    run_step(agent, "https://example.com/c", error="Could not parse response")
+    asyncio.run(checkpoint.on_step_end(agent))
+    assert checkpoint.state is agent.state  # Nothing copied while the agent runs
+
+    state = checkpoint.resume_state()
+    assert [item.state.url for item in state.history.history] == ["https://example.com/a"]
+    assert len(state.message_manager_state.history.messages) == messages
+    assert state.message_manager_state.history.current_tokens == tokens
+    assert state.n_steps == 2 and state.consecutive_failures == 0
+    assert state.last_result[0].extracted_content == "visited https://example.com/a"
+    assert (checkpoint.steps, checkpoint.input_tokens) == (1, 100)
+    # The failed attempt's own state is left alone
+    assert len(agent.state.history.history) == 3
+
+
+def test_llm_errors_are_classified_once():
+    for error in ["429 Too Many Requests", "503 Service Unavailable", "Request timed out", TimeoutError(), ConnectionResetError()]:
+        assert is_transient_error(error) and classify_error(error) is not None
+    # Agent-only categories
+    assert classify_error("Target page, context or browser has been closed") == "browser"
+    assert classify_error("Could not parse response") == "parsing"
+    assert not is_transient_error("Could not parse response")
+    assert classify_error("Element with index 12 does not exist") is None
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakePlaywrightBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    """Stands in for browser_use.Browser: launching only creates a fake Playwright browser"""
+
+    launched = []
+
+    def __init__(self, config=None):
+        self.playwright_browser = None
+        self.closed = False
+        self.fail_contexts = False
+        FakeBrowser.launched.append(self)
+
+    async def get_playwright_browser(self):
+        await asyncio.sleep(0.01)  # Give other borrowers the chance to race the launch
+        self.playwright_browser = FakePlaywrightBrowser()
+        return self.playwright_browser
+
+    async def new_context(self, config=None):
+        if self.fail_contexts:
+            raise RuntimeError("Target closed")
+        return FakeContext(self)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_browser(monkeypatch):
+    FakeBrowser.launched = []
+    monkeypatch.setattr(browser_pool, "Browser", FakeBrowser)
+
+
+def test_contexts_share_one_browser_and_are_closed_on_return():
+    async def run():
+        pool = BrowserPool(max_contexts=2)
+        async with pool.context() as first:
+            async with pool.context() as second:
+                assert first.browser is second.browser and pool.in_use == 2
+        return pool, first
+
+    pool, context = asyncio.run(run())
+    assert context.closed and pool.in_use == 0
+    assert (pool.launches, pool.borrowed) == (1, 2)
+
+
+def test_borrowers_wait_for_a_free_slot():
+    async def run():
+        pool = BrowserPool(max_contexts=2)
+        peak = 0
+
+        async def task():
+            nonlocal peak
+            async with pool.context():
+                peak = max(peak, pool.in_use)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(task() for _ in range(5)))
+        return pool, peak
+
+    pool, peak = asyncio.run(run())
+    assert peak == 2 and pool.borrowed == 5 and pool.in_use == 0
+
+
+@pytest.mark.parametrize("break_browser", [
+    lambda browser: setattr(browser.playwright_browser, "connected", False),
+    lambda browser: setattr(browser.playwright_browser, "is_connected", lambda: 1 / 0),
+    lambda browser: setattr(browser, "playwright_browser", None),
+])
+def test_dead_browser_is_replaced_once(break_browser):
+    async def run():
+        pool = BrowserPool(max_contexts=3)
+        context = await pool.acquire()
+        await pool.release(context)
+        break_browser(FakeBrowser.launched[0])
+        # Several borrowers find the dead browser at once; only one relaunches it
+        contexts = await asyncio.gather(*(pool.acquire() for _ in range(3)))
+        for context in contexts:
+            await pool.release(context)
+        return pool, contexts
+
+    pool, contexts = asyncio.run(run())
+    old, new = FakeBrowser.launched
+    assert old.closed and not new.closed
+    assert pool.launches == 2 and pool.browser is new
+    assert all(context.browser is new for context in contexts)
+
+
+def test_failed_context_gives_its_slot_back():
+    async def run():
+        pool = BrowserPool(max_contexts=1)
+        (await pool.get_browser()).fail_contexts = True
+        with pytest.raises(RuntimeError):
+            await pool.acquire()
+        pool.browser.fail_contexts = False
+        context = await asyncio.wait_for(pool.acquire(), timeout=1)  # Would hang if the slot leaked
+        await pool.release(context)
+        await pool.close()
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.browser is None and pool.borrowed == 1 and pool.in_use == 0
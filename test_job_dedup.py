@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import itertools
+import random
+
+import pytest
+
+from job_dedup import (
+    COMPANY_THRESHOLD, DUPLICATE_THRESHOLD, collapse_duplicates, find_duplicate_groups, jaccard, normalize_company, normalize_location,
+    normalize_title, shingles,
+)
+from job_records import JobRecord
+
+COMPANIES = ["Mercari", "SmartNews", "Money Forward", "freee", "LINE Yahoo", "Rakuten", "CyberAgent", "Sansan", "PayPay", "Preferred Networks"]
+ROLES = ["Backend Engineer", "Frontend Engineer", "Data Engineer", "Site Reliability Engineer", "Machine Learning Engineer", "iOS Engineer"]
+# How the same posting is written on the other platforms
+COMPANY_VARIANTS = ["株式会社{}", "{}, Inc.", "{} KK", "{} Japan"]
+TITLE_VARIANTS = ["{}", "{} (Tokyo)", "Senior {}", "{} - Remote OK"]
+
+
+def postings(seed: int = 0):
+    """Every company x role posting, each listed on 1-3 platforms with varied spelling; returns (records, job of each record)"""
+    rng = random.Random(seed)
+    records, jobs = [], []
+    for job, (company, role) in enumerate(itertools.product(COMPANIES, ROLES)):
+        for platform in rng.sample(["Doda", "Green", "Indeed Japan", "LinkedIn Japan"], rng.randint(1, 3)):
+            records.append(JobRecord(
+                title=rng.choice(TITLE_VARIANTS).format(role),
+                company=rng.choice(COMPANY_VARIANTS).format(company),
+                location="Tokyo",
+                platform=platform,
+            ))
+            jobs.append(job)
+    return records, jobs
+
+
+def exact_match(a: JobRecord, b: JobRecord) -> bool:
+    """The pairwise check find_duplicate_groups confirms LSH candidates with"""
+    return (
+        jaccard(shingles(normalize_title(a.title)), shingles(normalize_title(b.title))) >= DUPLICATE_THRESHOLD
+        and jaccard(shingles(normalize_company(a.company)), shingles(normalize_company(b.company))) >= COMPANY_THRESHOLD
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cross_platform_copies_are_grouped_without_false_merges(seed):
+    records, jobs = postings(seed)
+    groups = find_duplicate_groups(records)
+
+    # Precision: no group mixes two different jobs
+    for group in groups:
+        assert len({jobs[i] for i in group}) == 1, [(records[i].company, records[i].title) for i in group]
+    # Recall: every job with copies whose titles are close enough ends up in one group
+    group_of = {i: n for n, group in enumerate(groups) for i in group}
+    for i, j in itertools.combinations(range(len(records)), 2):
+        if jobs[i] == jobs[j] and exact_match(records[i], records[j]):
+            assert group_of[i] == group_of[j], (records[i], records[j])
+    # Only "Senior ..." copies stay apart
+    assert len(groups) <= len(set(jobs)) * 1.1
+
+
+def test_same_company_different_roles_are_kept_apart():
+    records = [
+        JobRecord(title="Backend Engineer", company="株式会社メルカリ"),
+        JobRecord(title="Frontend Engineer", company="Mercari, Inc."),
+        JobRecord(title="Backend Engineer", company="SmartNews"),
+    ]
+    assert find_duplicate_groups(records) == [[0], [1], [2]]
+
+
+def test_postings_in_different_places_are_kept_apart():
+    records = [
+        JobRecord(title="Backend Engineer (Tokyo)", company="Mercari", location="Tokyo", url="https://mercari.example/1"),
+        JobRecord(title="Backend Engineer (Osaka)", company="Mercari", location="Osaka", url="https://mercari.example/2"),
+        JobRecord(title="Backend Engineer - Remote OK", company="Mercari", location="Remote", url="https://mercari.example/3"),
+    ]
+    assert find_duplicate_groups(records) == [[0], [1], [2]]
+    # Spellings of the same place, or no location at all, don't keep copies apart
+    records = [
+        JobRecord(title="Backend Engineer", company="Mercari", location="東京都港区", platform="Doda"),
+        JobRecord(title="Backend Engineer (Tokyo)", company="Mercari, Inc.", location="Tokyo (リモート可)", platform="Green"),
+        JobRecord(title="Backend Engineer", company="Mercari KK", platform="Indeed Japan"),
+    ]
+    assert find_duplicate_groups(records) == [[0, 1, 2]]
+
+
+def test_location_places():
+    assert normalize_location("東京都 (リモート可)") == {"tokyo", "remote"}
+    assert normalize_location("Tokyo, Japan") == {"tokyo"}
+    assert normalize_location("Sendai") == {"sendai"}
+    assert normalize_location("") == set()
+
+
+def test_same_platform_postings_with_different_urls_are_kept_apart():
+    records = [
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Doda", url="https://doda.example/jobs/1"),
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Doda", url="https://doda.example/jobs/2"),
+        # Same posting again, only with tracking parameters
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Doda", url="https://www.doda.example/jobs/1?utm_source=x"),
+    ]
+    assert find_duplicate_groups(records) == [[0, 2], [1]]
+
+
+def test_cross_platform_copy_does_not_join_two_same_platform_postings():
+    records = [
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Doda", url="https://doda.example/jobs/1"),
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Green", url="https://green.example/jobs/9"),
+        JobRecord(title="Backend Engineer", company="Mercari", platform="Doda", url="https://doda.example/jobs/2"),
+    ]
+    groups = find_duplicate_groups(records)
+    assert sorted(map(len, groups)) == [1, 2]
+    assert not any({0, 2} <= set(group) for group in groups)
+
+
+def test_merged_record_fills_missing_fields():
+    records = [
+        JobRecord(title="Backend Engineer (Go)", company="株式会社メルカリ", platform="Doda", skills=["Go", "GCP"], salary_min_jpy=6_000_000),
+        JobRecord(title="Backend Engineer (Go)", company="メルカリ", platform="Green", skills=["go", "Kubernetes"], url="https://green.example/1"),
+    ]
+    [merged] = collapse_duplicates(records, verbose=False)
+    assert merged.salary_min_jpy == 6_000_000 and merged.url == "https://green.example/1"
+    assert merged.skills == ["Go", "GCP", "Kubernetes"]
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+from job_records import parse_job_records
+
+
+def test_structured_jobs_are_parsed():
+    text = '{"jobs": [{"title": "Backend Engineer", "company": "Acme", "salary_min_jpy": 6000000}]}'
+    [record] = parse_job_records(text, platform="Green")
+    assert (record.title, record.company, record.salary_min_jpy, record.platform) == ("Backend Engineer", "Acme", 6000000, "Green")
+
+
+def test_json_without_jobs_falls_back_to_key_value_blocks():
+    text = (
+        'Search done. Filters used: {"location": "Tokyo", "remote": true}\n\n'
+        "Title: Backend Engineer\nCompany: Acme\nSalary: 600万円〜800万円\n\n"
+        "Title: Data Engineer\nCompany: Example KK\n"
+    )
+    records = parse_job_records(text)
+    assert [(record.title, record.company) for record in records] == [("Backend Engineer", "Acme"), ("Data Engineer", "Example KK")]
+    assert (records[0].salary_min_jpy, records[0].salary_max_jpy) == (6_000_000, 8_000_000)
+
+
+def test_later_json_candidate_with_jobs_is_used():
+    text = '```json\n{"status": "ok"}\n```\n\n```json\n[{"title": "SRE", "company": "Acme"}]\n```'
+    assert [record.title for record in parse_job_records(text)] == ["SRE"]
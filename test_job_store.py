@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+from job_records import JobRecord
+from job_store import JobStore, search_key
+
+
+def job(**fields) -> JobRecord:
+    defaults = {"title": "Backend Engineer", "company": "Mercari, Inc.", "location": "Tokyo", "url": "https://jobs.example.com/123"}
+    return JobRecord(**{**defaults, **fields})
+
+
+def titles(records) -> list:
+    return [record.title for record in records]
+
+
+def test_upsert_classifies_new_changed_and_unchanged(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    search = search_key("Backend Engineer", "Tokyo")
+
+    first = store.upsert([job(), job(title="SRE", url="https://jobs.example.com/456")], search=search)
+    assert (titles(first["new"]), first["changed"], first["unchanged"]) == (["Backend Engineer", "SRE"], [], [])
+
+    second = store.upsert([
+        # Same posting found on another platform
+        job(platform="Green"),
+        # Same posting with a new salary
+        job(title="SRE", url="https://jobs.example.com/456", salary_min_jpy="600万円"),
+        job(title="Data Engineer", url="https://jobs.example.com/789"),
+    ], search=search)
+    assert titles(second["unchanged"]) == ["Backend Engineer"]
+    assert titles(second["changed"]) == ["SRE"]
+    assert titles(second["new"]) == ["Data Engineer"]
+
+    stored = {record.title: record for record in store.records(search=search)}
+    assert stored["SRE"].salary_min_jpy == 6_000_000
+    assert store.stats()["postings"] == 3
+
+
+def test_duplicates_within_one_upsert_count_once(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    result = store.upsert([job(), job(skills=["Go"])])
+    assert len(result["new"]) == 1 and result["changed"] == [] and result["unchanged"] == []
+
+
+def test_skill_order_and_case_do_not_count_as_a_change(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    store.upsert([job(skills=["Python", "AWS"])])
+    assert len(store.upsert([job(skills=["aws", "python"])])["unchanged"]) == 1
+
+
+def test_formatting_and_tracking_parameters_do_not_make_a_new_posting(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    store.upsert([job()])
+    result = store.upsert([job(company="ＭＥＲＣＡＲＩ inc", url="http://www.jobs.example.com/123/?utm_source=x")])
+    assert result["new"] == [] and store.stats()["postings"] == 1
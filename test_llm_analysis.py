@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from llm_analysis import MAX_REDUCE_ROUNDS, MarketAnalysis, analyze_text, chunk_sections, condense_results, split_text
+from llm_limiter import estimate_tokens
+
+
+class StructuredModel(FakeListChatModel):
+    """Fake chat model with structured output support"""
+
+    def with_structured_output(self, schema, **kwargs):
+        return RunnableLambda(lambda prompt: schema(summary="Go and Kubernetes are in demand", top_skills=["Go", "Kubernetes"]))
+
+
+def test_analysis_is_one_structured_call():
+    result = asyncio.run(analyze_text(StructuredModel(responses=["unused"]), "Analyze these jobs"))
+    assert isinstance(result, MarketAnalysis) and result.top_skills == ["Go", "Kubernetes"]
+    assert str(result) == "Go and Kubernetes are in demand"  # No report: the summary stands in
+
+
+def test_models_without_structured_output_fall_back_to_plain_text():
+    # FakeListChatModel has no with_structured_output
+    result = asyncio.run(analyze_text(FakeListChatModel(responses=["# Market report"]), "Analyze these jobs"))
+    assert result.report == "# Market report" and result.top_skills == []
+
+
+class RecordingModel(FakeListChatModel):
+    """Fake chat model that keeps the prompts it was called with"""
+
+    prompts: list = []
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[0].content)
+        return self._generate(messages, stop, run_manager, **kwargs)
+
+
+def job_lines(count: int, platform: str = "doda") -> str:
+    return "".join(f"{platform} job {i}: Backend Engineer | Mercari | Tokyo | 600-900万円 | Go, GCP\n" for i in range(count))
+
+
+@pytest.mark.parametrize("max_tokens", [1, 20, 21, 100, 10_000])
+def test_split_text_keeps_whole_lines_within_the_budget(max_tokens):
+    text = job_lines(30) + "会社概要" * 10 + "\nlast line without newline"
+    pieces = split_text(text, max_tokens)
+    assert "".join(pieces) == text
+    for piece in pieces:
+        lines = piece.splitlines(keepends=True)
+        # Only a single line that is too long on its own may exceed the budget
+        assert len(lines) == 1 or sum(map(estimate_tokens, lines)) <= max_tokens
+    if max_tokens == 1:
+        assert len(pieces) == len(text.splitlines())
+
+
+def test_split_text_boundary_is_inclusive():
+    line = "x" * 76 + "\n"  # 20 tokens
+    assert estimate_tokens(line) == 20
+    assert split_text(line * 3, 40) == [line * 2, line]
+    assert split_text(line * 3, 39) == [line, line, line]
+    assert split_text("", 10) == []
+
+
+def test_chunk_sections_packs_and_splits_titled_sections():
+    sections = {"doda": job_lines(3, "doda"), "green": job_lines(40, "green"), "indeed": job_lines(2, "indeed")}
+    chunks = chunk_sections(sections, 300)
+    titles = [[line for line in chunk.splitlines() if line.startswith("===")] for chunk in chunks]
+    # The big section is split with its title repeated; what fits shares a chunk
+    assert titles == [
+        ["=== DODA RESULTS ==="],
+        ["=== GREEN RESULTS ==="],
+        ["=== GREEN RESULTS ==="],
+        ["=== GREEN RESULTS ===", "=== INDEED RESULTS ==="],
+    ]
+    # Pieces are cut at the budget; the title line may add a few tokens on top
+    assert all(estimate_tokens(chunk) <= 310 for chunk in chunks)
+    # Nothing is lost or repeated
+    jobs = [line for chunk in chunks for line in chunk.splitlines() if " job " in line]
+    assert jobs == "".join(sections.values()).splitlines()
+
+
+def test_results_within_budget_are_not_condensed():
+    llm = RecordingModel(responses=["notes"], prompts=[])
+    text = asyncio.run(condense_results(llm, {"doda": job_lines(3), "green": "No results"}, token_budget=1_000))
+    assert llm.prompts == []
+    assert text == f"\n\n=== DODA RESULTS ===\n{job_lines(3)}\n\n=== GREEN RESULTS ===\nNo results"
+
+
+def test_results_over_budget_are_condensed_chunk_by_chunk():
+    llm = RecordingModel(responses=["doda job: Backend Engineer | Mercari"], prompts=[])
+    results = {"doda": job_lines(100, "doda"), "green": job_lines(100, "green")}
+    text = asyncio.run(condense_results(llm, results, token_budget=1_000, chunk_tokens=800))
+    chunks = chunk_sections(results, 800)
+    # One map call per chunk, in one round
+    assert len(llm.prompts) == len(chunks) > 2
+    assert all(chunk in prompt for chunk, prompt in zip(chunks, llm.prompts))
+    assert text.count("RESULTS ===") == len(chunks) and "=== NOTES 1 RESULTS ===" in text
+    assert estimate_tokens(text) <= 1_000
+
+
+def test_condensing_stops_after_max_rounds():
+    # A model that never shrinks its input
+    llm = RecordingModel(responses=[job_lines(50)], prompts=[])
+    asyncio.run(condense_results(llm, {"doda": job_lines(100)}, token_budget=100, chunk_tokens=5_000))
+    assert len(llm.prompts) == MAX_REDUCE_ROUNDS
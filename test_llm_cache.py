@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from langchain_core.language_models import FakeListChatModel
+
+import agent_retry
+from llm_cache import DiskLLMCache, evict_calls, track_calls
+
+
+def step_prompt(minute: int) -> str:
+    # The step info browser-use adds to every state message
+    return f"Current url: https://example.com\nCurrent step: 1/10Current date and time: 2026-10-17 09:{minute:02d}"
+
+
+def test_volatile_time_does_not_change_the_key(tmp_path):
+    cache = DiskLLMCache(str(tmp_path / "cache.sqlite"))
+    llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    assert llm.invoke(step_prompt(1)).content == "first"
+    # Same step a minute later: answered from the cache
+    assert llm.invoke(step_prompt(2)).content == "first"
+    # A different page is a different prompt
+    assert llm.invoke(step_prompt(2).replace("example.com", "example.org")).content == "second"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+def test_evicted_calls_ask_the_model_again(tmp_path):
+    cache = DiskLLMCache(str(tmp_path / "cache.sqlite"))
+    llm = FakeListChatModel(responses=["malformed", "fixed"], cache=cache)
+
+    with track_calls() as calls:
+        assert llm.invoke(step_prompt(1)).content == "malformed"
+    assert llm.invoke(step_prompt(1)).content == "malformed"  # Outside the tracked call: cached
+
+    assert evict_calls(calls) == 1 and calls == []
+    assert llm.invoke(step_prompt(1)).content == "fixed"
+
+
+def test_retry_does_not_replay_the_failed_response(tmp_path, monkeypatch):
+    cache = DiskLLMCache(str(tmp_path / "cache.sqlite"))
+    llm = FakeListChatModel(responses=["malformed", "fixed"], cache=cache)
+    answers = []
+
+    class History:
+        def __init__(self, answer):
+            self.answer = answer
+
+        def is_done(self):
+            return self.answer == "fixed"
+
+        def errors(self):
+            return [] if self.is_done() else ["Could not parse response"]
+
+    async def run_agent(task, llm, **kwargs):
+        answers.append((await llm.ainvoke(step_prompt(len(answers)))).content)
+        return History(answers[-1])
+
+    async def no_browser(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(agent_retry, "run_agent", run_agent)
+    monkeypatch.setattr(agent_retry, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(agent_retry._BrowserSession, "open", no_browser)
+    monkeypatch.setattr(agent_retry._BrowserSession, "close", no_browser)
+
+    result, report = asyncio.run(agent_retry.run_resumable_agent("Research a company", llm, max_retries=2))
+
+    assert answers == ["malformed", "fixed"]
+    assert result.is_done() and report.attempts == 2
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from pydantic import Field
+
+import llm_limiter
+import rate_limiter
+from llm_limiter import QuotaScheduler, rate_limited
+from rate_limiter import TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(rate=2, capacity=2)  # 2 tokens per second, bursts of 2
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    clock.now += 0.5  # Pays back the reservation
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now += 10  # Refills up to the capacity, not beyond
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, pytest.approx(0.5)]
+
+
+def test_scheduler_queues_calls_in_arrival_order(clock):
+    scheduler = QuotaScheduler("test/queue", rpm=60, tpm=600)  # One call per second, 10 tokens per second
+    assert [scheduler._reserve(10) for _ in range(3)] == [0, pytest.approx(1), pytest.approx(2)]
+    # A big call waits for the token budget as well
+    assert scheduler._reserve(1170) == pytest.approx(60)  # 600 tokens short at 10 per second
+
+
+def test_waiting_calls_show_in_queue_depth():
+    scheduler = QuotaScheduler("test/depth", rpm=600)  # 0.1 s apart
+
+    async def run():
+        started = time.monotonic()
+        calls = [asyncio.create_task(scheduler.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        depth = scheduler.queue_depth
+        await asyncio.gather(*calls)
+        return depth, time.monotonic() - started
+
+    depth, elapsed = asyncio.run(run())
+    assert depth == 2  # The first call went straight through
+    assert elapsed >= 0.19 and scheduler.queue_depth == 0
+
+
+class FlakyModel(FakeListChatModel):
+    """Fake chat model that raises the queued errors before answering"""
+
+    errors: list = Field(default_factory=list)
+    calls: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop, run_manager, **kwargs)
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    monkeypatch.setattr(llm_limiter, "RATE_LIMIT_BACKOFF", 0)
+    return rate_limited(FlakyModel, QuotaScheduler("test/flaky", rpm=60_000))
+
+
+def test_rate_limit_error_is_retried(flaky):
+    llm = flaky(responses=["ok"], errors=[Exception("429 Resource has been exhausted (e.g. check quota).")])
+    assert asyncio.run(llm.ainvoke("hi")).content == "ok"
+    assert llm.calls == 2
+
+
+def test_rate_limit_retries_are_bounded(flaky):
+    llm = flaky(responses=["ok"], errors=[Exception("429 Too Many Requests")] * (llm_limiter.MAX_RATE_LIMIT_RETRIES + 1))
+    with pytest.raises(Exception, match="429"):
+        llm.invoke("hi")
+    assert llm.calls == llm_limiter.MAX_RATE_LIMIT_RETRIES + 1
+
+
+def test_other_errors_are_not_retried(flaky):
+    llm = flaky(responses=["ok"], errors=[ValueError("400 Invalid argument")])
+    with pytest.raises(ValueError):
+        llm.invoke("hi")
+    assert llm.calls == 1
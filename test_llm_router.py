@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import FakeListChatModel
+
+from llm_router import LLMRouter
+
+
+class FailingModel(FakeListChatModel):
+    """Fake chat model whose every call raises `error`"""
+
+    error: str = "503 Service Unavailable"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError(self.error)
+
+
+class StartedModels(BaseCallbackHandler):
+    def __init__(self):
+        self.models = []
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self.models.append((serialized["name"], run_id, parent_run_id))
+
+
+def test_transient_error_fails_over_to_the_next_backend():
+    router = LLMRouter([("down", FailingModel(responses=["-"]), 1.0), ("up", FakeListChatModel(responses=["ok"]), 1e-9)])
+    # The failing backend is picked first (weights 1 vs ~0), then put on cooldown
+    assert router.invoke("hi").content == "ok"
+    stats = {stats["name"]: stats for stats in router.stats()}
+    assert stats["down"]["errors"] == 1 and not stats["down"]["healthy"]
+    assert stats["up"]["calls"] == 1
+
+    # While cooling down it is only tried after the healthy backend
+    assert asyncio.run(router.ainvoke("hi")).content == "ok"
+    assert [stats["calls"] for stats in router.stats()] == [1, 2]
+
+
+def test_other_errors_do_not_fail_over():
+    router = LLMRouter([("bad", FailingModel(responses=["-"], error="400 Invalid argument"), 1.0), ("up", FakeListChatModel(responses=["ok"]), 1e-9)])
+    with pytest.raises(RuntimeError, match="400"):
+        router.invoke("hi")
+    assert router.stats()[0]["healthy"]
+
+
+def test_last_backend_error_is_raised():
+    router = LLMRouter([("down", FailingModel(responses=["-"]), 1.0)])
+    with pytest.raises(RuntimeError, match="503"):
+        router.invoke("hi")
+
+
+def test_callbacks_reach_the_backend():
+    handler = StartedModels()
+    router = LLMRouter([("up", FakeListChatModel(responses=["ok"]), 1.0)])
+    asyncio.run(router.ainvoke("hi", config={"callbacks": [handler]}))
+    (router_name, router_run, _), (backend_name, _, backend_parent) = handler.models
+    assert (router_name, backend_name) == ("LLMRouter", "FakeListChatModel")
+    assert backend_parent == router_run  # Nested under the router's run
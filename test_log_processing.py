@@ -1,32 +1,116 @@
 #!/usr/bin/env python3
 
-import json
-from markdown_extractor import extract_and_save_markdown
+import os
+from agent_log import AgentLogReader, AgentLogWriter, index_path, write_agent_log
+from markdown_extractor import clean_markdown, save_markdown, ActionResult, AgentHistoryList
 
 def test_log_processing():
-    # Load the actual log file
+    # Read the actual log file (JSON-lines, or an old monolithic .json log)
     log_filename = "志望動機_log_20250531_200228.json"
-    
+
     try:
-        with open(log_filename, "r", encoding="utf-8") as f:
-            agent_result = json.load(f)
-        
-        print(f"Loaded log file: {log_filename}")
-        print(f"Agent result type: {type(agent_result)}")
-        print(f"Keys in agent result: {list(agent_result.keys()) if isinstance(agent_result, dict) else 'Not a dict'}")
-        
-        # Process the log with the extractor
-        result_filename = extract_and_save_markdown(agent_result, filename_prefix="志望動機_from_log")
-        
+        reader = AgentLogReader(log_filename)
+        final_output = reader.last_done()
+
+        print(f"Read log file: {log_filename}")
+        print(f"Steps in log: {sum(1 for _ in reader)}")
+
+        # Save the last done action with the extractor's helpers
+        result_filename = None
+        if final_output:
+            os.makedirs("output/result", exist_ok=True)
+            result_filename = save_markdown(clean_markdown(final_output), "output/result/志望動機_from_log.md")
+
         if result_filename:
             print(f"✅ Successfully extracted and saved to: {result_filename}")
         else:
             print("❌ Failed to extract markdown from log")
-            
+
     except FileNotFoundError:
         print(f"❌ Log file not found: {log_filename}")
     except Exception as e:
         print(f"❌ Error processing log: {e}")
 
+def test_jsonl_log_round_trip(tmp_path):
+    # Many steps, so the backwards read spans several blocks
+    actions = [ActionResult(False, extracted_content=f"step {i} " * 50) for i in range(2000)]
+    actions.append(ActionResult(True, extracted_content="```markdown\n# 志望動機\n\nFinal\n```"))
+    agent_result = AgentHistoryList(all_results=actions)
+
+    for name in ("log.jsonl", "log.jsonl.gz"):
+        log_filename = str(tmp_path / name)
+        assert write_agent_log(agent_result, log_filename) == 2001
+
+        reader = AgentLogReader(log_filename)
+        assert sum(1 for _ in reader) == 2001
+        assert clean_markdown(reader.last_done()) == "# 志望動機\n\nFinal"
+
+        # The sidecar index points straight at any step
+        assert reader.index()["last_done"][0] == 2001
+        assert reader.step(1000)["results"][0]["extracted_content"].startswith("step 999 ")
+
+        # Without the index the reader falls back to scanning
+        os.remove(index_path(log_filename))
+        assert reader.index() is None
+        assert clean_markdown(reader.last_done()) == "# 志望動機\n\nFinal"
+
+def test_stale_index_is_ignored(tmp_path):
+    log_filename = str(tmp_path / "log.jsonl")
+    with AgentLogWriter(log_filename) as writer:
+        writer.write_step(1, [ActionResult(True, extracted_content="first")])
+
+    # Lines appended by another writer leave the index out of date
+    with open(log_filename, "a", encoding="utf-8") as f:
+        f.write('{"step":2,"results":[{"is_done":true,"extracted_content":"second"}]}\n')
+    reader = AgentLogReader(log_filename)
+    assert reader.index() is None
+    assert reader.last_done() == "second"
+    assert reader.index(build=True)["last_done"][0] == 2
+
+    # Resuming with the writer continues the existing index
+    with AgentLogWriter(log_filename, resume=True) as writer:
+        writer.write_step(3, [ActionResult(False, extracted_content="third")])
+    assert [row[0] for row in reader.index()["steps"]] == [1, 2, 3]
+    assert reader.step(3)["results"][0]["extracted_content"] == "third"
+
+    # A new run with the same log name starts the log over instead of interleaving with the old one
+    with AgentLogWriter(log_filename) as writer:
+        writer.write_step(1, [ActionResult(True, extracted_content="new run")])
+    assert [row[0] for row in reader.index()["steps"]] == [1]
+    assert reader.last_done() == "new run"
+
 if __name__ == "__main__":
     test_log_processing()
+
+def write_log(path, content):
+    write_agent_log(AgentHistoryList(all_results=[ActionResult(True, extracted_content=f"```markdown\n{content}\n```")]), str(path))
+
+def test_bulk_reextraction_skips_up_to_date_logs(tmp_path):
+    from process_志望動機_log import bulk_process_logs
+
+    log_dir, result_dir = tmp_path / "log", tmp_path / "result"
+    log_dir.mkdir()
+    result_dir.mkdir()
+    write_log(log_dir / "志望動機_log_20250101_000000.jsonl", "# A")
+    write_log(log_dir / "志望動機_log_20250102_000000.jsonl", "# B")
+    (result_dir / "志望動機_20250101_000000.md").write_text("original", encoding="utf-8")
+
+    assert bulk_process_logs(str(log_dir), str(result_dir), workers=2)["extracted"] == 2
+    # The original result is left alone
+    assert (result_dir / "志望動機_20250101_000000.md").read_text(encoding="utf-8") == "original"
+    assert (result_dir / "志望動機_20250101_000000.reextracted.md").read_text(encoding="utf-8") == "# A"
+
+    stats = bulk_process_logs(str(log_dir), str(result_dir), workers=2)
+    assert (stats["skipped"], stats["extracted"]) == (2, 0)
+
+    # A touched log with the same content is still up to date, a changed one is redone
+    os.utime(log_dir / "志望動機_log_20250101_000000.jsonl", (0, 0))
+    write_log(log_dir / "志望動機_log_20250102_000000.jsonl", "# B, longer")
+    stats = bulk_process_logs(str(log_dir), str(result_dir), workers=2)
+    assert (stats["skipped"], stats["extracted"]) == (1, 1)
+    assert (result_dir / "志望動機_20250102_000000.reextracted.md").read_text(encoding="utf-8") == "# B, longer"
+
+    # Overwriting is explicit, and redoes the logs whose results went elsewhere
+    stats = bulk_process_logs(str(log_dir), str(result_dir), workers=2, overwrite=True)
+    assert (stats["skipped"], stats["extracted"]) == (0, 2)
+    assert (result_dir / "志望動機_20250101_000000.md").read_text(encoding="utf-8") == "# A"
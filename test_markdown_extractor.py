@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+os.environ.setdefault("SKIP_LLM_API_KEY_VERIFICATION", "true")
+
+from browser_use import Agent
+from browser_use.agent.views import ActionResult, AgentHistory
+from browser_use.browser.views import BrowserStateHistory
+from langchain_core.language_models import FakeListChatModel
+
+from agent_log import AgentLogReader
+from markdown_extractor import StreamingMarkdownExtractor, extract_and_save_markdown
+
+
+def run_step(agent, url, result):
+    """What a browser-use step leaves behind: a history entry, the last result and the next step number"""
+    agent.state.history.history.append(AgentHistory(
+        model_output=None,
+        result=result,
+        state=BrowserStateHistory(url=url, title=url.rsplit("/", 1)[-1], tabs=[], interacted_element=[]),
+    ))
+    agent.state.last_result = result
+    agent.state.n_steps += 1
+
+
+def test_streamed_and_batch_extraction_agree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = Agent(task="Write a 志望動機", llm=FakeListChatModel(responses=["{}"]))
+    extractor = StreamingMarkdownExtractor("streamed")
+
+    run_step(agent, "https://example.com/about", [ActionResult(extracted_content="会社概要")])
+    asyncio.run(extractor.on_step_end(agent))
+    run_step(agent, "https://example.com/careers", [ActionResult(error="Element not found")])
+    asyncio.run(extractor.on_step_end(agent))
+    run_step(agent, "https://example.com/careers", [ActionResult(is_done=True, extracted_content="```markdown\n# 志望動機\n\n本文\n```")])
+    asyncio.run(extractor.on_step_end(agent))
+    streamed = extractor.finalize()
+
+    batch = extract_and_save_markdown(agent.state.history, filename_prefix="batch")
+    with open(streamed, encoding="utf-8") as a, open(batch, encoding="utf-8") as b:
+        assert a.read() == b.read() == "# 志望動機\n\n本文"
+
+    [batch_log] = tmp_path.glob("output/log/batch_log_*.jsonl")
+    assert list(AgentLogReader(extractor.log_filename)) == list(AgentLogReader(str(batch_log)))
+    assert [entry["step"] for entry in AgentLogReader(extractor.log_filename)] == [1, 2, 3]
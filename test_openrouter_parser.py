@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import random
+
+import pytest
+
+from openrouter_parser import StreamingScrubber, scrub_response, scrub_special_tokens
+
+# Tokens, cut-off tokens and plain text the random responses are built from
+FRAGMENTS = [
+    "<|eot_id|>", "<|EOT_ID|>", "<|user|>", "<|assistant|>", "<|begin_of_text|>",
+    "<|start_header_id|>", "<|end_header_id|>", "<|tool_call_start|>", "<|tool_call_start_id|>", "<|tool_call_end|>",
+    "<|us", "er|>", "<|", "|>", "<", "<b>", "x", "y", "go_to_url", " ", "\n", "\n\n", " \n",
+]
+
+
+def stream(chunks) -> str:
+    scrubber = StreamingScrubber()
+    return "".join(scrubber.feed(chunk) for chunk in chunks) + scrubber.flush()
+
+
+def random_split(rng: random.Random, text: str) -> list:
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("chunks", [
+    ["<|start_header_id|>x<|eo", "t_id|>y<|end_header_id|>z"],
+    ["<|start_header_id|>x<|eot_id|>y", "<|end_header_id|>z"],
+    ["<|start_header_id|>x<|tool_call_start|>a", "<|tool_call_end|>b<|end_", "header_id|>z"],
+])
+def test_token_inside_a_header_is_held_back(chunks):
+    assert stream(chunks) == scrub_response("".join(chunks))[0] == "z"
+
+
+@pytest.mark.parametrize("text, cleaned, removed", [
+    ("<|start_header_id|>a<|eot_id|>b<|end_header_id|>x", "x", 2),
+    ("<|tool_call_start|>a<|user|>b<|tool_call_end|>x", "x", 2),
+    ("<|us<|eot_id|>er|>x", "x", 2),
+])
+def test_nested_tokens_are_removed_whole(text, cleaned, removed):
+    # The legacy per-pattern cleanup left the outer token behind ("<|start_header_id|>ab<|end_header_id|>x")
+    assert scrub_special_tokens(text) == (cleaned, removed)
+
+
+def test_stream_matches_batch_for_random_splits():
+    rng = random.Random(0)
+    for _ in range(20_000):
+        text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 12)))
+        chunks = random_split(rng, text)
+        assert stream(chunks) == scrub_response(text)[0], chunks
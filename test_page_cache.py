@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from page_cache import MIN_TEXT_CHARS, PageCache
+
+
+class Site:
+    """A local server with one page that answers conditional requests"""
+
+    def __init__(self):
+        self.body = "<html><head><title>x</title></head><body><p>" + "会社概要 " * MIN_TEXT_CHARS + "</p></body></html>"
+        self.etag = '"v1"'
+        self.requests = []  # Conditional headers of every request
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests.append((self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+                if self.path == "/short":
+                    self._send(200, b"<p>Loading...</p>")
+                elif self.headers.get("If-None-Match") == site.etag:
+                    self._send(304, b"")
+                else:
+                    self._send(200, site.body.encode("utf-8"))
+
+            def _send(self, code, body):
+                self.send_response(code)
+                self.send_header("ETag", site.etag)
+                self.send_header("Last-Modified", "Sat, 31 May 2025 12:00:00 GMT")
+                if code == 200:
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/about"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = Site()
+    yield site
+    site.stop()
+
+
+def test_fresh_snapshots_are_served_from_disk(tmp_path, site):
+    cache = PageCache(str(tmp_path))
+    first = cache.fetch(site.url)
+    assert first.changed and not first.from_cache and first.usable
+    assert "会社概要" in first.text and "<p>" not in first.text
+
+    second = cache.fetch(site.url)
+    assert second.from_cache and second.text == first.text
+    assert (cache.hits, cache.downloads, len(site.requests)) == (1, 1, 1)
+
+
+def test_stale_snapshots_are_revalidated(tmp_path, site):
+    PageCache(str(tmp_path)).fetch(site.url)
+    stale = PageCache(str(tmp_path), freshness=0)
+
+    unchanged = stale.fetch(site.url)
+    assert site.requests[-1] == ('"v1"', "Sat, 31 May 2025 12:00:00 GMT")
+    assert not unchanged.changed and not unchanged.from_cache
+    assert (stale.revalidated, stale.downloads) == (1, 0)
+
+    site.body, site.etag = site.body.replace("会社概要", "事業内容"), '"v2"'
+    changed = stale.fetch(site.url)
+    assert changed.changed and "事業内容" in changed.text
+    assert stale.load(site.url).etag == '"v2"'
+
+
+def test_unreachable_server_falls_back_to_the_stale_snapshot(tmp_path, site):
+    PageCache(str(tmp_path)).fetch(site.url)
+    site.stop()
+    snapshot = PageCache(str(tmp_path), freshness=0).fetch(site.url)
+    assert snapshot is not None and snapshot.from_cache and "会社概要" in snapshot.text
+    assert PageCache(str(tmp_path)).fetch(site.url.replace("/about", "/other")) is None
+
+
+def test_prefetch_keeps_only_usable_pages(tmp_path, site):
+    short = site.url.replace("/about", "/short")
+    snapshots = asyncio.run(PageCache(str(tmp_path)).prefetch([site.url, short]))
+    assert list(snapshots) == [site.url]
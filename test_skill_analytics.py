@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import math
+import random
+import time
+
+import pytest
+
+from job_records import JobRecord, format_job_stats
+from skill_analytics import analyze_skills, keyword_pairs, pair_min_count, skill_frequencies, skill_matrix
+
+
+def jobs(*skill_lists, location="Tokyo") -> list:
+    return [JobRecord(title="Engineer", company=f"Company {i}", location=location, skills=list(skills)) for i, skills in enumerate(skill_lists)]
+
+
+def test_frequencies_count_each_canonical_skill_once_per_job():
+    records = jobs(["python", "Python3", "AWS"], ["パイソン", "Go"], ["golang"], [])
+    assert skill_frequencies(records) == [("Go", 2, 0.5), ("Python", 2, 0.5), ("AWS", 1, 0.25)]
+    # Work style is picked up from the location as well
+    assert dict((skill, count) for skill, count, _ in skill_frequencies(jobs(["Go"], location="東京 (リモート可)"))) == {"Go": 1, "Remote Work": 1}
+
+
+def test_lift_and_pmi_values():
+    # 8 jobs: React in 4, TypeScript in 4, both in 3; Go in 4, never with React
+    records = jobs(
+        ["React", "TypeScript"], ["React", "TypeScript"], ["React", "TypeScript"], ["React", "Go"],
+        ["TypeScript", "Go"], ["Go"], ["Go"], [],
+    )
+    pairs = {pair["pair"]: pair for pair in keyword_pairs(records, min_count=1)}
+    # Expected co-occurrence by chance is 4 * 4 / 8 = 2
+    assert pairs["React + TypeScript"] == {"pair": "React + TypeScript", "count": 3, "lift": 1.5, "pmi": round(math.log2(1.5), 2)}
+    assert pairs["React + Go"]["lift"] == 0.5 and pairs["React + Go"]["pmi"] == -1.0
+    assert list(pairs)[0] == "React + TypeScript"
+    # Pairs seen once are dropped by the default minimum count
+    assert [pair["pair"] for pair in keyword_pairs(records)] == ["React + TypeScript"]
+
+
+def test_min_count_grows_with_the_corpus():
+    assert pair_min_count(0) == pair_min_count(100) == 2
+    assert pair_min_count(20_000) == 40
+
+
+def long_tail_corpus(size: int, seed: int = 0) -> list:
+    """Common skills plus one rare, made-up skill per posting, like scraped postings"""
+    rng = random.Random(seed)
+    common = ["Python", "Go", "AWS", "React", "TypeScript", "Docker", "Kubernetes", "SQL", "Java", "GCP"]
+    return [
+        JobRecord(title="Engineer", company=f"Company {i}", location="Tokyo",
+                  skills=rng.sample(common, 3) + [f"Internal Tool {rng.randrange(size // 2)}"])
+        for i in range(size)
+    ]
+
+
+def test_large_corpus_stays_fast_and_ignores_rare_pairs():
+    records = long_tail_corpus(30_000)
+    started = time.perf_counter()
+    matrix = skill_matrix(records)
+    analytics = analyze_skills(records, matrix=matrix)
+    elapsed = time.perf_counter() - started
+
+    skills, columns = matrix
+    assert len(skills) > 10_000  # The long tail is there...
+    assert sum(len(rows) for rows in columns) == 4 * len(records)  # ...and stored sparsely
+    assert all(pair["count"] >= pair_min_count(len(records)) for pair in analytics["keyword_pairs"])
+    assert not any("Internal Tool" in pair["pair"] for pair in analytics["keyword_pairs"])
+    assert elapsed < 5
+
+
+def test_job_stats_build_the_skill_matrix_once(monkeypatch):
+    import job_records
+    calls = []
+    monkeypatch.setattr(job_records, "skill_matrix", lambda records: calls.append(1) or skill_matrix(records))
+    assert "Keyword pairs" in format_job_stats(long_tail_corpus(200))
+    assert calls == [1]
+
+
+@pytest.mark.parametrize("records", [[], jobs(["Go"])])
+def test_small_inputs_have_no_pairs(records):
+    assert keyword_pairs(records) == []